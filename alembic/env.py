@@ -0,0 +1,50 @@
+# Alembic environment for MazGPT: the models in model/db.py, on the app's database unless
+# sqlalchemy.url is set in alembic.ini (or a connection is handed over, see model.db.init_db)
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+
+import model.db
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = model.db.Base.metadata
+
+
+def _url():
+    return config.get_main_option("sqlalchemy.url") or str(model.db.engine.url)
+
+
+def run_migrations_offline() -> None:
+    """Emits the SQL as a script instead of running it."""
+    context.configure(url=_url(), target_metadata=target_metadata, literal_binds=True,
+                      dialect_opts={"paramstyle": "named"}, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    engine = create_engine(_url())
+    with engine.connect() as connection:
+        _run(connection)
+    engine.dispose()
+
+
+def _run(connection):
+    # render_as_batch: SQLite can only ALTER a table by copying it
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,98 @@
+"""Backfill legacy chat_memory blobs into chat_messages
+
+Revision ID: 2d7f4b8c1e60
+Revises: 9a1d6c3e5b02
+Create Date: 2026-10-19 18:21:44.160392
+
+"""
+from typing import Sequence, Union
+
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d7f4b8c1e60'
+down_revision: Union[str, None] = '9a1d6c3e5b02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The tables as they are at this revision: later revisions add project counters and revisions,
+# so the backfill must not go through the app's (current) import code
+projects = sa.table('projects',
+    sa.column('id', sa.Integer), sa.column('user_id', sa.Integer), sa.column('name', sa.String),
+    sa.column('archived', sa.Boolean), sa.column('created_at', sa.DateTime), sa.column('updated_at', sa.DateTime))
+chat_memory = sa.table('chat_memory',
+    sa.column('id', sa.Integer), sa.column('user_id', sa.Integer), sa.column('project_id', sa.String),
+    sa.column('messages', sa.JSON), sa.column('created_at', sa.DateTime))
+chat_messages = sa.table('chat_messages',
+    sa.column('project_id', sa.Integer), sa.column('user_id', sa.Integer), sa.column('sender', sa.String),
+    sa.column('content', sa.String), sa.column('version', sa.Integer),
+    sa.column('created_at', sa.DateTime), sa.column('updated_at', sa.DateTime))
+
+BLOBS_PER_BATCH = 50
+MAX_MESSAGE_CHARS = 20000  # model.bulk_import.MAX_MESSAGE_CHARS at this revision
+
+
+def _rows(blob, project_id, now):
+    # Same rules as model.bulk_import.normalize_message: malformed entries are skipped
+    for m in blob.messages if isinstance(blob.messages, list) else []:
+        if not isinstance(m, dict):
+            continue
+        sender = m.get("sender", m.get("user", "user"))
+        text = m.get("text", m.get("message", m.get("content")))
+        if not isinstance(sender, str) or not isinstance(text, str) or not text or len(text) > MAX_MESSAGE_CHARS:
+            continue
+        try:
+            created_at = datetime.datetime.fromisoformat(m["timestamp"]) if isinstance(m.get("timestamp"), str) else None
+        except ValueError:
+            created_at = None
+        yield {"project_id": project_id, "user_id": blob.user_id, "sender": sender, "content": text, "version": 1,
+               "created_at": created_at or blob.created_at or now, "updated_at": now}
+
+
+def _resolve_project(bind, user_id, key, now):
+    # The user's project by id when the key is one of theirs, else by name (created if missing)
+    key = str(key)
+    if key.isdigit():
+        pid = bind.execute(sa.select(projects.c.id).where(projects.c.user_id == user_id, projects.c.id == int(key))).scalar()
+        if pid is not None:
+            return pid
+    pid = bind.execute(sa.select(projects.c.id).where(projects.c.user_id == user_id, projects.c.name == key)).scalar()
+    if pid is None:
+        pid = bind.execute(projects.insert().values(user_id=user_id, name=key, archived=False,
+                                                    created_at=now, updated_at=now)).lastrowid
+    return pid
+
+
+def _backfill(bind):
+    # Blobs are deleted as they are moved, so an interrupted upgrade can simply be re-run
+    now = datetime.datetime.utcnow()
+    while True:
+        blobs = bind.execute(sa.select(chat_memory).order_by(chat_memory.c.id).limit(BLOBS_PER_BATCH)).all()
+        if not blobs:
+            break
+        for blob in blobs:
+            rows = list(_rows(blob, _resolve_project(bind, blob.user_id, blob.project_id, now), now))
+            if rows:
+                bind.execute(chat_messages.insert(), rows)
+        bind.execute(chat_memory.delete().where(chat_memory.c.id.in_([b.id for b in blobs])))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Dual reads look up an account's remaining blobs by user
+    op.create_index('ix_chat_memory_user_id', 'chat_memory', ['user_id'], unique=False)
+    # Backfilled accounts are large; history reads one project oldest-first
+    op.create_index('ix_chat_messages_project_id_created_at', 'chat_messages', ['project_id', 'created_at'], unique=False)
+    # Project counters are computed from chat_messages by the next revision (7e3a5c9d2f14)
+    _backfill(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Moved messages stay in chat_messages; the blobs are not rebuilt
+    op.drop_index('ix_chat_messages_project_id_created_at', table_name='chat_messages')
+    op.drop_index('ix_chat_memory_user_id', table_name='chat_memory')
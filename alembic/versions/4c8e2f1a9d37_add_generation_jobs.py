@@ -0,0 +1,49 @@
+"""Add generation_jobs table
+
+Revision ID: 4c8e2f1a9d37
+Revises: b291a9cfdac5
+Create Date: 2026-10-19 09:12:44.201833
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c8e2f1a9d37'
+down_revision: Union[str, None] = 'b291a9cfdac5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('generation_jobs',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('user_message_id', sa.Integer(), nullable=False),
+    sa.Column('reply_message_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.ForeignKeyConstraint(['reply_message_id'], ['chat_messages.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['user_message_id'], ['chat_messages.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_generation_jobs_user_id', 'generation_jobs', ['user_id'], unique=False)
+    op.create_index('ix_generation_jobs_status_created_at', 'generation_jobs', ['status', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_generation_jobs_status_created_at', table_name='generation_jobs')
+    op.drop_index('ix_generation_jobs_user_id', table_name='generation_jobs')
+    op.drop_table('generation_jobs')
@@ -0,0 +1,30 @@
+"""Add revision counters to users and projects
+
+Revision ID: 5b8e1d4f7a23
+Revises: 7e3a5c9d2f14
+Create Date: 2026-10-19 19:48:36.207114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e1d4f7a23'
+down_revision: Union[str, None] = '7e3a5c9d2f14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('revision', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('projects', sa.Column('revision', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('projects', 'revision')
+    op.drop_column('users', 'revision')
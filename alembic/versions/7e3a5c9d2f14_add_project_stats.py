@@ -0,0 +1,59 @@
+"""Add per-project message counters
+
+Revision ID: 7e3a5c9d2f14
+Revises: 2d7f4b8c1e60
+Create Date: 2026-10-19 19:02:11.845530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e3a5c9d2f14'
+down_revision: Union[str, None] = '2d7f4b8c1e60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('projects', sa.Column('message_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('projects', sa.Column('token_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('projects', sa.Column('last_message_at', sa.DateTime(), nullable=True))
+    # Counters from the hot table in one pass; tokens use the same estimate as model/project_stats.py
+    op.execute(
+        "UPDATE projects SET "
+        "message_count = (SELECT COUNT(*) FROM chat_messages m WHERE m.project_id = projects.id), "
+        "token_count = (SELECT COALESCE(SUM((LENGTH(m.content) + 3) / 4), 0) FROM chat_messages m WHERE m.project_id = projects.id), "
+        "last_message_at = (SELECT MAX(m.created_at) FROM chat_messages m WHERE m.project_id = projects.id), "
+        "updated_at = COALESCE(updated_at, created_at)"
+    )
+    # Archived projects keep their messages in the cold store (its own file and schema); added on top
+    # of the hot counts with plain SQL, since model.project_stats writes columns of later revisions
+    from model.cold_store import get_cold_store
+    bind = op.get_bind()
+    archived = [pid for (pid,) in bind.execute(sa.text("SELECT id FROM projects WHERE archived = 1"))]
+    for project_id in archived:
+        count, tokens, last = 0, 0, None
+        for m in get_cold_store().iter_messages(project_id):
+            count += 1
+            tokens += (len(m.content) + 3) // 4 if m.content else 0
+            last = max(last, m.created_at) if last and m.created_at else (last or m.created_at)
+        if count:
+            bind.execute(sa.text(
+                "UPDATE projects SET message_count = message_count + :count, token_count = token_count + :tokens, "
+                "last_message_at = MAX(COALESCE(last_message_at, :last), :last) WHERE id = :id"
+            ).bindparams(sa.bindparam("last", type_=sa.DateTime())),
+                {"count": count, "tokens": tokens, "last": last, "id": project_id})
+    op.create_index('ix_projects_user_id_archived_updated_at', 'projects', ['user_id', 'archived', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_projects_user_id_archived_updated_at', table_name='projects')
+    op.drop_column('projects', 'last_message_at')
+    op.drop_column('projects', 'token_count')
+    op.drop_column('projects', 'message_count')
@@ -0,0 +1,35 @@
+"""Add vector_tombstones table
+
+Revision ID: 9a1d6c3e5b02
+Revises: 4c8e2f1a9d37
+Create Date: 2026-10-19 15:03:27.518206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a1d6c3e5b02'
+down_revision: Union[str, None] = '4c8e2f1a9d37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('vector_tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('project_key', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('vector_tombstones')
@@ -1,11 +1,12 @@
 # FastAPI API entrypoint for MazGPT user/account features
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
 from .auth import router as auth_router
 from .user_data import router as user_data_router
 from .settings import router as settings_router
 from .auth import JWTAuthMiddleware
 from .chat import router as chat_router
 from .project import router as project_router
+from .admin import router as admin_router
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -14,21 +15,22 @@ from starlette.responses import Response
 import sentry_sdk
 from sentry_sdk.integrations.asgi import SentryAsgiMiddleware
 import time
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
 from fastapi.responses import JSONResponse
 from .csrf import CSRFMiddleware
+from .ratelimit import RateLimitExceeded, limit_user
+from .fastjson import COMPRESS_MIN_BYTES, CompressionMiddleware
 from .auth import setup_error_handlers
+from model.metrics import HTTP_REQUEST_SECONDS, render_latest
+from model.balancer import ModelOverloadedError
+from model.tracing import tracer
 import os
 
 # --- Sentry error reporting ---
 SENTRY_DSN = os.environ.get("SENTRY_DSN", "YOUR_SENTRY_DSN")
+# Performance tracing is handled locally by model.tracing; Sentry tracing stays off unless explicitly enabled
+SENTRY_TRACES_SAMPLE_RATE = float(os.environ.get("SENTRY_TRACES_SAMPLE_RATE", "0"))
 if SENTRY_DSN and SENTRY_DSN != "YOUR_SENTRY_DSN":
-    sentry_sdk.init(dsn=SENTRY_DSN, traces_sample_rate=1.0)
-
-# --- Rate limiting ---
-limiter = Limiter(key_func=get_remote_address)
+    sentry_sdk.init(dsn=SENTRY_DSN, traces_sample_rate=SENTRY_TRACES_SAMPLE_RATE)
 
 # --- Security headers middleware ---
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
@@ -48,8 +50,12 @@ app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True,
 # Enable HTTPS redirect only if MAZGPT_HTTPS=1 is set in the environment
 if os.environ.get("MAZGPT_HTTPS") == "1":
     app.add_middleware(HTTPSRedirectMiddleware)
-app.add_exception_handler(RateLimitExceeded, lambda r, e: JSONResponse(status_code=429, content={"detail": "Rate limit exceeded"}))
-app.state.limiter = limiter
+# --- Rate limiting: per-user/per-route token buckets (api/ratelimit.py) ---
+app.add_exception_handler(RateLimitExceeded, lambda r, e: JSONResponse(
+    status_code=429, content={"detail": str(e)}, headers={"Retry-After": str(e.retry_after)}))
+# Every model replica able to serve the request is saturated: shed load and tell clients when to retry
+app.add_exception_handler(ModelOverloadedError, lambda r, e: JSONResponse(
+    status_code=503, content={"detail": str(e)}, headers={"Retry-After": str(e.retry_after)}))
 app.add_middleware(SentryAsgiMiddleware)
 app.add_middleware(CSRFMiddleware)
 
@@ -59,11 +65,28 @@ class AuditLoggingMiddleware(BaseHTTPMiddleware):
         start = time.time()
         response = await call_next(request)
         duration = time.time() - start
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        HTTP_REQUEST_SECONDS.labels(request.method, route_path, response.status_code).observe(duration)
         user = request.headers.get("Authorization", "anonymous")
         print(f"AUDIT {request.method} {request.url.path} user={user} status={response.status_code} time={duration:.3f}s")
         return response
 app.add_middleware(AuditLoggingMiddleware)
 
+# --- Request tracing middleware (sampled, see model/tracing.py) ---
+class TracingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        with tracer.start_trace(f"{request.method} {request.url.path}") as root:
+            response = await call_next(request)
+            root.attrs["status"] = response.status_code
+            return response
+app.add_middleware(TracingMiddleware)
+
+# --- Response compression ---
+# Cached reads (api/caching.py) arrive already compressed and pass through untouched;
+# server-sent events are never buffered for compression (see CompressionMiddleware)
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_BYTES)
+
 setup_error_handlers(app)
 
 app.include_router(auth_router, prefix="/auth")
@@ -71,6 +94,7 @@ app.include_router(user_data_router, prefix="/user")
 app.include_router(settings_router, prefix="/user")
 app.include_router(chat_router, prefix="/chat")
 app.include_router(project_router, prefix="/project")
+app.include_router(admin_router, prefix="/admin")
 
 @app.get("/ping")
 def ping(request):
@@ -85,8 +109,34 @@ def ping(request):
         )
     return response
 
+# --- Prometheus-style metrics (text exposition format 0.0.4) ---
+@app.get("/metrics")
+def metrics():
+    return Response(content=render_latest(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Restore temporary test helper routes for trailing slashes
 from api.project import list_projects
-app.add_api_route("/project/list/", list_projects, methods=["GET"])
-from api.chat import send_chat
-app.add_api_route("/chat/send/", send_chat, methods=["POST"])
+app.add_api_route("/project/list/", list_projects, methods=["GET"], dependencies=[Depends(limit_user("read"))])
+from api.chat import send_chat, get_chat_job, stream_chat_job, job_runner, semantic_memory
+from api.project import vector_cleaner
+app.add_api_route("/chat/send/", send_chat, methods=["POST"], status_code=202, dependencies=[Depends(limit_user("chat_send"))])
+app.add_api_route("/chat/jobs/{job_id}", get_chat_job, methods=["GET"])
+app.add_api_route("/chat/jobs/{job_id}/events", stream_chat_job, methods=["GET"])
+
+# --- Generation job runner: resume jobs left unfinished by a previous process ---
+@app.on_event("startup")
+def start_job_runner():
+    job_runner.start()
+
+@app.on_event("shutdown")
+def stop_job_runner():
+    job_runner.stop()
+
+# --- Vector cleanup for deleted projects (see model/deletion.py) ---
+@app.on_event("startup")
+def start_vector_cleaner():
+    vector_cleaner.start(semantic_memory)
+
+@app.on_event("shutdown")
+def stop_vector_cleaner():
+    vector_cleaner.stop()
@@ -0,0 +1,41 @@
+# api/admin.py
+# Operator-only diagnostics endpoints for MazGPT (trace viewer, model worker health)
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import JSONResponse
+from api.auth import get_current_user
+from model.tracing import tracer
+from model.workers import active_pools
+import os
+
+router = APIRouter()
+
+# Comma-separated list of account emails allowed to use /admin endpoints
+ADMIN_EMAILS = {e.strip().lower() for e in os.environ.get("MAZGPT_ADMIN_EMAILS", "").split(",") if e.strip()}
+
+def require_admin(current_user=Depends(get_current_user)):
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+# --- GET /admin/traces ---
+@router.get("/traces")
+def list_traces(limit: int = Query(50, ge=1, le=500), min_ms: float = Query(0, ge=0), admin=Depends(require_admin)):
+    traces = [t for t in tracer.recent() if t.duration_ms >= min_ms][:limit]
+    return {
+        "sample_rate": tracer.sample_rate,
+        "slow_ms": tracer.slow_ms,
+        "traces": [t.to_dict() for t in traces],
+    }
+
+# --- GET /admin/traces/chrome ---
+@router.get("/traces/chrome")
+def export_traces_chrome(limit: int = Query(50, ge=1, le=500), admin=Depends(require_admin)):
+    return JSONResponse(
+        content=tracer.export_chrome(limit),
+        headers={"Content-Disposition": "attachment; filename=mazgpt-traces.json"},
+    )
+
+# --- GET /admin/workers ---
+@router.get("/workers")
+def worker_health(admin=Depends(require_admin)):
+    return {"workers": [w for pool in active_pools() for w in pool.health()]}
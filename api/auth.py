@@ -21,8 +21,9 @@ from fastapi.exception_handlers import RequestValidationError
 from fastapi.exceptions import RequestValidationError as FastAPIRequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi import status
-import redis
 import pyotp
+from api.ratelimit import limit_client
+from api.revocation import get_revocation_store
 from cryptography.fernet import Fernet, InvalidToken
 import base64
 
@@ -34,11 +35,6 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
-# --- Redis-based JWT denylist for revoked tokens ---
-REDIS_DENYLIST_PREFIX = "jwt:revoked:"
-REDIS_URL = os.environ.get("MAZGPT_REDIS_URL", "redis://localhost:6379/0")
-redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
-
 # --- 2FA/MFA support ---
 FERNET_KEY = os.environ.get("MAZGPT_2FA_ENC_KEY")
 if not FERNET_KEY:
@@ -82,13 +78,13 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
 
+# --- JWT denylist for revoked tokens (api/revocation.py: SQLite by default, or Redis) ---
 def revoke_jti(jti: str, exp: int):
     if jti:
-        ttl = max(0, exp - int(datetime.now(timezone.utc).timestamp()))
-        redis_client.setex(f"{REDIS_DENYLIST_PREFIX}{jti}", ttl, "1")
+        get_revocation_store().revoke(jti, exp)
 
 def is_jti_revoked(jti: str) -> bool:
-    return bool(jti and redis_client.exists(f"{REDIS_DENYLIST_PREFIX}{jti}"))
+    return bool(jti and get_revocation_store().is_revoked(jti))
 
 # --- Token creation helpers ---
 def create_access_token(data: dict, expires_delta: timedelta = None):
@@ -105,7 +101,7 @@ def create_refresh_token(data: dict):
     to_encode.update({"exp": expire, "iat": datetime.now(timezone.utc), "jti": jti, "type": "refresh"})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-# --- Token verification with Redis denylist check ---
+# --- Token verification with denylist check ---
 def verify_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -140,7 +136,7 @@ class LoginRequest(BaseModel):
     password: str
 
 # Auth endpoints
-@router.post("/signup")
+@router.post("/signup", dependencies=[Depends(limit_client("auth"))])
 def signup(user: UserCreate, request: Request, db: Session = Depends(get_db)):
     # Explicit CSRF check for POST (if present)
     if request.method == "POST":
@@ -158,7 +154,7 @@ def signup(user: UserCreate, request: Request, db: Session = Depends(get_db)):
     db.refresh(db_user)
     return {"ok": True}
 
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(limit_client("auth"))])
 def login(req: LoginRequest, response: Response, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == req.email).first()
     if not user or not bcrypt.checkpw(req.password.encode(), user.password_hash.encode()):
@@ -187,7 +183,7 @@ def logout(request: Request, response: Response):
     response.delete_cookie("refresh_token")
     return {"ok": True}
 
-@router.post("/reset-password")
+@router.post("/reset-password", dependencies=[Depends(limit_client("auth"))])
 def reset_password(email: EmailStr, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == email).first()
     if not user:
@@ -202,7 +198,7 @@ def get_profile(email: EmailStr, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="User not found")
     return {"email": user.email, "name": user.name, "picture": user.picture, "tier": user.tier}
 
-@router.post("/change-password")
+@router.post("/change-password", dependencies=[Depends(limit_client("auth"))])
 def change_password(email: EmailStr, old_password: str, new_password: str, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == email).first()
     if not user or not bcrypt.checkpw(old_password.encode(), user.password_hash.encode()):
@@ -309,7 +305,7 @@ class TwoFALoginVerifyRequest(BaseModel):
     code: str
     type: Optional[str] = None
 
-@router.post("/2fa/login-verify")
+@router.post("/2fa/login-verify", dependencies=[Depends(limit_client("auth"))])
 def twofa_login_verify(req: TwoFALoginVerifyRequest, response: Response, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == req.email).first()
     if not user or not user.twofa_enabled:
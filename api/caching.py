@@ -0,0 +1,109 @@
+# Conditional GETs (ETag / If-None-Match) and an in-process cache of serialized read responses
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from starlette.responses import Response
+from model.metrics import REGISTRY
+from api import fastjson
+
+CACHE_BYTES = int(os.environ.get("MAZGPT_RESPONSE_CACHE_MB", "64")) * 1024 * 1024
+MAX_ENTRY_BYTES = CACHE_BYTES // 16   # larger bodies are served but not cached
+CACHE_CONTROL = "private, no-cache"   # browsers keep the body but revalidate it with If-None-Match
+
+RESPONSE_CACHE = REGISTRY.counter(
+    "mazgpt_response_cache_total", "Cacheable read responses by outcome (not_modified, hit, miss)", ["route", "result"])
+RESPONSE_CACHE_BYTES = REGISTRY.gauge(
+    "mazgpt_response_cache_bytes", "Serialized response bodies held in the in-process cache")
+
+
+class ResponseCache:
+    """
+    LRU of serialized JSON bodies bounded by total size. Keys carry the revision the body was built
+    from, so a write never has to find and evict entries: later reads simply use a new key and the
+    stale entries age out.
+    """
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, body, headers):
+        if len(body) > min(MAX_ENTRY_BYTES, self.max_bytes):
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self._entries[key] = (body, headers)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+            RESPONSE_CACHE_BYTES.set(self.size)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            RESPONSE_CACHE_BYTES.set(0)
+
+
+response_cache = ResponseCache()
+
+
+def make_etag(route, user_id, revision, params):
+    digest = hashlib.blake2b(repr((route, user_id, revision, params)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    # Weak comparison (RFC 9110 13.1.2): the W/ prefix is ignored
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in [tag.removeprefix("W/") for tag in candidates]
+
+
+def cached_json(request, route, user_id, revision, params, build):
+    """
+    Serves a read endpoint from its version stamp. ``revision`` is the counter bumped by every write
+    the response depends on; ``params`` are the query parameters that shape it. A matching
+    If-None-Match gets an empty 304; otherwise the body comes from the cache, or from
+    ``build()`` -> (content, extra_headers) on a miss. ``content`` is trusted, already-shaped data
+    (plain dicts from DB rows): it is serialized with api.fastjson, not validated. Large bodies are
+    cached and sent compressed (brotli or gzip) for clients that accept it.
+    """
+    etag = make_etag(route, user_id, revision, params)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        RESPONSE_CACHE.labels(route, "not_modified").inc()
+        return Response(status_code=304, headers=headers)
+    key = (user_id, route, params, revision)
+    entry = response_cache.get(key)
+    if entry is None:
+        content, extra = build()
+        entry = (fastjson.dumps(content), dict(extra or {}))
+        response_cache.put(key, *entry)
+        RESPONSE_CACHE.labels(route, "miss").inc()
+    else:
+        RESPONSE_CACHE.labels(route, "hit").inc()
+    body, extra = entry
+    encoding = fastjson.choose_encoding(request.headers.get("accept-encoding"))
+    if encoding and len(body) >= fastjson.COMPRESS_MIN_BYTES:
+        encoded = response_cache.get(key + (encoding,))
+        if encoded is None:
+            encoded = (fastjson.compress(body, encoding), extra)
+            response_cache.put(key + (encoding,), *encoded)
+        body = encoded[0]
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers={**headers, **extra})
@@ -1,48 +1,98 @@
 # api/chat.py
 # Chat API endpoints for MazGPT
 from fastapi import APIRouter, HTTPException, Depends, Request, Query
+from fastapi.responses import StreamingResponse
 from pydantic import constr, BaseModel, Field
 from typing import List, Optional
 from sqlalchemy.orm import Session
-from model.db import SessionLocal, User, ChatMemory, ChatMessage, Project, init_db
+from model.db import SessionLocal, User, ChatMessage, Project, init_db
 from api.auth import get_current_user
+from api.caching import cached_json
+from api.fastjson import FastJSONResponse
+from api import ratelimit
 from model.semantic_memory import SemanticMemory
+from model.jobs import JobRunner, FINAL_STATUSES
+from model import legacy_backfill, project_stats, tiering
+from model.metrics import stage_timer
+import asyncio
+import json
 import logging
+import os
+import threading
+import time
 from sqlalchemy import or_
 
 router = APIRouter()
 init_db()
 semantic_memory = SemanticMemory()
 
+# Dependency to get DB session
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# "echo" keeps the placeholder reply; "workers" generates with SkillRouter, every model hosted in worker
+# processes so inference never runs on (or holds the GIL of) the API process
+CHAT_BACKEND = os.environ.get("MAZGPT_CHAT_BACKEND", "echo")
+MODEL_CONFIG = os.environ.get("MAZGPT_MODEL_CONFIG", "model/model_config.yaml")
+_skill_router = None
+_skill_router_lock = threading.Lock()
+
+def get_skill_router():
+    global _skill_router
+    with _skill_router_lock:
+        if _skill_router is None:
+            from model.router import SkillRouter
+            _skill_router = SkillRouter(MODEL_CONFIG, embed=semantic_memory.embed, in_workers=True)
+    return _skill_router
+
+def generate_reply(message, project_id):
+    if CHAT_BACKEND == "workers":
+        return get_skill_router().route(f"user: {message}\nMazGPT:", classify_text=message)
+    return f"MazGPT: You said '{message}' (project: {project_id})"
+
+def charge_reply_tokens(job, reply_msg):
+    ratelimit.charge("generation_tokens", f"user:{job.user_id}", project_stats.estimate_tokens(reply_msg.content))
+
+# Replies are generated by background runner threads; /chat/send only queues a job (see model/jobs.py)
+job_runner = JobRunner(generate_reply, on_reply=charge_reply_tokens)
+JOB_EVENTS_POLL = float(os.environ.get("MAZGPT_JOB_EVENTS_POLL", "0.5"))
+JOB_EVENTS_TIMEOUT = float(os.environ.get("MAZGPT_JOB_EVENTS_TIMEOUT", "300"))
+
 # --- Pydantic models ---
 class ChatSendRequest(BaseModel):
     project_id: str = Field(..., min_length=1, max_length=64, pattern=r"^[a-z0-9\-]+$")
     message: str = Field(..., min_length=1, max_length=2000)
 
-class ChatMessage(BaseModel):
+class ChatMessageOut(BaseModel):
     sender: str = Field(..., min_length=1, max_length=16, pattern=r"^(user|ai)$")
     text: str = Field(..., min_length=1, max_length=2000)
     timestamp: Optional[str] = None
 
 class ChatHistoryResponse(BaseModel):
     project_id: str = Field(..., min_length=1, max_length=64, pattern=r"^[a-z0-9\-]+$")
-    messages: List[ChatMessage]
+    messages: List[ChatMessageOut]
 
 class ChatSearchResponse(BaseModel):
     project_id: str = Field(..., min_length=1, max_length=64, pattern=r"^[a-z0-9\-]+$")
-    results: List[ChatMessage]
+    results: List[ChatMessageOut]
     total: int
     offset: int
     limit: int
     semantic: bool
 
 # --- POST /chat/send ---
-@router.post("/chat/send")
-def send_chat(req: ChatSendRequest, current_user=Depends(get_current_user), db: Session = Depends(SessionLocal)):
+@router.post("/chat/send", status_code=202, dependencies=[Depends(ratelimit.limit_user("chat_send"))])
+def send_chat(req: ChatSendRequest, current_user=Depends(get_current_user), db: Session = Depends(get_db)):
     # Validate project ownership
     project = db.query(Project).filter(Project.user_id == current_user.id, Project.id == req.project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found.")
+    # Inference budget: the prompt now, the reply once it is generated (charged by the job runner hook)
+    ratelimit.check("generation_tokens", f"user:{current_user.id}", project_stats.estimate_tokens(req.message))
     # Add user message
     user_msg = ChatMessage(
         project_id=project.id,
@@ -52,39 +102,70 @@ def send_chat(req: ChatSendRequest, current_user=Depends(get_current_user), db:
         version=1
     )
     db.add(user_msg)
-    # --- AI response (stub, replace with real LLM call) ---
-    ai_reply = f"MazGPT: You said '{req.message}' (project: {req.project_id})"
-    ai_msg = ChatMessage(
-        project_id=project.id,
-        user_id=current_user.id,
-        sender="ai",
-        content=ai_reply,
-        version=1
-    )
-    db.add(ai_msg)
-    db.commit()
-    logging.info(f"User {current_user.email} sent message to project {req.project_id}")
-    return {"reply": ai_reply}
+    db.flush()
+    project_stats.record_message(db, user_msg)
+    # The reply is generated in the background; poll /chat/jobs/{job_id} or subscribe to its events
+    job = job_runner.enqueue(db, user_msg)
+    logging.info(f"User {current_user.email} sent message to project {req.project_id} (job {job.id})")
+    return {"job_id": job.id, "status": job.status}
+
+# --- GET /chat/jobs/{job_id} ---
+@router.get("/chat/jobs/{job_id}")
+def get_chat_job(job_id: str, current_user=Depends(get_current_user)):
+    state = job_runner.status(job_id, user_id=current_user.id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return state
+
+# --- GET /chat/jobs/{job_id}/events (server-sent events) ---
+@router.get("/chat/jobs/{job_id}/events")
+async def stream_chat_job(job_id: str, current_user=Depends(get_current_user)):
+    user_id = current_user.id
+    if await asyncio.to_thread(job_runner.status, job_id, user_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    async def events():
+        # One "status" event per change; the stream ends once the job is done or failed
+        last, deadline = None, time.monotonic() + JOB_EVENTS_TIMEOUT
+        while time.monotonic() < deadline:
+            state = await asyncio.to_thread(job_runner.status, job_id, user_id)
+            if state != last:
+                yield f"event: status\ndata: {json.dumps(state)}\n\n"
+                last = state
+            if state is None or state["status"] in FINAL_STATUSES:
+                return
+            await asyncio.sleep(JOB_EVENTS_POLL)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 # --- GET /chat/history ---
-@router.get("/chat/history", response_model=ChatHistoryResponse)
+@router.get("/chat/history", response_model=ChatHistoryResponse, dependencies=[Depends(ratelimit.limit_user("read"))])
 def get_chat_history(
+    request: Request,
     project_id: str = Query(..., min_length=1, max_length=64, pattern=r"^[a-z0-9\-]+$"),
     limit: int = Query(100, ge=1, le=500),
-    current_user=Depends(get_current_user), db: Session = Depends(SessionLocal)):
+    current_user=Depends(get_current_user), db: Session = Depends(get_db)):
     project = db.query(Project).filter(Project.user_id == current_user.id, Project.id == project_id).first()
     if not project:
         return {"project_id": project_id, "messages": []}
-    msgs = db.query(ChatMessage).filter(ChatMessage.project_id == project.id, ChatMessage.user_id == current_user.id).order_by(ChatMessage.created_at.asc()).limit(limit).all()
-    return {
-        "project_id": project_id,
-        "messages": [ChatMessage(sender=m.sender, text=m.content, timestamp=m.created_at.isoformat()) for m in msgs]
-    }
+
+    def build():
+        # Messages still in legacy chat_memory blobs come first until the backfill has moved them;
+        # archived projects read their cold segments, then any hot rows written since
+        msgs = legacy_backfill.pending_messages(db, project, limit)
+        msgs += tiering.read_messages(db, project, limit - len(msgs)) if len(msgs) < limit else []
+        # Plain dicts from trusted DB rows: serialized by api.fastjson without a pydantic model per message
+        return {
+            "project_id": project_id,
+            "messages": [{"sender": m.sender, "text": m.content, "timestamp": m.created_at.isoformat()} for m in msgs]
+        }, None
+    # Every message written to the project bumps its revision (model/project_stats.py)
+    return cached_json(request, "chat_history", current_user.id, project.revision, (project.id, limit), build)
 
 # --- Optionally: GET /chat/search (semantic/keyword search) ---
 # TODO: Implement semantic/keyword search using ChromaDB or similar
 # --- GET /chat/search ---
-@router.get("/chat/search", response_model=ChatSearchResponse)
+@router.get("/chat/search", response_model=ChatSearchResponse, dependencies=[Depends(ratelimit.limit_user("read"))])
 def search_chat(
     q: str = Query(..., min_length=1, max_length=200),
     project_id: str = Query(..., min_length=1, max_length=64, pattern=r"^[a-z0-9\-]+$"),
@@ -92,7 +173,7 @@ def search_chat(
     offset: int = Query(0, ge=0),
     semantic: bool = Query(False),
     current_user=Depends(get_current_user),
-    db: Session = Depends(SessionLocal)
+    db: Session = Depends(get_db)
 ):
     # Input sanitization
     query_str = q.strip()
@@ -105,11 +186,12 @@ def search_chat(
     results = []
     total = 0
     if semantic:
-        # Semantic search via ChromaDB
+        ratelimit.check("semantic_search", f"user:{current_user.id}")
+        # Semantic search via ChromaDB (embed/semantic_query stages are timed inside SemanticMemory)
         sem_results = semantic_memory.query(query_str, n_results=limit+offset, project_id=project_id)
         total = len(sem_results)
         sem_results = sem_results[offset:offset+limit]
-        results = [ChatMessage(sender=m[1].get('user','user'), text=m[0], timestamp=None) for m in sem_results]
+        results = [{"sender": m[1].get('user','user'), "text": m[0], "timestamp": None} for m in sem_results]
     else:
         # Full-text search (simple LIKE for now, can use FTS5 if available)
         q_filter = f"%{query_str.lower()}%"
@@ -118,15 +200,22 @@ def search_chat(
             ChatMessage.user_id == current_user.id,
             or_(ChatMessage.content.ilike(q_filter))
         ).order_by(ChatMessage.created_at.desc())
-        total = query.count()
-        msgs = query.offset(offset).limit(limit).all()
-        results = [ChatMessage(sender=m.sender, text=m.content, timestamp=m.created_at.isoformat()) for m in msgs]
+        if project.archived and tiering.has_cold_messages(project):
+            # Archived projects: hot rows (sent after archiving), then only as much of the cold segments as the page needs
+            with stage_timer("keyword_search"):
+                msgs, total = tiering.search_page(query, project, query_str, offset, limit)
+        else:
+            with stage_timer("keyword_search"):
+                total = query.count()
+                msgs = query.offset(offset).limit(limit).all()
+        results = [{"sender": m.sender, "text": m.content, "timestamp": m.created_at.isoformat()} for m in msgs]
     logging.info(f"User {current_user.email} searched chat in project {project_id} (semantic={semantic}) q='{query_str}'")
-    return ChatSearchResponse(
-        project_id=project_id,
-        results=results,
-        total=total,
-        offset=offset,
-        limit=limit,
-        semantic=semantic
-    )
+    # Returned directly: the results are already shaped, so FastAPI does not re-validate them
+    return FastJSONResponse({
+        "project_id": project_id,
+        "results": results,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "semantic": semantic
+    })
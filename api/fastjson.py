@@ -0,0 +1,145 @@
+# Fast JSON responses for hot read endpoints: orjson when installed, and pre-compressed bodies
+import datetime
+import gzip
+import json
+import os
+import zlib
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+USE_ORJSON = orjson is not None and os.environ.get("MAZGPT_ORJSON", "1") != "0"
+COMPRESS_MIN_BYTES = 1024   # smaller bodies are not worth the CPU or the Content-Encoding header
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _default(obj):
+    # Pydantic models (e.g. ProjectInfo) and anything else the endpoints hand over unconverted
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content):
+    """Serializes trusted, already-shaped content (dicts/lists of plain values) to compact UTF-8 JSON bytes."""
+    if USE_ORJSON:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse without jsonable_encoder: endpoints return it directly with plain dicts built from
+    DB rows, so FastAPI neither re-validates the payload against the response_model nor walks it twice.
+    """
+
+    def render(self, content):
+        return dumps(content)
+
+
+def _weights(accept_encoding):
+    """Accept-Encoding as {coding: q}; a coding listed with q=0 is refused."""
+    weights = {}
+    for part in (accept_encoding or "").split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            weights[coding.lower()] = q
+    return weights
+
+
+def accepts(accept_encoding, coding):
+    weights = _weights(accept_encoding)
+    return weights.get(coding, weights.get("*", 0.0)) > 0
+
+
+def choose_encoding(accept_encoding):
+    """The best content coding the client accepts that we can produce (brotli on a tie), or None."""
+    weights = _weights(accept_encoding)
+    codings = (["br"] if brotli is not None else []) + ["gzip"]
+    best = max(codings, key=lambda c: weights.get(c, weights.get("*", 0.0)))
+    return best if weights.get(best, weights.get("*", 0.0)) > 0 else None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+class CompressionMiddleware:
+    """
+    Gzips responses that are not encoded yet. Unlike relying on Starlette's GZipMiddleware, the
+    exclusions do not depend on the installed version: bodies that already carry a Content-Encoding
+    (cached reads, see api/caching.py), server-sent events and partial content pass through
+    untouched, and streamed bodies are compressed chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not accepts(Headers(scope=scope).get("accept-encoding"), "gzip"):
+            await self.app(scope, receive, send)
+            return
+        start, compressor = None, None
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+                if "content-encoding" in headers or media_type == "text/event-stream" or message["status"] == 206:
+                    await send(message)  # passed through as is, starting now (SSE must not wait for a body)
+                else:
+                    start = message
+                return
+            if message["type"] != "http.response.body" or (start is None and compressor is None):
+                await send(message)
+                return
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start)
+                    await send(message)
+                    start = None
+                    return
+                compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip container
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = "gzip"
+                headers.add_vary_header("Accept-Encoding")
+                data = compressor.compress(body) + (b"" if more_body else compressor.flush())
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(data))
+                await send(start)
+                start = None
+            else:
+                data = compressor.compress(body) + (b"" if more_body else compressor.flush())
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,17 +1,36 @@
 # api/project.py
 # Project management API endpoints for MazGPT
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-from model.db import SessionLocal, User, ChatMemory, Project, init_db
+from model.db import SessionLocal, User, Project, init_db
+from model import deletion, tiering
+from model.revisions import bump_user, bump_project
+from api.caching import cached_json
+from api import ratelimit
 from api.auth import get_current_user
+import base64
+import json
 import logging
+import threading
 from datetime import datetime, timedelta, timezone
 
 router = APIRouter()
 init_db()
 
+# Dependency to get DB session
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Removes deleted projects' vectors in the background; started with the app (api/__init__.py)
+vector_cleaner = deletion.VectorCleaner()
+
 # --- Pydantic models ---
 class ProjectCreateRequest(BaseModel):
     name: str = Field(..., min_length=1, max_length=64)
@@ -33,32 +52,97 @@ class ProjectInfo(BaseModel):
     id: str = Field(..., min_length=1, max_length=64, pattern=r"^[a-z0-9\-]+$")
     name: str = Field(..., min_length=1, max_length=64)
     archived: bool = False
+    message_count: int = 0
+    token_count: int = 0  # estimated
+    last_message_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+def _iso(value):
+    return value.isoformat() if value else None
 
 # --- POST /project/create ---
 @router.post("/project/create")
-def create_project(req: ProjectCreateRequest, current_user=Depends(get_current_user), db: Session = Depends(SessionLocal)):
+def create_project(req: ProjectCreateRequest, current_user=Depends(get_current_user), db: Session = Depends(get_db)):
     # Validate unique name/id for user
     existing = db.query(Project).filter(Project.user_id == current_user.id, Project.name == req.name).first()
     if req.id == "default" or existing:
         raise HTTPException(status_code=400, detail="Project ID or name already exists or reserved.")
     project = Project(user_id=current_user.id, name=req.name)
     db.add(project)
+    bump_user(db, current_user.id)
     db.commit()
     db.refresh(project)
     logging.info(f"User {current_user.email} created project {project.id}")
     return {"ok": True, "id": project.id, "name": project.name}
 
 # --- GET /project/list ---
-@router.get("/project/list", response_model=List[ProjectInfo])
-def list_projects(current_user=Depends(get_current_user), db: Session = Depends(SessionLocal)):
+# Sort key -> (column, newest/largest first); ties are broken by id in the same direction
+PROJECT_SORTS = {
+    "updated": (Project.updated_at, True),
+    "created": (Project.created_at, True),
+    "messages": (Project.message_count, True),
+    "name": (Project.name, False),
+}
+
+def _encode_cursor(value, project_id):
+    value = value.isoformat() if isinstance(value, datetime) else value
+    return base64.urlsafe_b64encode(json.dumps([value, project_id]).encode()).decode()
+
+def _decode_cursor(cursor, sort):
+    try:
+        value, project_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort in ("updated", "created"):
+            value = datetime.fromisoformat(value)
+        return value, int(project_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+def project_page(db, user_id, archived=None, sort="updated", limit=50, cursor=None):
+    """
+    One page of a user's projects with their counters: O(limit) rows, never touching chat_messages.
+    Keyset pagination; returns (projects, next_cursor or None).
+    """
+    column, descending = PROJECT_SORTS[sort]
+    query = db.query(Project).filter(Project.user_id == user_id)
+    if archived is not None:
+        query = query.filter(Project.archived == archived)
+    if cursor:
+        value, last_id = _decode_cursor(cursor, sort)
+        if descending:
+            query = query.filter(or_(column < value, and_(column == value, Project.id < last_id)))
+        else:
+            query = query.filter(or_(column > value, and_(column == value, Project.id > last_id)))
+    order = (column.desc(), Project.id.desc()) if descending else (column.asc(), Project.id.asc())
+    projects = query.order_by(*order).limit(limit + 1).all()
+    next_cursor = None
+    if len(projects) > limit:
+        projects = projects[:limit]
+        next_cursor = _encode_cursor(getattr(projects[-1], column.key), projects[-1].id)
+    return [ProjectInfo(id=str(p.id), name=p.name, archived=bool(p.archived), message_count=p.message_count or 0,
+                        token_count=p.token_count or 0, last_message_at=_iso(p.last_message_at),
+                        updated_at=_iso(p.updated_at)) for p in projects], next_cursor
+
+@router.get("/project/list", response_model=List[ProjectInfo], dependencies=[Depends(ratelimit.limit_user("read"))])
+def list_projects(
+    request: Request,
+    archived: Optional[bool] = Query(None),
+    sort: str = Query("updated", pattern=r"^(updated|created|messages|name)$"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, max_length=512),
+    current_user=Depends(get_current_user), db: Session = Depends(get_db)):
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    projects = db.query(Project).filter(Project.user_id == current_user.id).all()
-    return [ProjectInfo(id=p.id, name=p.name, archived=p.archived) for p in projects]
+    # Pass the X-Next-Cursor header of a page as ?cursor= to get the next one. Any write to the
+    # user's projects bumps their revision, which is what the ETag and the cache key are built from.
+    def build():
+        page, next_cursor = project_page(db, current_user.id, archived, sort, limit, cursor)
+        return page, ({"X-Next-Cursor": next_cursor} if next_cursor else {})
+    return cached_json(request, "project_list", current_user.id, current_user.revision,
+                       (archived, sort, limit, cursor), build)
 
 # --- POST /project/rename ---
 @router.post("/project/rename")
-def rename_project(req: ProjectRenameRequest, current_user=Depends(get_current_user), db: Session = Depends(SessionLocal)):
+def rename_project(req: ProjectRenameRequest, current_user=Depends(get_current_user), db: Session = Depends(get_db)):
     project = db.query(Project).filter(Project.user_id == current_user.id, Project.id == req.old_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found.")
@@ -66,32 +150,58 @@ def rename_project(req: ProjectRenameRequest, current_user=Depends(get_current_u
     if db.query(Project).filter(Project.user_id == current_user.id, Project.name == req.new_name, Project.id != req.old_id).first():
         raise HTTPException(status_code=400, detail="New project name already exists.")
     project.name = req.new_name
+    bump_project(db, project.id)
     db.commit()
     logging.info(f"User {current_user.email} renamed project {req.old_id} to {req.new_name}")
     return {"ok": True, "id": project.id, "name": project.name}
 
 # --- POST /project/archive ---
 @router.post("/project/archive")
-def archive_project(req: ProjectArchiveRequest, current_user=Depends(get_current_user), db: Session = Depends(SessionLocal)):
+def archive_project(req: ProjectArchiveRequest, current_user=Depends(get_current_user), db: Session = Depends(get_db)):
     project = db.query(Project).filter(Project.user_id == current_user.id, Project.id == req.id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found.")
     project.archived = True
     project.archived_at = datetime.now(timezone.utc)
+    bump_project(db, project.id)
+    db.commit()
+    # Messages move to the compressed cold store; the project's vectors leave the live index
+    moved = tiering.freeze_project(db, current_user.id, project.id)
+    vector_cleaner.wake()
+    logging.info(f"User {current_user.email} archived project {req.id} ({moved} messages to cold storage)")
+    return {"ok": True, "moved": moved}
+
+# --- POST /project/unarchive ---
+@router.post("/project/unarchive")
+def unarchive_project(req: ProjectArchiveRequest, current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+    project = db.query(Project).filter(Project.user_id == current_user.id, Project.id == req.id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found.")
+    restored = tiering.thaw_project(db, current_user.id, project.id)
+    project.archived = False
+    project.archived_at = None
+    bump_project(db, project.id)
     db.commit()
-    logging.info(f"User {current_user.email} archived project {req.id}")
-    return {"ok": True}
+    if restored:
+        # Imported here: api.chat loads the embedding model
+        from api.chat import semantic_memory
+        threading.Thread(target=tiering.reindex_project, args=(semantic_memory, SessionLocal, current_user.id, project.id),
+                         name="reindex-project", daemon=True).start()
+    logging.info(f"User {current_user.email} unarchived project {req.id} ({restored} messages restored)")
+    return {"ok": True, "restored": restored}
 
 # --- DELETE /project/delete ---
 @router.delete("/project/delete")
-def delete_project(req: ProjectDeleteRequest, current_user=Depends(get_current_user), db: Session = Depends(SessionLocal)):
+def delete_project(req: ProjectDeleteRequest, current_user=Depends(get_current_user), db: Session = Depends(get_db)):
     if not req.confirm:
         raise HTTPException(status_code=400, detail="Confirmation required.")
     project = db.query(Project).filter(Project.user_id == current_user.id, Project.id == req.id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found.")
-    db.query(ChatMemory).filter(ChatMemory.user_id == current_user.id, ChatMemory.project_id == project.id).delete()
-    db.delete(project)
+    # Messages, memories and jobs go in chunks so SQLite is not write-locked for the whole deletion
+    counts = deletion.delete_project(db, current_user.id, project.id)
+    bump_user(db, current_user.id)
     db.commit()
-    logging.info(f"User {current_user.email} deleted project {req.id}")
-    return {"ok": True}
+    vector_cleaner.wake()
+    logging.info(f"User {current_user.email} deleted project {req.id} ({counts})")
+    return {"ok": True, "deleted": counts}
@@ -0,0 +1,183 @@
+# Per-user / per-route token-bucket rate limits (in-process store, optional shared Redis store)
+import math
+import os
+import threading
+import time
+import zlib
+from collections import namedtuple
+from fastapi import Depends, Request
+from model.metrics import REGISTRY
+
+ENABLED = os.environ.get("MAZGPT_RATE_LIMIT", "1") != "0"
+BACKEND = os.environ.get("MAZGPT_RATE_LIMIT_BACKEND", "memory")  # "memory" or "redis" (shared by all workers)
+REDIS_URL = os.environ.get("MAZGPT_REDIS_URL", "redis://localhost:6379/0")
+REDIS_PREFIX = "ratelimit:"
+STRIPES = 64          # lock stripes of the in-process store
+SWEEP_EVERY = 10000   # acquisitions between sweeps of idle (full) buckets
+
+# rate = tokens refilled per second, burst = bucket capacity
+Bucket = namedtuple("Bucket", "rate burst")
+
+
+def _bucket(name, per_minute, burst):
+    prefix = f"MAZGPT_RATE_{name.upper()}"
+    return Bucket(float(os.environ.get(f"{prefix}_PER_MINUTE", per_minute)) / 60.0,
+                  float(os.environ.get(f"{prefix}_BURST", burst)))
+
+
+BUCKETS = {
+    # Cheap reads (history, list, settings, keyword search), per user
+    "read": _bucket("read", 600, 120),
+    # Queued generations, per user: how many replies can be requested
+    "chat_send": _bucket("chat_send", 20, 10),
+    # Inference capacity, per user, in (estimated) tokens: prompts when queued, replies when generated
+    "generation_tokens": _bucket("generation_tokens", 4000, 8000),
+    # Embedding-backed semantic search, per user
+    "semantic_search": _bucket("semantic_search", 30, 10),
+    # Whole-account export/import/delete, per user
+    "bulk": _bucket("bulk", 2, 3),
+    # Credential checks, per client address
+    "auth": _bucket("auth", 10, 5),
+}
+
+RATE_LIMITED = REGISTRY.counter(
+    "mazgpt_rate_limited_total", "Requests rejected by a rate-limit bucket", ["bucket"])
+
+
+class RateLimitExceeded(Exception):
+    """A token bucket is empty; the request may be retried after ``retry_after`` seconds (answered with 429)."""
+
+    def __init__(self, bucket, retry_after):
+        self.bucket = bucket
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"Rate limit exceeded ({bucket}); retry in {self.retry_after}s")
+
+
+class MemoryStore:
+    """
+    Token buckets in a dict, one float per key (GCRA: the time at which the bucket will be full
+    again). Each update is a few float operations under one of STRIPES locks picked by key, so
+    concurrent requests for different users rarely contend and no request waits on a global lock.
+    Full buckets carry no information and are swept periodically.
+    """
+
+    def __init__(self, stripes=STRIPES):
+        self._tat = {}
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._calls = 0
+
+    def acquire(self, key, bucket, cost=1.0, now=None):
+        """Takes ``cost`` tokens; returns 0.0 if allowed, else the seconds until they are available."""
+        now = time.monotonic() if now is None else now
+        interval = 1.0 / bucket.rate
+        lock = self._locks[zlib.crc32(key.encode()) % len(self._locks)]
+        with lock:
+            tat = max(self._tat.get(key, now), now)
+            new_tat = tat + cost * interval
+            wait = new_tat - (now + bucket.burst * interval)
+            if wait > 0:
+                return wait
+            self._tat[key] = new_tat
+        self._calls += 1
+        if self._calls % SWEEP_EVERY == 0:
+            self.sweep(now)
+        return 0.0
+
+    def charge(self, key, bucket, cost, now=None):
+        """Takes ``cost`` tokens unconditionally (the bucket may go into debt and then rejects until refilled)."""
+        now = time.monotonic() if now is None else now
+        lock = self._locks[zlib.crc32(key.encode()) % len(self._locks)]
+        with lock:
+            self._tat[key] = max(self._tat.get(key, now), now) + cost / bucket.rate
+
+    def sweep(self, now=None):
+        now = time.monotonic() if now is None else now
+        for key, tat in list(self._tat.items()):
+            if tat <= now:
+                self._tat.pop(key, None)
+
+    def clear(self):
+        self._tat.clear()
+
+
+# GCRA in one round trip; TAT kept in milliseconds of Redis server time
+_REDIS_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local interval, burst, cost, force = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + cost * interval
+local wait = new_tat - (now + burst * interval)
+if wait > 0 and force == 0 then return tostring(wait) end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.max(1, math.ceil(new_tat - now)))
+return '0'
+"""
+
+
+class RedisStore:
+    """Same buckets kept in Redis, so every worker process shares one budget per user."""
+
+    def __init__(self, url=REDIS_URL):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_SCRIPT)
+
+    def _run(self, key, bucket, cost, force):
+        interval_ms = 1000.0 / bucket.rate
+        return float(self._script(keys=[REDIS_PREFIX + key], args=[interval_ms, bucket.burst, cost, force])) / 1000.0
+
+    def acquire(self, key, bucket, cost=1.0, now=None):
+        return self._run(key, bucket, cost, 0)
+
+    def charge(self, key, bucket, cost, now=None):
+        self._run(key, bucket, cost, 1)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RedisStore() if BACKEND == "redis" else MemoryStore()
+    return _store
+
+
+def check(bucket_name, key, cost=1.0):
+    """Takes ``cost`` tokens from ``key``'s bucket or raises RateLimitExceeded."""
+    if not ENABLED:
+        return
+    wait = get_store().acquire(f"{bucket_name}:{key}", BUCKETS[bucket_name], cost)
+    if wait > 0:
+        RATE_LIMITED.labels(bucket_name).inc()
+        raise RateLimitExceeded(bucket_name, wait)
+
+
+def charge(bucket_name, key, cost):
+    """Records work already done (e.g. tokens generated) against ``key``'s bucket; never raises."""
+    if ENABLED and cost > 0:
+        get_store().charge(f"{bucket_name}:{key}", BUCKETS[bucket_name], cost)
+
+
+def client_address(request):
+    return request.client.host if request.client else "unknown"
+
+
+# --- FastAPI dependencies ---
+def limit_user(bucket_name, cost=1.0):
+    """Dependency limiting the authenticated user (401 is still raised before any token is taken)."""
+    from api.auth import get_current_user
+
+    def dependency(current_user=Depends(get_current_user)):
+        check(bucket_name, f"user:{current_user.id}", cost)
+    return dependency
+
+
+def limit_client(bucket_name, cost=1.0):
+    """Dependency limiting the client address, for routes used before logging in."""
+    def dependency(request: Request):
+        check(bucket_name, f"ip:{client_address(request)}", cost)
+    return dependency
@@ -0,0 +1,119 @@
+# Revoked-token (JWT denylist) stores: embedded SQLite table with an in-memory snapshot, or Redis
+import logging
+import os
+import threading
+import time
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+import model.db
+from model.db import RevokedToken
+from model.metrics import REGISTRY
+
+BACKEND = os.environ.get("MAZGPT_REVOCATION_BACKEND", "sqlite")  # "sqlite" or "redis"
+REDIS_URL = os.environ.get("MAZGPT_REDIS_URL", "redis://localhost:6379/0")
+REDIS_DENYLIST_PREFIX = "jwt:revoked:"
+REFRESH_INTERVAL = float(os.environ.get("MAZGPT_REVOCATION_REFRESH", "1.0"))  # seconds between snapshot refreshes
+PURGE_INTERVAL = 300.0   # seconds between deletions of expired rows
+
+REVOKED_TOKENS = REGISTRY.gauge(
+    "mazgpt_revoked_tokens", "Unexpired revoked tokens held in this process's denylist snapshot")
+
+
+class SqlRevocationStore:
+    """
+    Denylist in the revoked_tokens table. Lookups never touch the database: they check an in-memory
+    snapshot (jti -> exp) that is brought up to date at most every ``refresh_interval`` seconds by
+    fetching only rows with an id above the last one seen. A revocation made by this process is in
+    the snapshot at once; one made by another worker is seen after at most ``refresh_interval``.
+    Expired tokens fail signature validation anyway, so every PURGE_INTERVAL expired entries are
+    dropped from both the table and the snapshot.
+    """
+
+    def __init__(self, session_factory=None, refresh_interval=REFRESH_INTERVAL):
+        self._session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self._revoked = {}
+        self._last_id = 0
+        self._refreshed_at = None
+        self._purged_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _session(self):
+        # Looked up at call time so a patched model.db.SessionLocal (tests) is honoured
+        return (self._session_factory or model.db.SessionLocal)()
+
+    def revoke(self, jti, exp):
+        db = self._session()
+        try:
+            db.execute(insert(RevokedToken).values(jti=jti, expires_at=exp).on_conflict_do_nothing())
+            db.commit()
+        finally:
+            db.close()
+        with self._lock:
+            self._revoked[jti] = exp
+
+    def is_revoked(self, jti):
+        if self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            self.refresh()
+        exp = self._revoked.get(jti)
+        return exp is not None and exp > time.time()
+
+    def refresh(self):
+        """Adds rows revoked since the last refresh (by any process); purges expired ones when due."""
+        with self._lock:
+            now = time.monotonic()
+            if self._refreshed_at is not None and now - self._refreshed_at < self.refresh_interval:
+                return  # another thread refreshed while this one waited for the lock
+            db = self._session()
+            try:
+                rows = db.execute(
+                    select(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at)
+                    .where(RevokedToken.id > self._last_id, RevokedToken.expires_at > int(time.time()))
+                    .order_by(RevokedToken.id)).all()
+                purge = now - self._purged_at >= PURGE_INTERVAL
+                if purge:
+                    db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= int(time.time())))
+                    db.commit()
+            except Exception as e:
+                # Keep serving the current snapshot; the next lookup retries
+                logging.error(f"Could not refresh the token denylist: {e}")
+                return
+            finally:
+                db.close()
+            for row in rows:
+                self._revoked[row.jti] = row.expires_at
+            if rows:
+                self._last_id = rows[-1].id
+            if purge:
+                wall = time.time()
+                self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > wall}
+                self._purged_at = now
+            self._refreshed_at = now
+            REVOKED_TOKENS.set(len(self._revoked))
+
+
+class RedisRevocationStore:
+    """Denylist as expiring Redis keys: always current, one round trip per lookup."""
+
+    def __init__(self, url=REDIS_URL):
+        import redis
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    def revoke(self, jti, exp):
+        ttl = max(1, exp - int(time.time()))
+        self._client.setex(f"{REDIS_DENYLIST_PREFIX}{jti}", ttl, "1")
+
+    def is_revoked(self, jti):
+        return bool(self._client.exists(f"{REDIS_DENYLIST_PREFIX}{jti}"))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_revocation_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RedisRevocationStore() if BACKEND == "redis" else SqlRevocationStore()
+    return _store
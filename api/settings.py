@@ -1,10 +1,13 @@
 # FastAPI backend for user settings and preferences
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional
 from sqlalchemy.orm import Session
 from model.db import SessionLocal, UserSettings, User, init_db
 from api.auth import get_current_user
+from api.caching import cached_json
+from api import ratelimit
+from model.revisions import bump_user
 
 router = APIRouter()
 
@@ -26,19 +29,22 @@ class Settings(BaseModel):
     mapProvider: str = Field("google", min_length=2, max_length=32)
     voiceMode: Optional[str] = Field(None, min_length=2, max_length=32)
 
-@router.get("/settings")
-def get_settings(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
-    settings = db.query(UserSettings).filter(UserSettings.user_id == current_user.id).first()
-    if not settings:
-        return Settings(email=current_user.email).dict()
-    return {
-        "email": current_user.email,
-        "theme": settings.theme,
-        "language": settings.language,
-        "notifications": settings.notifications,
-        "mapProvider": settings.mapProvider,
-        "voiceMode": settings.voiceMode
-    }
+@router.get("/settings", dependencies=[Depends(ratelimit.limit_user("read"))])
+def get_settings(request: Request, current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+    def build():
+        settings = db.query(UserSettings).filter(UserSettings.user_id == current_user.id).first()
+        if not settings:
+            return Settings(email=current_user.email).dict(), None
+        return {
+            "email": current_user.email,
+            "theme": settings.theme,
+            "language": settings.language,
+            "notifications": settings.notifications,
+            "mapProvider": settings.mapProvider,
+            "voiceMode": settings.voiceMode
+        }, None
+    # The user's revision is bumped by set_settings (and by any other write to the account)
+    return cached_json(request, "settings", current_user.id, current_user.revision, (), build)
 
 @router.post("/settings")
 def set_settings(settings: Settings, current_user=Depends(get_current_user), db: Session = Depends(get_db)):
@@ -51,5 +57,6 @@ def set_settings(settings: Settings, current_user=Depends(get_current_user), db:
     db_settings.notifications = settings.notifications
     db_settings.mapProvider = settings.mapProvider
     db_settings.voiceMode = settings.voiceMode
+    bump_user(db, current_user.id)
     db.commit()
     return {"ok": True}
@@ -1,10 +1,16 @@
 # FastAPI backend for GDPR-compliant user data management
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, EmailStr, Field
 from typing import List
 from sqlalchemy.orm import Session
-from model.db import SessionLocal, User, ChatMemory, init_db
+from model.db import SessionLocal, User, init_db
+from model.export import iter_export
+from model.bulk_import import import_chats, ImportFormatError
+from model.deletion import delete_user_data
 from api.auth import get_current_user
+from api.project import vector_cleaner
+from api import ratelimit
 
 router = APIRouter()
 
@@ -18,30 +24,50 @@ def get_db():
     finally:
         db.close()
 
+# Sessions for work that outlives the request (the streamed export); a dependency so tests can override it
+def get_session_factory():
+    return SessionLocal
+
 class ChatExport(BaseModel):
     email: EmailStr
     chats: List[dict] = Field(..., min_length=0, max_length=100)
 
-@router.get("/export-data")
-def export_data(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
-    chats = db.query(ChatMemory).filter(ChatMemory.user_id == current_user.id).all()
-    return {"chats": [{"project_id": c.project_id, "messages": c.messages} for c in chats]}
+@router.get("/export-data", dependencies=[Depends(ratelimit.limit_user("bulk"))])
+def export_data(format: str = Query("json", pattern=r"^(json|ndjson)$"), current_user=Depends(get_current_user),
+                session_factory=Depends(get_session_factory)):
+    # Streamed from its own session: the response outlives the request's dependencies
+    user_id = current_user.id
+
+    def body():
+        db = session_factory()
+        try:
+            yield from iter_export(db, user_id, format)
+        finally:
+            db.close()
 
-@router.post("/import-data")
+    media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+    return StreamingResponse(body(), media_type=media_type)
+
+@router.post("/import-data", dependencies=[Depends(ratelimit.limit_user("bulk"))])
 def import_data(export: ChatExport, current_user=Depends(get_current_user), db: Session = Depends(get_db)):
     for chat in export.chats:
         project_id = chat.get("project_id", "default")
+        if isinstance(project_id, int) and not isinstance(project_id, bool):
+            project_id = str(project_id)
         if not isinstance(project_id, str) or not 1 <= len(project_id) <= 64:
             raise HTTPException(status_code=400, detail="Invalid project_id in import")
         messages = chat.get("messages", [])
         if not isinstance(messages, list) or len(messages) > 1000:
             raise HTTPException(status_code=400, detail="Invalid messages in import")
-        db.add(ChatMemory(user_id=current_user.id, project_id=project_id, messages=messages))
-    db.commit()
-    return {"ok": True}
+    # Multi-row INSERTs into chat_messages, all chats in one transaction
+    try:
+        counts = import_chats(db, current_user.id, export.chats)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid messages in import: {e}")
+    return {"ok": True, **counts}
 
-@router.post("/delete-data")
+@router.post("/delete-data", dependencies=[Depends(ratelimit.limit_user("bulk"))])
 def delete_data(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
-    db.query(ChatMemory).filter(ChatMemory.user_id == current_user.id).delete()
-    db.commit()
-    return {"ok": True}
+    counts = delete_user_data(db, current_user.id)
+    vector_cleaner.wake()
+    return {"ok": True, "deleted": counts}
@@ -1,57 +1,44 @@
 import os
-import importlib
-import sys
-import types
+import threading
 import uuid
-from typing import Dict, Any
 from model.memory import ChatMemory
-from model.llm import LocalLLM
-from model.semantic_memory import SemanticMemory
+from model.context import ContextBuilder
+from model.summarizer import ConversationSummarizer, extractive_summary, llm_summarizer
+from model import response_cache, bulk_import
+from model.warmup import BackgroundResource
+from plugins._manager import PluginManager
 
-PLUGINS_DIR = os.path.join(os.path.dirname(__file__), 'plugins')
+LLM_MODEL = "microsoft/phi-2"  # You can change to another small model if needed
+# Optional smaller model of the same family for speculative decoding, e.g. when LLM_MODEL is a larger checkpoint
+DRAFT_MODEL = os.environ.get("MAZGPT_DRAFT_MODEL") or None
+MAX_NEW_TOKENS = 128
+HISTORY_TURNS = 200  # candidates for the context builder, which keeps what fits the token budget
+RETRIEVAL_TURNS = 10  # recent turns used as the semantic recall query
+# Models load on a background thread while the prompt is already usable; MAZGPT_WARMUP=0 defers them to first use
+WARMUP = os.environ.get("MAZGPT_WARMUP", "1") != "0"
+# Older turns are compacted into rolling summaries: "llm" uses the model once it is loaded, "extractive" never does
+SUMMARIZER = os.environ.get("MAZGPT_SUMMARIZER", "llm")
 
-class PluginManager:
-    def __init__(self):
-        self.plugins: Dict[str, Any] = {}
-        self.metadata: Dict[str, dict] = {}
-        self.load_plugins()
+def load_llm():
+    # Imported here: torch/transformers dominate CLI import time
+    from model.llm import LocalLLM
+    return LocalLLM(model_name=LLM_MODEL, draft_model=DRAFT_MODEL)
 
-    def load_plugins(self):
-        self.plugins.clear()
-        self.metadata.clear()
-        sys.path.insert(0, PLUGINS_DIR)
-        for fname in os.listdir(PLUGINS_DIR):
-            if fname.endswith('.py') and not fname.startswith('_'):
-                mod_name = fname[:-3]
-                try:
-                    if mod_name in sys.modules:
-                        # Reload if already loaded
-                        module = importlib.reload(sys.modules[mod_name])
-                    else:
-                        module = importlib.import_module(f'plugins.{mod_name}')
-                    if hasattr(module, 'register'):
-                        plugin = module.register()
-                        self.plugins[mod_name] = plugin
-                        # Plugin metadata: docstring or .meta attribute
-                        meta = getattr(plugin, 'meta', {})
-                        if not meta and hasattr(plugin, '__doc__'):
-                            meta = {'description': plugin.__doc__}
-                        self.metadata[mod_name] = meta
-                except Exception as e:
-                    print(f"Error loading plugin {mod_name}: {e}")
-        sys.path.pop(0)
+def load_semantic_memory():
+    # Imported here: chromadb/sentence-transformers are nearly as heavy as the LLM
+    from model.semantic_memory import SemanticMemory
+    return SemanticMemory()
 
-    def reload_plugins(self):
-        self.load_plugins()
+def _announce_wait(name):
+    print(f'(still loading {name}, one moment...)', flush=True)
 
-    def get_plugin(self, name):
-        return self.plugins.get(name)
-
-    def list_plugins(self):
-        return list(self.plugins.keys())
-
-    def get_metadata(self, name):
-        return self.metadata.get(name, {})
+def _store_when_ready(semantic_memory_loader, turns, project_id):
+    # Turns answered before the embedder finished loading reach semantic memory once it has
+    def store():
+        semantic_memory = semantic_memory_loader.get()
+        for sender, text in turns:
+            semantic_memory.add_message(message_id=str(uuid.uuid4()), text=text, metadata={"user": sender}, project_id=project_id)
+    threading.Thread(target=store, name="deferred-store", daemon=True).start()
 
 def basic_ai_response(user_input):
     # Placeholder for basic AI response logic
@@ -61,8 +48,18 @@ def main():
     print('Welcome to MazGPT!')
     plugin_manager = PluginManager()
     memory = ChatMemory()
-    semantic_memory = SemanticMemory()
-    llm = LocalLLM(model_name="microsoft/phi-2")  # You can change to another small model if needed
+    semantic_memory_loader = BackgroundResource("semantic memory", load_semantic_memory, start=WARMUP)
+    # Once the tokenizer is available, new turns are sized at ingest so prompt assembly never re-tokenizes them
+    llm_loader = BackgroundResource(
+        "language model", load_llm, start=WARMUP,
+        on_ready=lambda llm: memory.register_token_counter(llm.tokenizer_id, llm.count_tokens),
+    )
+    def summarize(lines):
+        llm = llm_loader.get_if_ready() if SUMMARIZER == "llm" else None
+        return llm_summarizer(llm)(lines) if llm else extractive_summary(lines)
+    summarizer = ConversationSummarizer(memory, summarize=summarize)
+    # Opt-in (MAZGPT_RESPONSE_CACHE=1): repeated questions are answered without running the model
+    reply_cache = response_cache.ResponseCache() if response_cache.ENABLED else None
     projects = {'default': 'Default'}
     current_project = 'default'
     preferences = {"language": "en", "tone": "friendly"}
@@ -71,7 +68,10 @@ def main():
         user_input = input(f'[{projects.get(current_project, current_project)}] You: ')
         if user_input.lower() in ('exit', 'quit', '/bye'):
             print('MazGPT: Goodbye!')
-            semantic_memory.persist()
+            semantic_memory = semantic_memory_loader.get_if_ready()
+            if semantic_memory:
+                semantic_memory.persist()
+            plugin_manager.shutdown()
             break
         if user_input.lower().startswith('/prefs'):
             parts = user_input.strip().split()
@@ -114,6 +114,15 @@ def main():
                     del projects[pid]
                     if current_project == pid:
                         current_project = 'default'
+                    memory.clear(project_id=pid)
+                    summarizer.reset(pid)
+                    if reply_cache:
+                        reply_cache.clear(pid)
+                    # Its vectors are removed in batches on a background thread
+                    threading.Thread(
+                        target=lambda pid=pid: semantic_memory_loader.get().delete_project(pid),
+                        name="project-vector-delete", daemon=True,
+                    ).start()
                     print(f'Project deleted: {pid}')
                 else:
                     print(f'Project not found: {pid}')
@@ -142,6 +151,9 @@ def main():
             continue
         if user_input.lower() == '/newchat':
             memory.clear(project_id=current_project)
+            summarizer.reset(current_project)
+            if reply_cache:
+                reply_cache.clear(current_project)
             print('Started a new chat for this project.')
             continue
         if user_input.lower().startswith('/search '):
@@ -163,17 +175,25 @@ def main():
         if user_input.lower().startswith('/import '):
             filename = user_input[len('/import '):].strip()
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    import json
-                    msgs = json.load(f)
-                if isinstance(msgs, list):
-                    for m in msgs:
-                        memory.add(m.get('user', 'user'), m.get('message', ''), project_id=current_project)
-                    print(f'Imported {len(msgs)} messages into current chat.')
-                else:
-                    print('Invalid import file.')
+                # Checked in full before anything is saved, then streamed from disk again and saved in
+                # chunks; a JSON array or NDJSON file of messages
+                bulk_import.validate_message_file(filename)
+                entries = bulk_import.import_into_memory(memory, bulk_import.iter_message_file(filename), project_id=current_project)
+                print(f'Imported {len(entries)} messages into current chat.')
+            except bulk_import.ImportFormatError as e:
+                print(f'Invalid import file: {e}')
+                continue
             except Exception as e:
                 print(f'Import failed: {e}')
+                continue
+            if entries:
+                # Embedding is deferred to a background thread and done in batches
+                threading.Thread(
+                    target=lambda entries=entries, project=current_project: bulk_import.index_entries(
+                        semantic_memory_loader.get(), entries, project_id=project),
+                    name="import-indexer", daemon=True,
+                ).start()
+                print('Indexing them for semantic recall in the background.')
             continue
         if user_input.lower() == '/plugins':
             print('Loaded plugins:')
@@ -193,36 +213,62 @@ def main():
             continue
         if user_input.lower() == '/clearhistory':
             memory.clear(project_id=current_project)
+            summarizer.reset(current_project)
+            if reply_cache:
+                reply_cache.clear(current_project)
             print('Chat history cleared.')
             continue
         if user_input.lower().startswith('/recall '):
             query = user_input[len('/recall '):]
+            semantic_memory = semantic_memory_loader.get(_announce_wait)
             results = semantic_memory.query(query, project_id=current_project)
             print('Most relevant past messages:')
             for doc, meta, score in results:
                 print(f"- [{meta.get('user', '?')}] {doc} (score: {score:.3f})")
             continue
         if user_input.lower() == '/askllm':
-            context = memory.get_context_window(max_turns=10, max_chars=2000, project_id=current_project)
+            semantic_memory = semantic_memory_loader.get(_announce_wait)
+            llm = llm_loader.get(_announce_wait)
+            history = summarizer.recent_history(current_project, HISTORY_TURNS)
             semantic_results = semantic_memory.query(
-                " ".join([entry['message'] for entry in context]), n_results=3, project_id=current_project
+                " ".join([entry['message'] for entry in history[-RETRIEVAL_TURNS:]]), n_results=3, project_id=current_project
             )
             semantic_context = [doc for doc, meta, score in semantic_results]
-            prompt = "\n".join(semantic_context + [f"{entry['user']}: {entry['message']}" for entry in context])
+            language, tone = preferences.get("language", "en"), preferences.get("tone", "friendly")
+            prompt, _ = ContextBuilder.for_llm(llm, max_new_tokens=MAX_NEW_TOKENS).build(
+                llm.build_system_prompt(language, tone), history, semantic_context,
+                summaries=summarizer.summaries(current_project)
+            )
             print("MazGPT (streaming): ", end="", flush=True)
-            llm.generate(prompt, stream=True, language=preferences.get("language", "en"), tone=preferences.get("tone", "friendly"))
+            llm.generate(prompt, max_new_tokens=MAX_NEW_TOKENS, stream=True, language=language, tone=tone)
             print()  # Newline after streaming
             continue
+        # First, try built-in AI responses
+        ai_response = basic_ai_response(user_input)
+        # Then, try plugins: dispatch runs in the background so plugin I/O overlaps with the embedding and retrieval below
+        plugin_future = None if ai_response else plugin_manager.dispatch_async(user_input)
+        if plugin_future is not None and not semantic_memory_loader.ready and plugin_manager.candidates(user_input):
+            # Plugin commands (/listfiles, /upload, ...) need no model: wait for the plugin, not the embedder
+            name, response = plugin_future.result()
+            if response:
+                print(f'{name}: {response}')
+                memory.add('user', user_input, project_id=current_project)
+                memory.add(name, response, project_id=current_project)
+                _store_when_ready(semantic_memory_loader, [('user', user_input), (name, response)], current_project)
+                summarizer.schedule(current_project)
+                continue
+        semantic_memory = semantic_memory_loader.get(_announce_wait)
+        # Embedded once: the same vector is stored and used for the response-cache lookup
+        input_embedding = semantic_memory.embed(user_input)
         msg_id = str(uuid.uuid4())
         semantic_memory.add_message(
             message_id=msg_id,
             text=user_input,
             metadata={"user": "user"},
-            project_id=current_project
+            project_id=current_project,
+            embedding=input_embedding
         )
         memory.add('user', user_input, project_id=current_project)
-        # First, try built-in AI responses
-        ai_response = basic_ai_response(user_input)
         if ai_response:
             msg_id = str(uuid.uuid4())
             semantic_memory.add_message(
@@ -233,33 +279,41 @@ def main():
             )
             memory.add('MazGPT', ai_response, project_id=current_project)
             continue
-        # Then, try plugins
-        for name, plugin in plugin_manager.plugins.items():
-            if hasattr(plugin, 'handle'):
-                response = plugin.handle(user_input)
-                if response:
-                    print(f'{name}: {response}')
-                    msg_id = str(uuid.uuid4())
-                    semantic_memory.add_message(
-                        message_id=msg_id,
-                        text=response,
-                        metadata={"user": name},
-                        project_id=current_project
-                    )
-                    memory.add(name, response, project_id=current_project)
-                    break
+        history = summarizer.recent_history(current_project, HISTORY_TURNS)
+        semantic_results = semantic_memory.query(
+            " ".join([entry['message'] for entry in history[-RETRIEVAL_TURNS:]]), n_results=3, project_id=current_project
+        )
+        name, response = plugin_future.result()
+        if response:
+            print(f'{name}: {response}')
+            msg_id = str(uuid.uuid4())
+            semantic_memory.add_message(
+                message_id=msg_id,
+                text=response,
+                metadata={"user": name},
+                project_id=current_project
+            )
+            memory.add(name, response, project_id=current_project)
         else:
             # Advanced reasoning: if user_input contains certain keywords, add reasoning instruction
             reasoning_instruction = ""
             if any(word in user_input.lower() for word in ["explain", "why", "how", "step by step", "summarize", "reasoning", "logic", "analyze", "analyze this", "break down"]):
                 reasoning_instruction = "\nExplain your reasoning step by step."
-            context = memory.get_context_window(max_turns=10, max_chars=2000, project_id=current_project)
-            semantic_results = semantic_memory.query(
-                " ".join([entry['message'] for entry in context]), n_results=3, project_id=current_project
-            )
             semantic_context = [doc for doc, meta, score in semantic_results]
-            prompt = "\n".join(semantic_context + [f"{entry['user']}: {entry['message']}" for entry in context])
-            llm_output = llm.generate(prompt + f"\nuser: {user_input}\nMazGPT:" + reasoning_instruction, language=preferences.get("language", "en"), tone=preferences.get("tone", "friendly"))
+            language, tone = preferences.get("language", "en"), preferences.get("tone", "friendly")
+            cache_key = (LLM_MODEL, f"{language}:{tone}:{bool(reasoning_instruction)}")
+            llm_output = None
+            if reply_cache:
+                llm_output = reply_cache.get(*cache_key, user_input, project_id=current_project, embedding=input_embedding)
+            if llm_output is None:
+                llm = llm_loader.get(_announce_wait)
+                prompt, _ = ContextBuilder.for_llm(llm, max_new_tokens=MAX_NEW_TOKENS).build(
+                    llm.build_system_prompt(language, tone), history, semantic_context, user_input, reasoning_instruction,
+                    summaries=summarizer.summaries(current_project)
+                )
+                llm_output = llm.generate(prompt, max_new_tokens=MAX_NEW_TOKENS, language=language, tone=tone)
+                if reply_cache:
+                    reply_cache.put(*cache_key, user_input, llm_output, project_id=current_project, embedding=input_embedding)
             print(f"MazGPT: {llm_output}")
             msg_id = str(uuid.uuid4())
             semantic_memory.add_message(
@@ -269,6 +323,8 @@ def main():
                 project_id=current_project
             )
             memory.add('MazGPT', llm_output, project_id=current_project)
+        # Compact turns that aged out of the verbatim window while the user types the next message
+        summarizer.schedule(current_project)
 
 if __name__ == '__main__':
     main()
@@ -81,6 +81,18 @@ export default function BubbleChat({
     // eslint-disable-next-line
   }, [projectId, user]);
 
+  // --- Helper: Poll a generation job until the reply is ready ---
+  const waitForJob = async (jobId, intervalMs = 750) => {
+    for (;;) {
+      const res = await fetchWithAuth(`/chat/jobs/${jobId}`);
+      if (!res.ok) throw new Error("Failed to fetch reply");
+      const job = await res.json();
+      if (job.status === "done") return job;
+      if (job.status === "failed") throw new Error(job.error || "Failed to generate reply");
+      await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+  };
+
   // --- Send message to backend and get AI response ---
   const handleSend = async (e) => {
     e.preventDefault();
@@ -98,8 +110,9 @@ export default function BubbleChat({
         body: JSON.stringify({ project_id: projectId, message: input })
       });
       if (!res.ok) throw new Error("Failed to send message");
-      const data = await res.json();
-      setMessages([...messages, { sender: "user", text: input }, { sender: "ai", text: data.reply }]);
+      const { job_id } = await res.json();
+      const job = await waitForJob(job_id);
+      setMessages([...messages, { sender: "user", text: input }, { sender: "ai", text: job.reply }]);
     } catch (err) {
       setError(err.message || "Failed to send message");
     } finally {
@@ -0,0 +1,117 @@
+# Load balancing of generate calls across model replicas, with load shedding when all are busy
+import threading
+import time
+from model.metrics import REGISTRY, QUEUE_WAIT_SECONDS
+
+EWMA_ALPHA = 0.2          # weight of the newest latency sample
+INITIAL_LATENCY = 5.0     # seconds assumed for a replica that has not served anything yet
+
+MODEL_IN_FLIGHT = REGISTRY.gauge(
+    "mazgpt_model_in_flight", "Requests running or queued per model replica", ["model", "replica"])
+MODEL_LATENCY_EWMA = REGISTRY.gauge(
+    "mazgpt_model_latency_ewma_seconds", "Moving-average generate latency per model replica", ["model", "replica"])
+MODEL_REJECTED = REGISTRY.counter(
+    "mazgpt_model_rejected_total", "Requests shed because every eligible replica was saturated", ["skill"])
+
+
+class ModelOverloadedError(RuntimeError):
+    """Raised when every replica able to serve a request is at capacity; the API maps it to 503."""
+
+    def __init__(self, skill, models, retry_after):
+        self.skill = skill
+        self.models = list(models)
+        self.retry_after = max(1, int(round(retry_after)))
+        super().__init__(
+            f"All models for skill '{skill}' are busy ({', '.join(self.models) or 'none'}); "
+            f"retry in about {self.retry_after}s"
+        )
+
+
+class Replica:
+    """One model instance: at most max_concurrency generate calls run, up to max_queue more wait."""
+
+    def __init__(self, model, index, backend, cost=1.0, max_concurrency=1, max_queue=4):
+        self.model = model
+        self.index = index
+        self.backend = backend
+        self.cost = cost
+        self.max_concurrency = max_concurrency
+        self.capacity = max_concurrency + max_queue
+        self.in_flight = 0
+        self.latency = INITIAL_LATENCY
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight_gauge = MODEL_IN_FLIGHT.labels(model, str(index))
+        self._latency_gauge = MODEL_LATENCY_EWMA.labels(model, str(index))
+        self._latency_gauge.set(self.latency)
+
+    @property
+    def saturated(self):
+        return self.in_flight >= self.capacity
+
+    def expected_wait(self):
+        """Seconds until a new request would finish here, from queue depth and moving-average latency."""
+        return (self.in_flight // self.max_concurrency + 1) * self.latency
+
+    def reserve(self):
+        with self._lock:
+            self.in_flight += 1
+        self._in_flight_gauge.inc()
+
+    def run(self, method, *args, **kwargs):
+        """Calls backend.<method> once a slot is free; the caller must already have reserved the replica."""
+        queued_at = time.perf_counter()
+        try:
+            with self._slots:
+                start = time.perf_counter()
+                QUEUE_WAIT_SECONDS.labels(self.model).observe(start - queued_at)
+                result = getattr(self.backend, method)(*args, **kwargs)
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.latency += EWMA_ALPHA * (elapsed - self.latency)
+                self._latency_gauge.set(self.latency)
+                return result
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._in_flight_gauge.dec()
+
+
+class LoadBalancer:
+    """
+    Picks, among the replicas of the eligible models, the one with the lowest cost-weighted expected
+    completion time (queue depth x moving-average latency x model cost). A cheaper model therefore
+    keeps the traffic until its queue is long enough that a pricier one would finish sooner per unit
+    of cost. When every replica is at capacity the request is shed with ModelOverloadedError.
+    """
+
+    def __init__(self):
+        self.replicas = {}
+        self._lock = threading.Lock()
+
+    def add(self, replica):
+        self.replicas.setdefault(replica.model, []).append(replica)
+
+    def acquire(self, models, skill="general"):
+        with self._lock:
+            candidates = [r for m in models for r in self.replicas.get(m, ())]
+            available = [r for r in candidates if not r.saturated]
+            if not available:
+                MODEL_REJECTED.labels(skill).inc()
+                retry_after = min((r.expected_wait() for r in candidates), default=INITIAL_LATENCY)
+                raise ModelOverloadedError(skill, models, retry_after)
+            replica = min(available, key=lambda r: (r.expected_wait() * r.cost, r.in_flight))
+            replica.reserve()
+            return replica
+
+    def generate(self, models, *args, skill="general", **kwargs):
+        """Returns (model_name, output) from the least-loaded eligible replica."""
+        replica = self.acquire(models, skill)
+        return replica.model, replica.run("generate", *args, **kwargs)
+
+    def stats(self):
+        return [
+            {"model": r.model, "replica": r.index, "in_flight": r.in_flight, "capacity": r.capacity,
+             "latency_ewma": round(r.latency, 3), "cost": r.cost}
+            for replicas in self.replicas.values() for r in replicas
+        ]
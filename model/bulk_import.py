@@ -0,0 +1,224 @@
+# Bulk import of chat messages for /user/import-data and the CLI /import command
+import datetime
+import json
+import logging
+import uuid
+from model.metrics import REGISTRY, stage_timer
+
+CHUNK_ROWS = 1000     # rows per bulk INSERT / per memory-file save
+EMBED_BATCH = 64      # texts per embedding call when indexing imported messages
+READ_SIZE = 64 * 1024
+MAX_MESSAGE_CHARS = 20000
+
+IMPORTED_ROWS = REGISTRY.counter(
+    "mazgpt_imported_rows_total", "Chat messages written by bulk imports", ["target"])
+
+
+class ImportFormatError(ValueError):
+    """The import data is not a list of chat messages in a supported shape."""
+
+
+# --- Parsing ---
+def iter_json_array(f, read_size=READ_SIZE):
+    """Yields the elements of a top-level JSON array from a text file without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = f.read(read_size)
+        if not chunk:
+            eof = True
+        buf, pos = buf[pos:] + chunk, 0
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    fill()
+    skip_ws()
+    if pos >= len(buf) or buf[pos] != "[":
+        raise ImportFormatError("Expected a JSON array")
+    pos += 1
+    first = True
+    while True:
+        skip_ws()
+        if pos >= len(buf):
+            raise ImportFormatError("Unexpected end of file")
+        if buf[pos] == "]":
+            return
+        if not first:
+            if buf[pos] != ",":
+                raise ImportFormatError(f"Expected ',' at offset {pos}")
+            pos += 1
+            skip_ws()
+        first = False
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ImportFormatError("Invalid JSON in import file")
+                fill()
+                continue
+            if end == len(buf) and not eof:
+                # A number at the end of the buffer may continue in the next chunk
+                fill()
+                continue
+            pos = end
+            yield value
+            break
+
+
+def iter_message_file(path):
+    """Yields the records of an import file: a JSON array of messages, or NDJSON (one message per line)."""
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        f.seek(0)
+        if head == "[":
+            yield from iter_json_array(f)
+        else:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        raise ImportFormatError(f"Invalid JSON on line {number}")
+
+
+def normalize_message(m):
+    """(sender, text, timestamp) from an exported message ({"sender", "text"}) or a memory entry ({"user", "message"})."""
+    if not isinstance(m, dict):
+        raise ImportFormatError("Each message must be an object")
+    sender = m.get("sender", m.get("user", "user"))
+    text = m.get("text", m.get("message", m.get("content")))
+    if not isinstance(sender, str) or not isinstance(text, str) or not text or len(text) > MAX_MESSAGE_CHARS:
+        raise ImportFormatError("Each message needs a sender and a non-empty text")
+    timestamp = m.get("timestamp")
+    if timestamp is not None and not isinstance(timestamp, str):
+        raise ImportFormatError("Message timestamps must be ISO strings")
+    return sender, text, timestamp
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _parse_time(timestamp, default):
+    try:
+        return datetime.datetime.fromisoformat(timestamp) if timestamp else default
+    except ValueError:
+        return default
+
+
+# --- SQL (chat_messages); SQLAlchemy is imported on use so the CLI does not pay for it at startup ---
+def resolve_project(db, user_id, key, create=True):
+    """The user's project for an imported chat: by id when ``key`` is one of theirs, else by name (created if missing)."""
+    from model.db import Project
+    project = None
+    if isinstance(key, int) or (isinstance(key, str) and key.isdigit()):
+        project = db.query(Project).filter(Project.user_id == user_id, Project.id == int(key)).first()
+    if project is None:
+        project = db.query(Project).filter(Project.user_id == user_id, Project.name == str(key)).first()
+    if project is None and create:
+        project = Project(user_id=user_id, name=str(key))
+        db.add(project)
+        db.flush()
+    return project
+
+
+def insert_messages(db, user_id, project_id, messages, chunk_rows=CHUNK_ROWS, commit_chunks=False):
+    """
+    Inserts normalized (sender, text, timestamp) tuples into chat_messages with one bulk INSERT per
+    chunk (a cached statement that SQLAlchemy sends as multi-row VALUES batches; a literal
+    insert().values([...]) recompiles thousands of parameters per chunk and is several times slower). With commit_chunks each chunk is committed, so an interrupted import keeps (and can
+    skip) the chunks already written; otherwise the caller commits once. Returns the row count.
+    """
+    from sqlalchemy import insert
+    from model.db import ChatMessage
+    from model.project_stats import record_messages, estimate_tokens
+    total = 0
+    for chunk in chunked(messages, chunk_rows):
+        now = datetime.datetime.utcnow()
+        rows = [{"project_id": project_id, "user_id": user_id, "sender": sender, "content": text, "version": 1,
+                 "created_at": _parse_time(timestamp, now), "updated_at": now}
+                for sender, text, timestamp in chunk]
+        with stage_timer("bulk_insert"):
+            db.execute(insert(ChatMessage), rows)
+            record_messages(db, project_id, len(rows), sum(estimate_tokens(r["content"]) for r in rows),
+                            max(r["created_at"] for r in rows))
+            if commit_chunks:
+                db.commit()
+        total += len(rows)
+        IMPORTED_ROWS.labels("chat_messages").inc(len(rows))
+    return total
+
+
+def import_chats(db, user_id, chats, chunk_rows=CHUNK_ROWS):
+    """
+    Imports [{"project_id", "messages"}] (the export format) into chat_messages in a single
+    transaction: either every chat is imported or, on a format error, nothing is.
+    Returns {"projects": n, "messages": n}.
+    """
+    counts = {"projects": 0, "messages": 0}
+    try:
+        for chat in chats:
+            project = resolve_project(db, user_id, chat.get("project_id", "default"))
+            messages = (normalize_message(m) for m in chat.get("messages") or [])
+            counts["messages"] += insert_messages(db, user_id, project.id, messages, chunk_rows)
+            counts["projects"] += 1
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return counts
+
+
+# --- CLI (model/memory.py JSON file + semantic memory) ---
+def validate_message_file(path):
+    """
+    Reads an import file through once without writing anything, so that a bad record near the end
+    is reported before the first chunk is saved. Raises ImportFormatError; returns the message count.
+    """
+    return sum(1 for _ in map(normalize_message, iter_message_file(path)))
+
+
+def import_into_memory(memory, records, project_id="default", chunk_rows=10 * CHUNK_ROWS):
+    """
+    Appends records to a ChatMemory, saving the file once per chunk instead of once per message.
+    Returns the imported entries (for semantic indexing).
+    """
+    entries = []
+    for chunk in chunked((normalize_message(r) for r in records), chunk_rows):
+        entries.extend(memory.add_many([(sender, text) for sender, text, _ in chunk], project_id=project_id))
+        IMPORTED_ROWS.labels("memory").inc(len(chunk))
+    return entries
+
+
+def index_entries(semantic_memory, entries, project_id="default", batch_size=EMBED_BATCH):
+    """Embeds imported memory entries in batches and writes each batch to the vector store in one call."""
+    indexed = 0
+    for batch in chunked(entries, batch_size):
+        semantic_memory.add_messages(
+            [str(uuid.uuid4()) for _ in batch],
+            [e['message'] for e in batch],
+            [{"user": e['user']} for e in batch],
+            project_id=project_id,
+        )
+        indexed += len(batch)
+    logging.info(f"Indexed {indexed} imported messages for semantic recall")
+    return indexed
@@ -0,0 +1,162 @@
+# Compressed cold storage for archived projects' chat messages (a separate SQLite file)
+import datetime
+import json
+import os
+import threading
+import zlib
+from collections import namedtuple
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, Index, create_engine, func
+from sqlalchemy.orm import declarative_base, sessionmaker
+from model.metrics import REGISTRY, stage_timer
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is used when zstandard is not installed
+    zstandard = None
+
+COLD_STORE_PATH = os.environ.get("MAZGPT_COLD_STORE", os.path.join("data", "cold_store.db"))
+SEGMENT_ROWS = 5000   # messages per compressed segment
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 6
+
+COLD_MESSAGES = REGISTRY.gauge(
+    "mazgpt_cold_messages", "Chat messages held in the compressed cold store")
+COLD_BYTES = REGISTRY.gauge(
+    "mazgpt_cold_store_bytes", "Compressed bytes held in the cold store", ["kind"])
+
+ColdBase = declarative_base()
+
+# Same fields the export/history code reads from chat_messages rows
+ColdMessage = namedtuple("ColdMessage", "id sender content version created_at updated_at")
+
+
+class ColdSegment(ColdBase):
+    __tablename__ = 'cold_segments'
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    project_id = Column(Integer, nullable=False)
+    first_message_id = Column(Integer, nullable=False)  # ids the messages had in chat_messages
+    last_message_id = Column(Integer, nullable=False)
+    message_count = Column(Integer, nullable=False)
+    codec = Column(String, nullable=False)  # "zstd" or "zlib"
+    raw_bytes = Column(Integer, nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_cold_segments_project_id', 'project_id', 'first_message_id'),
+    )
+
+
+def _compress(raw):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, ZLIB_LEVEL)
+
+
+def _decompress(codec, payload):
+    if codec == "zlib":
+        return zlib.decompress(payload)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Cold segment is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError(f"Unknown cold segment codec '{codec}'")
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _parse(value):
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+class ColdStore:
+    """
+    Archived messages, packed per project into segments of up to SEGMENT_ROWS messages that are
+    JSON-encoded and compressed (zstd when available, zlib otherwise; the codec is recorded per
+    segment). Segments are only ever written whole and read sequentially, which keeps the hot
+    chat_messages table and its indexes free of conversations nobody is reading.
+    """
+
+    def __init__(self, path=COLD_STORE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        ColdBase.metadata.create_all(bind=self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        self.refresh_metrics()
+
+    def has_segment(self, project_id, first_message_id, last_message_id):
+        with self.Session() as db:
+            return db.query(ColdSegment.id).filter(
+                ColdSegment.project_id == project_id, ColdSegment.first_message_id == first_message_id,
+                ColdSegment.last_message_id == last_message_id).first() is not None
+
+    def write_segment(self, user_id, project_id, rows):
+        """Stores chat_messages rows (ordered by id) as one compressed segment; returns its compressed size."""
+        raw = json.dumps([[r.id, r.sender, r.content, r.version, _iso(r.created_at), _iso(r.updated_at)]
+                          for r in rows], separators=(",", ":")).encode("utf-8")
+        with stage_timer("cold_write"):
+            codec, payload = _compress(raw)
+            with self.Session() as db:
+                db.add(ColdSegment(user_id=user_id, project_id=project_id, first_message_id=rows[0].id,
+                                   last_message_id=rows[-1].id, message_count=len(rows), codec=codec,
+                                   raw_bytes=len(raw), payload=payload))
+                db.commit()
+        COLD_MESSAGES.inc(len(rows))
+        COLD_BYTES.labels("compressed").inc(len(payload))
+        COLD_BYTES.labels("raw").inc(len(raw))
+        return len(payload)
+
+    def iter_messages(self, project_id, newest_first=False):
+        """Yields a project's archived messages as ColdMessage tuples, oldest first, one segment in memory at a time."""
+        order = ColdSegment.first_message_id.desc() if newest_first else ColdSegment.first_message_id
+        with self.Session() as db:
+            ids = [sid for (sid,) in db.query(ColdSegment.id).filter(ColdSegment.project_id == project_id).order_by(order)]
+        for sid in ids:
+            with stage_timer("cold_read"), self.Session() as db:
+                segment = db.get(ColdSegment, sid)
+                records = json.loads(_decompress(segment.codec, segment.payload))
+            if newest_first:
+                records.reverse()
+            for mid, sender, content, version, created_at, updated_at in records:
+                yield ColdMessage(mid, sender, content, version, _parse(created_at), _parse(updated_at))
+
+    def message_count(self, project_id):
+        with self.Session() as db:
+            return db.query(func.coalesce(func.sum(ColdSegment.message_count), 0)) \
+                .filter(ColdSegment.project_id == project_id).scalar()
+
+    def drop_project(self, project_id):
+        """Deletes a project's segments; returns the number of messages they held."""
+        with self.Session() as db:
+            n = self.message_count(project_id)
+            db.query(ColdSegment).filter(ColdSegment.project_id == project_id).delete()
+            db.commit()
+        self.refresh_metrics()
+        return n
+
+    def refresh_metrics(self):
+        with self.Session() as db:
+            messages, raw, stored = db.query(
+                func.coalesce(func.sum(ColdSegment.message_count), 0),
+                func.coalesce(func.sum(ColdSegment.raw_bytes), 0),
+                func.coalesce(func.sum(func.length(ColdSegment.payload)), 0)).one()
+        COLD_MESSAGES.set(messages)
+        COLD_BYTES.labels("raw").set(raw)
+        COLD_BYTES.labels("compressed").set(stored)
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_cold_store():
+    """The process-wide ColdStore at MAZGPT_COLD_STORE, opened on first use."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = ColdStore()
+    return _default_store
@@ -0,0 +1,184 @@
+# Token-budgeted prompt context assembly for MazGPT
+import threading
+from collections import OrderedDict
+from model.metrics import stage_timer
+
+APPROX_TOKENIZER_ID = "approx"
+SEPARATOR_TOKENS = 1  # the newline joining prompt lines
+SUMMARY_PREFIX = "Earlier in this conversation: "
+
+
+def approx_token_count(text):
+    """Cheap stand-in when no tokenizer is loaded (roughly 4 characters per token for English)."""
+    return len(text) // 4 + 1
+
+
+def format_turn(entry):
+    return f"{entry['user']}: {entry['message']}"
+
+
+class TokenCountCache:
+    """
+    LRU of (tokenizer_id, turn text) -> token count. Kept beside the chat history rather than in its
+    entries, so counts never reach the persisted or exported history file.
+    """
+
+    def __init__(self, max_entries=65536):
+        self.max_entries = max_entries
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tokenizer_id, text):
+        key = (tokenizer_id, text)
+        with self._lock:
+            n = self._counts.get(key)
+            if n is not None:
+                self._counts.move_to_end(key)
+            return n
+
+    def put(self, tokenizer_id, text, n):
+        with self._lock:
+            self._counts[(tokenizer_id, text)] = n
+            if len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+
+
+# Shared by ChatMemory (counts each turn at ingest) and every ContextBuilder
+TOKEN_COUNTS = TokenCountCache()
+
+
+class ContextBuilder:
+    """
+    Fits system prompt + summaries + semantic hits + recent turns + user input into a model's context window.
+
+    Budget = max_context_tokens - max_new_tokens. The system prompt and the user input are always
+    kept (the input is truncated if it alone would overflow). Summaries of older turns come next,
+    newest first, up to summary_share of what is left. Recent turns are added newest-first
+    while leaving semantic_share of the remainder free; semantic hits then fill that space in rank
+    order, and anything they leave unused goes to older turns. Selection depends only on the
+    inputs, so the same history always yields the same prompt.
+    """
+
+    def __init__(self, count_tokens=approx_token_count, max_context_tokens=2048, max_new_tokens=128,
+                 tokenizer_id=APPROX_TOKENIZER_ID, truncate=None, semantic_share=0.25,
+                 summary_share=0.3, token_counts=None):
+        self.count_tokens = count_tokens
+        self.token_counts = token_counts or TOKEN_COUNTS
+        self.max_context_tokens = max_context_tokens
+        self.max_new_tokens = max_new_tokens
+        self.tokenizer_id = tokenizer_id
+        self.truncate = truncate
+        self.semantic_share = semantic_share
+        self.summary_share = summary_share
+
+    @classmethod
+    def for_llm(cls, llm, max_new_tokens=128, **kwargs):
+        return cls(
+            count_tokens=llm.count_tokens,
+            max_context_tokens=llm.max_context_tokens,
+            max_new_tokens=max_new_tokens,
+            tokenizer_id=llm.tokenizer_id,
+            truncate=llm.truncate_tokens,
+            **kwargs,
+        )
+
+    @property
+    def budget(self):
+        return max(0, self.max_context_tokens - self.max_new_tokens)
+
+    def entry_tokens(self, entry):
+        """Token count of a stored turn, using (and filling) the shared per-tokenizer cache."""
+        line = format_turn(entry)
+        n = self.token_counts.get(self.tokenizer_id, line)
+        if n is None:
+            n = self.count_tokens(line)
+            self.token_counts.put(self.tokenizer_id, line, n)
+        return n
+
+    def _truncate(self, text, n_tokens):
+        if n_tokens <= 0:
+            return ""
+        if self.truncate is not None:
+            return self.truncate(text, n_tokens)
+        # Keep the tail: the end of a long message usually carries the actual question
+        total = self.count_tokens(text)
+        return text[-max(1, len(text) * n_tokens // max(total, 1)):]
+
+    def build(self, system_prompt, history, semantic_docs=(), user_input=None, instruction="", summaries=()):
+        """
+        Returns (prompt, stats); ``prompt`` excludes the system prompt, which the model prepends.
+        ``summaries`` (oldest first) stand in for turns no longer passed in ``history``.
+        """
+        with stage_timer("context_build"):
+            return self._build(system_prompt, list(history), list(semantic_docs), user_input, instruction, list(summaries))
+
+    def _build(self, system_prompt, history, semantic_docs, user_input, instruction, summaries):
+        stats = {"budget": self.budget, "system": self.count_tokens(system_prompt) if system_prompt else 0}
+        remaining = self.budget - stats["system"]
+
+        # The current message is usually already in history; it is emitted once, at the end
+        if user_input is not None and history and history[-1].get('user') == 'user' and history[-1].get('message') == user_input:
+            history = history[:-1]
+        tail = ""
+        if user_input is not None:
+            tail = f"user: {user_input}\nMazGPT:" + instruction
+            tail_tokens = self.count_tokens(tail)
+            if tail_tokens > remaining:
+                overhead = tail_tokens - self.count_tokens(user_input)
+                tail = f"user: {self._truncate(user_input, remaining - overhead)}\nMazGPT:" + instruction
+                tail_tokens = self.count_tokens(tail)
+            stats["user"] = tail_tokens
+            remaining -= tail_tokens
+        remaining = max(0, remaining)
+
+        # Summaries of older turns, newest first so the most recent context survives a tight budget
+        summary_lines, summary_used = [], 0
+        for text in reversed(summaries):
+            n = self.count_tokens(SUMMARY_PREFIX + text) + SEPARATOR_TOKENS
+            if summary_used + n > remaining * self.summary_share:
+                break
+            summary_lines.append(SUMMARY_PREFIX + text)
+            summary_used += n
+        summary_lines.reverse()
+        remaining -= summary_used
+
+        # Recent turns first, newest to oldest, leaving semantic_share of the budget for semantic hits
+        reserve = int(remaining * self.semantic_share)
+        turns, history_used = [], 0
+        idx = len(history) - 1
+        while idx >= 0:
+            n = self.entry_tokens(history[idx]) + SEPARATOR_TOKENS
+            if history_used + n > remaining - reserve:
+                break
+            turns.append(format_turn(history[idx]))
+            history_used += n
+            idx -= 1
+
+        # Semantic hits in rank order, skipping ones already present verbatim as a selected turn
+        chosen = {history[i].get('message') for i in range(idx + 1, len(history))}
+        semantic, semantic_used = [], 0
+        for doc in semantic_docs:
+            if doc in chosen or doc in semantic:
+                continue
+            n = self.count_tokens(doc) + SEPARATOR_TOKENS
+            if history_used + semantic_used + n > remaining:
+                continue
+            semantic.append(doc)
+            semantic_used += n
+
+        # Whatever the hits left unused goes to older turns
+        while idx >= 0:
+            n = self.entry_tokens(history[idx]) + SEPARATOR_TOKENS
+            if history_used + semantic_used + n > remaining:
+                break
+            turns.append(format_turn(history[idx]))
+            history_used += n
+            idx -= 1
+        turns.reverse()
+
+        stats.update(summary=summary_used, summaries=len(summary_lines), semantic=semantic_used, history=history_used, turns=len(turns), semantic_hits=len(semantic))
+        stats["total"] = stats["system"] + stats.get("user", 0) + summary_used + semantic_used + history_used
+        lines = summary_lines + semantic + turns
+        if tail:
+            lines.append(tail)
+        return "\n".join(lines), stats
@@ -2,8 +2,14 @@
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import Engine
+from model.metrics import DB_QUERY_SECONDS
+from model.tracing import record_span
 import datetime
+import logging
+import os
+import time
 
 Base = declarative_base()
 
@@ -18,6 +24,7 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     is_verified = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    revision = Column(Integer, nullable=False, default=0, server_default='0')  # bumped on writes; see model/revisions.py
 
     # Two-Factor Authentication (2FA) fields
     twofa_enabled = Column(Boolean, default=False)
@@ -45,6 +52,11 @@ class Project(Base):
     archived_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)  # removed index=True
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    # Maintained by model/project_stats.py in the same transaction as the messages
+    message_count = Column(Integer, nullable=False, default=0, server_default='0')
+    token_count = Column(Integer, nullable=False, default=0, server_default='0')
+    last_message_at = Column(DateTime, nullable=True)
+    revision = Column(Integer, nullable=False, default=0, server_default='0')  # bumped on writes; see model/revisions.py
 
     user = relationship('User')
     chat_memories = relationship('ChatMemory', back_populates='project')
@@ -52,6 +64,8 @@ class Project(Base):
     __table_args__ = (
         Index('ix_projects_user_id', 'user_id'),
         Index('ix_projects_created_at', 'created_at'),
+        # /project/list: one user's (un)archived projects, most recently active first
+        Index('ix_projects_user_id_archived_updated_at', 'user_id', 'archived', 'updated_at'),
     )
 
 class ChatMessage(Base):
@@ -72,23 +86,124 @@ class ChatMessage(Base):
         Index('ix_chat_messages_user_id', 'user_id'),
         Index('ix_chat_messages_project_id', 'project_id'),
         Index('ix_chat_messages_created_at', 'created_at'),
+        # History reads (one project, oldest first) without sorting the whole account
+        Index('ix_chat_messages_project_id_created_at', 'project_id', 'created_at'),
     )
 
 class ChatMemory(Base):
     __tablename__ = 'chat_memory'
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
     project_id = Column(Integer, ForeignKey('projects.id'), nullable=False)  # removed index=True
-    messages = Column(JSON, nullable=False)  # List of message dicts (legacy, for migration)
+    messages = Column(JSON, nullable=False)  # List of message dicts (legacy; moved to chat_messages by model/legacy_backfill.py)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
     user = relationship('User')
     project = relationship('Project', back_populates='chat_memories')
 
+class GenerationJob(Base):
+    # One queued reply per /chat/send; kept in SQLite so queued/running jobs survive a restart
+    __tablename__ = 'generation_jobs'
+    id = Column(String, primary_key=True)  # uuid4 hex, handed to the client
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    project_id = Column(Integer, ForeignKey('projects.id'), nullable=False)
+    user_message_id = Column(Integer, ForeignKey('chat_messages.id'), nullable=False)
+    reply_message_id = Column(Integer, ForeignKey('chat_messages.id'), nullable=True)
+    status = Column(String, nullable=False, default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    user_message = relationship('ChatMessage', foreign_keys=[user_message_id])
+    reply_message = relationship('ChatMessage', foreign_keys=[reply_message_id])
+
+    __table_args__ = (
+        Index('ix_generation_jobs_user_id', 'user_id'),
+        Index('ix_generation_jobs_status_created_at', 'status', 'created_at'),
+    )
+
+class VectorTombstone(Base):
+    # Vector-store entries still to be removed for a deleted project; drained by model.deletion.VectorCleaner
+    __tablename__ = 'vector_tombstones'
+    id = Column(Integer, primary_key=True)
+    project_key = Column(String, nullable=False)  # project_id as stored in the vector metadata
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    attempts = Column(Integer, default=0)
+    last_error = Column(String, nullable=True)
+
+class RevokedToken(Base):
+    # JWT denylist (logout); rows are useless once the token has expired and are purged by api.revocation
+    __tablename__ = 'revoked_tokens'
+    # AUTOINCREMENT: ids are never reused after a purge, so readers can fetch only rows newer than their snapshot
+    id = Column(Integer, primary_key=True)
+    jti = Column(String, nullable=False, unique=True)
+    expires_at = Column(Integer, nullable=False)  # the token's exp claim (unix seconds)
+    revoked_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_revoked_tokens_expires_at', 'expires_at'),
+        {'sqlite_autoincrement': True},
+    )
+
 engine = create_engine("sqlite:///mazgpt.db", connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Create tables if not exist
+# New database files return freed pages to the OS on demand (model.deletion.reclaim_space);
+# an existing file only switches mode after a one-off VACUUM
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.close()
+
+# --- Per-statement query timing (registered on Engine so test engines are covered too) ---
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if starts:
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        start, end = starts.pop(), time.perf_counter()
+        DB_QUERY_SECONDS.labels(operation).observe(end - start)
+        record_span(f"db.{operation.lower()}", start, end, statement=statement[:200])
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
+def _alembic_config(connection):
+    from alembic.config import Config
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "alembic"))
+    config.attributes["connection"] = connection
+    config.attributes["configure_logger"] = False
+    return config
+
+
+# Create tables in a new database file; an existing file is only ever changed by Alembic
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    from alembic import command
+    from alembic.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    with engine.begin() as conn:
+        config = _alembic_config(conn)
+        if not inspect(conn).get_table_names():
+            Base.metadata.create_all(bind=conn)
+            command.stamp(config, "head")  # a new file already has every migration's schema
+            return
+        current = MigrationContext.configure(conn).get_current_revision()
+        head = ScriptDirectory.from_config(config).get_current_head()
+    if current != head:
+        logging.error(f"Database schema is at revision {current}, this code needs {head}: "
+                      f"run `alembic upgrade head` (see alembic/README)")
@@ -0,0 +1,176 @@
+# Chunked deletion of a project's (or account's) chat data, with background cleanup of its vectors
+import logging
+import os
+import threading
+from sqlalchemy import delete, select, text
+import model.db
+from model import project_stats
+from model.cold_store import get_cold_store
+from model.db import ChatMessage, ChatMemory, GenerationJob, Project, VectorTombstone
+from model.metrics import REGISTRY, stage_timer
+
+CHUNK_ROWS = int(os.environ.get("MAZGPT_DELETE_CHUNK_ROWS", "2000"))
+CLEAN_INTERVAL = 30.0   # seconds between vector cleanup rounds when nothing wakes the cleaner
+RECLAIM_PAGES = 2000    # freed SQLite pages returned to the OS per cleanup round
+MAX_ATTEMPTS = 10       # a tombstone that keeps failing is left for an operator to look at
+
+DELETED_ROWS = REGISTRY.counter(
+    "mazgpt_deleted_rows_total", "Rows and vectors removed by project/account deletion", ["table"])
+VECTOR_TOMBSTONES = REGISTRY.gauge(
+    "mazgpt_vector_tombstones", "Deleted projects whose vectors are still waiting for cleanup")
+
+
+def _delete_chunked(db, model, *conditions, chunk_rows=CHUNK_ROWS):
+    """
+    Deletes matching rows ``chunk_rows`` at a time, committing after each chunk so SQLite's write
+    lock is released between chunks and other requests are not blocked for the whole deletion.
+    """
+    total = 0
+    while True:
+        ids = select(model.id).where(*conditions).limit(chunk_rows)
+        with stage_timer("delete_chunk"):
+            n = db.execute(delete(model).where(model.id.in_(ids.scalar_subquery()))).rowcount
+            db.commit()
+        if not n:
+            break
+        total += n
+    DELETED_ROWS.labels(model.__tablename__).inc(total)
+    return total
+
+
+def _delete_conversations(db, user_id, project_id, chunk_rows):
+    # Jobs reference chat_messages, so they go first
+    counts = {
+        "generation_jobs": _delete_chunked(db, GenerationJob, GenerationJob.user_id == user_id,
+                                           GenerationJob.project_id == project_id, chunk_rows=chunk_rows),
+        "chat_messages": _delete_chunked(db, ChatMessage, ChatMessage.user_id == user_id,
+                                         ChatMessage.project_id == project_id, chunk_rows=chunk_rows),
+        "chat_memory": _delete_chunked(db, ChatMemory, ChatMemory.user_id == user_id,
+                                       ChatMemory.project_id == project_id, chunk_rows=chunk_rows),
+    }
+    # Archived projects keep their messages in the cold store
+    DELETED_ROWS.labels("cold_messages").inc(get_cold_store().drop_project(project_id))
+    # Vectors are tagged with the project id as a string; the cleaner removes them in the background
+    db.add(VectorTombstone(project_key=str(project_id)))
+    db.commit()
+    VECTOR_TOMBSTONES.inc()
+    return counts
+
+
+def delete_project(db, user_id, project_id, chunk_rows=CHUNK_ROWS):
+    """
+    Deletes a project with its jobs, messages (hot and cold) and legacy memories in chunks, queues its vectors for
+    cleanup, then deletes the project row. The project row goes last, so an interrupted deletion
+    can simply be repeated. Returns per-table row counts.
+    """
+    counts = _delete_conversations(db, user_id, project_id, chunk_rows)
+    db.execute(delete(Project).where(Project.user_id == user_id, Project.id == project_id))
+    db.commit()
+    DELETED_ROWS.labels("projects").inc()
+    return counts
+
+
+def delete_user_data(db, user_id, chunk_rows=CHUNK_ROWS):
+    """Deletes every conversation of an account (projects and settings are kept); returns per-table row counts."""
+    totals = {}
+    project_ids = [pid for (pid,) in db.execute(select(Project.id).where(Project.user_id == user_id))]
+    # Rows whose project no longer exists (e.g. legacy imports) are swept up by the None pass
+    for project_id in project_ids + [None]:
+        if project_id is None:
+            counts = {
+                "chat_messages": _delete_chunked(db, ChatMessage, ChatMessage.user_id == user_id, chunk_rows=chunk_rows),
+                "chat_memory": _delete_chunked(db, ChatMemory, ChatMemory.user_id == user_id, chunk_rows=chunk_rows),
+                "generation_jobs": _delete_chunked(db, GenerationJob, GenerationJob.user_id == user_id, chunk_rows=chunk_rows),
+            }
+        else:
+            counts = _delete_conversations(db, user_id, project_id, chunk_rows)
+        for table, n in counts.items():
+            totals[table] = totals.get(table, 0) + n
+    project_stats.reset(db, project_ids)
+    db.commit()
+    return totals
+
+
+def reclaim_space(db, pages=RECLAIM_PAGES):
+    """Returns up to ``pages`` free pages to the OS when the database uses incremental auto-vacuum."""
+    if db.execute(text("PRAGMA auto_vacuum")).scalar() == 2:
+        db.execute(text(f"PRAGMA incremental_vacuum({int(pages)})"))
+        db.commit()
+
+
+class VectorCleaner:
+    """
+    Drains vector_tombstones on a daemon thread: for each deleted project its vectors are removed
+    from SemanticMemory in batches, then the tombstone is dropped. Failures are recorded on the
+    tombstone and retried next round. wake() starts a round immediately (called after deletions);
+    otherwise a round runs every CLEAN_INTERVAL seconds. Each round also reclaims freed SQLite pages.
+    """
+
+    def __init__(self, interval=CLEAN_INTERVAL, session_factory=None):
+        self.interval = interval
+        self._session_factory = session_factory
+        self._semantic_memory = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _session(self):
+        return (self._session_factory or model.db.SessionLocal)()
+
+    def start(self, semantic_memory):
+        self._semantic_memory = semantic_memory
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vector-cleaner", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.clean()
+            except Exception as e:
+                logging.error(f"Vector cleanup round failed: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def clean(self):
+        """Runs one cleanup round; returns the number of vectors deleted."""
+        if self._semantic_memory is None:
+            return 0
+        db = self._session()
+        deleted = 0
+        try:
+            tombstones = db.query(VectorTombstone).filter(VectorTombstone.attempts < MAX_ATTEMPTS) \
+                .order_by(VectorTombstone.id).all()
+            VECTOR_TOMBSTONES.set(len(tombstones))
+            for tombstone in tombstones:
+                if self._stop.is_set():
+                    break
+                try:
+                    n = self._semantic_memory.delete_project(tombstone.project_key)
+                except Exception as e:
+                    tombstone.attempts = (tombstone.attempts or 0) + 1
+                    tombstone.last_error = f"{type(e).__name__}: {e}"
+                    db.commit()
+                    logging.error(f"Deleting vectors of project {tombstone.project_key} failed: {e}")
+                    continue
+                deleted += n
+                DELETED_ROWS.labels("vectors").inc(n)
+                db.delete(tombstone)
+                db.commit()
+                VECTOR_TOMBSTONES.dec()
+            reclaim_space(db)
+        finally:
+            db.close()
+        return deleted
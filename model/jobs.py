@@ -0,0 +1,217 @@
+# Durable generation jobs: /chat/send enqueues a job, runner threads generate the reply and persist it
+import datetime
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+import model.db
+from model.db import GenerationJob, ChatMessage
+from model import project_stats
+from model.balancer import ModelOverloadedError
+from model.metrics import REGISTRY, QUEUE_WAIT_SECONDS, stage_timer
+
+JOB_WORKERS = int(os.environ.get("MAZGPT_JOB_WORKERS", "2"))
+MAX_ATTEMPTS = int(os.environ.get("MAZGPT_JOB_MAX_ATTEMPTS", "3"))
+FINAL_STATUSES = ("done", "failed")
+
+GENERATION_JOBS = REGISTRY.counter(
+    "mazgpt_generation_jobs_total", "Generation jobs by outcome (queued, done, failed, retried, recovered)", ["status"])
+GENERATION_JOBS_PENDING = REGISTRY.gauge(
+    "mazgpt_generation_jobs_pending", "Generation jobs queued or running in this process")
+
+
+def job_to_dict(job):
+    out = {
+        "job_id": job.id,
+        "status": job.status,
+        "attempts": job.attempts or 0,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if job.status == "done" and job.reply_message is not None:
+        out["reply"] = job.reply_message.content
+    if job.status == "failed":
+        out["error"] = job.error
+    return out
+
+
+class JobRunner:
+    """
+    Runs generation jobs on ``workers`` background threads so request handlers return immediately.
+
+    Jobs live in the generation_jobs table: enqueue() stores a queued row for an already flushed user
+    ChatMessage, a runner thread marks it running, calls ``generate(message, project_id)``, stores the
+    reply as an "ai" ChatMessage and marks the job done (or failed with the error). start() re-queues
+    jobs a previous process left queued or running, so a crash loses no accepted message; a job that
+    has already been attempted MAX_ATTEMPTS times is failed instead of retried forever. When every model
+    is busy (ModelOverloadedError) the job goes back to the queue after the suggested retry delay.
+    ``on_reply(job, reply_message)`` is called after a reply is stored (e.g. to charge generated tokens).
+    """
+
+    def __init__(self, generate, workers=JOB_WORKERS, session_factory=None, max_attempts=MAX_ATTEMPTS, on_reply=None):
+        self.generate = generate
+        self.on_reply = on_reply
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._session_factory = session_factory
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _session(self):
+        # Looked up at call time so a patched model.db.SessionLocal (tests) is honoured
+        return (self._session_factory or model.db.SessionLocal)()
+
+    # --- Lifecycle ---
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        try:
+            self.recover()
+        except Exception as e:
+            # Don't keep the API from starting (e.g. generation_jobs not migrated yet); new jobs still run
+            logging.error(f"Could not recover generation jobs: {e}")
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"generation-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def recover(self):
+        """Re-queues jobs left queued or running by a previous process, oldest first."""
+        db = self._session()
+        try:
+            jobs = db.query(GenerationJob).filter(GenerationJob.status.in_(("queued", "running"))) \
+                .order_by(GenerationJob.created_at.asc()).all()
+            for job in jobs:
+                if job.status == "running":
+                    job.status = "queued"
+                    GENERATION_JOBS.labels("recovered").inc()
+            db.commit()
+            ids = [job.id for job in jobs]
+        finally:
+            db.close()
+        if ids:
+            logging.info(f"Recovered {len(ids)} unfinished generation job(s)")
+        for job_id in ids:
+            self._put(job_id)
+
+    # --- Client side ---
+    def enqueue(self, db, user_message):
+        """Creates a queued job for ``user_message``, commits ``db`` and hands the job to a runner thread."""
+        job = GenerationJob(
+            id=uuid.uuid4().hex,
+            user_id=user_message.user_id,
+            project_id=user_message.project_id,
+            user_message_id=user_message.id,
+            status="queued",
+            attempts=0,
+        )
+        db.add(job)
+        with stage_timer("persist"):
+            db.commit()
+        GENERATION_JOBS.labels("queued").inc()
+        self.start()
+        self._put(job.id)
+        return job
+
+    def status(self, job_id, user_id=None):
+        """Job state as a dict (None if unknown or owned by someone else)."""
+        db = self._session()
+        try:
+            job = db.get(GenerationJob, job_id)
+            if job is None or (user_id is not None and job.user_id != user_id):
+                return None
+            return job_to_dict(job)
+        finally:
+            db.close()
+
+    def _put(self, job_id):
+        GENERATION_JOBS_PENDING.inc()
+        self._queue.put((job_id, time.perf_counter()))
+
+    # --- Runner threads ---
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            job_id, enqueued_at = item
+            QUEUE_WAIT_SECONDS.labels("generation_jobs").observe(time.perf_counter() - enqueued_at)
+            try:
+                self._process(job_id)
+            except Exception as e:
+                logging.error(f"Generation job {job_id} crashed the runner: {e}")
+            finally:
+                GENERATION_JOBS_PENDING.dec()
+
+    def _process(self, job_id):
+        db = self._session()
+        try:
+            job = db.get(GenerationJob, job_id)
+            if job is None or job.status != "queued":
+                return
+            now = datetime.datetime.utcnow()
+            if (job.attempts or 0) >= self.max_attempts:
+                self._finish(db, job, "failed", error=f"Gave up after {job.attempts} attempts")
+                return
+            job.status, job.started_at, job.attempts = "running", now, (job.attempts or 0) + 1
+            db.commit()
+            try:
+                reply = self.generate(job.user_message.content, str(job.project_id))
+            except ModelOverloadedError as e:
+                # Shed before any work was done: not counted as an attempt
+                job.status, job.attempts = "queued", job.attempts - 1
+                db.commit()
+                GENERATION_JOBS.labels("retried").inc()
+                GENERATION_JOBS_PENDING.inc()
+                threading.Timer(e.retry_after, self._requeue, (job_id,)).start()
+                return
+            except Exception as e:
+                logging.error(f"Generation job {job_id} failed: {e}")
+                self._finish(db, job, "failed", error=f"{type(e).__name__}: {e}")
+                return
+            reply_msg = ChatMessage(
+                project_id=job.project_id,
+                user_id=job.user_id,
+                sender="ai",
+                content=reply,
+                version=1
+            )
+            db.add(reply_msg)
+            db.flush()
+            project_stats.record_message(db, reply_msg)
+            job.reply_message_id = reply_msg.id
+            self._finish(db, job, "done")
+            if self.on_reply is not None:
+                try:
+                    self.on_reply(job, reply_msg)
+                except Exception as e:
+                    logging.error(f"on_reply hook failed for generation job {job_id}: {e}")
+        finally:
+            db.close()
+
+    def _requeue(self, job_id):
+        # The pending gauge was already raised when the retry was scheduled
+        self._queue.put((job_id, time.perf_counter()))
+
+    def _finish(self, db, job, status, error=None):
+        job.status, job.error, job.finished_at = status, error, datetime.datetime.utcnow()
+        with stage_timer("persist"):
+            db.commit()
+        GENERATION_JOBS.labels(status).inc()
@@ -0,0 +1,111 @@
+# Backfill of the legacy chat_memory JSON blobs into chat_messages rows, and dual reads until it is done
+import logging
+import time
+from collections import namedtuple
+from itertools import islice
+from sqlalchemy import func, or_
+from model.db import ChatMemory
+from model.bulk_import import ImportFormatError, normalize_message, resolve_project, insert_messages, _parse_time
+from model.metrics import REGISTRY, stage_timer
+
+BLOBS_PER_BATCH = 50   # chat_memory rows exploded per transaction
+BATCH_PAUSE = 0.05     # seconds between batches so the backfill leaves room for live writes
+
+BACKFILLED = REGISTRY.counter(
+    "mazgpt_legacy_backfill_total", "Legacy chat_memory blobs and messages processed by the backfill", ["outcome"])
+LEGACY_BLOBS = REGISTRY.gauge(
+    "mazgpt_legacy_blobs", "chat_memory rows not yet moved to chat_messages")
+
+# Same fields the history code reads from chat_messages rows
+LegacyMessage = namedtuple("LegacyMessage", "sender content version created_at")
+
+
+def _messages(blob):
+    """Valid (sender, text, timestamp) tuples of a blob; malformed entries are counted and skipped."""
+    if not isinstance(blob.messages, list):
+        # Not a message list at all: nothing to move, but count it rather than drop it silently
+        BACKFILLED.labels("skipped").inc()
+        return []
+    out = []
+    for m in blob.messages:
+        try:
+            out.append(normalize_message(m))
+        except ImportFormatError:
+            BACKFILLED.labels("skipped").inc()
+    return out
+
+
+def _blobs_for(db, project):
+    # Old imports stored the client's project key (often a name) in chat_memory.project_id
+    return db.query(ChatMemory).filter(
+        ChatMemory.user_id == project.user_id,
+        or_(ChatMemory.project_id == project.id, ChatMemory.project_id == str(project.id),
+            ChatMemory.project_id == project.name)).order_by(ChatMemory.id)
+
+
+def blob_messages(blob):
+    """A blob's valid messages as LegacyMessage tuples (read-only)."""
+    return [LegacyMessage(sender, text, 1, _parse_time(timestamp, blob.created_at))
+            for sender, text, timestamp in _messages(blob)]
+
+
+def iter_pending_messages(db, project):
+    """Yields the project's messages still held in legacy blobs, oldest blob first (read-only; they predate chat_messages)."""
+    for blob in _blobs_for(db, project):
+        yield from blob_messages(blob)
+
+
+def pending_messages(db, project, limit):
+    """Up to ``limit`` messages of the project still held in legacy blobs."""
+    return list(islice(iter_pending_messages(db, project), limit))
+
+
+def unmatched_blobs(db, user_id, projects):
+    """The account's blobs whose project key names none of ``projects`` (the backfill would create those projects)."""
+    keys = {key for p in projects for key in (str(p.id), p.name)}
+    for blob in db.query(ChatMemory).filter(ChatMemory.user_id == user_id).order_by(ChatMemory.id).yield_per(BLOBS_PER_BATCH):
+        if str(blob.project_id) not in keys:
+            yield blob
+
+
+def migrate_blob(db, blob):
+    """Explodes one blob into chat_messages and deletes it; the caller commits. Returns the rows written."""
+    project = resolve_project(db, blob.user_id, blob.project_id)
+    messages = _messages(blob)
+    n = insert_messages(db, blob.user_id, project.id, messages)
+    db.delete(blob)
+    BACKFILLED.labels("messages").inc(n)
+    BACKFILLED.labels("blobs").inc()
+    return n
+
+
+def backfill(db, blobs_per_batch=BLOBS_PER_BATCH, pause=BATCH_PAUSE, limit=None):
+    """
+    Moves every legacy blob into chat_messages, ``blobs_per_batch`` blobs per transaction. A blob
+    is deleted in the same transaction that writes its rows, so the backfill can run while the app
+    is serving and can be stopped and restarted at any point without duplicating messages.
+    Returns {"blobs", "messages"}.
+    """
+    done = {"blobs": 0, "messages": 0}
+    while limit is None or done["blobs"] < limit:
+        size = blobs_per_batch if limit is None else min(blobs_per_batch, limit - done["blobs"])
+        blobs = db.query(ChatMemory).order_by(ChatMemory.id).limit(size).all()
+        if not blobs:
+            break
+        with stage_timer("legacy_backfill"):
+            for blob in blobs:
+                done["messages"] += migrate_blob(db, blob)
+            db.commit()
+        done["blobs"] += len(blobs)
+        refresh_pending(db)
+        logging.info(f"Legacy backfill: {done['blobs']} blobs, {done['messages']} messages moved")
+        if pause:
+            time.sleep(pause)
+    refresh_pending(db)
+    return done
+
+
+def refresh_pending(db):
+    n = db.query(func.count(ChatMemory.id)).scalar()
+    LEGACY_BLOBS.set(n)
+    return n
@@ -1,6 +1,109 @@
 from transformers import AutoModelForCausalLM, AutoTokenizer, TextStreamer
+from transformers.generation.streamers import BaseStreamer
+from model.metrics import stage_timer, STAGE_SECONDS, TOKENS_GENERATED, PROMPT_TOKENS, TOKENS_PER_SECOND, SPECULATIVE_ACCEPTANCE
+from model.tracing import span, record_span
+from model.prompt_template import PromptTemplate
+from functools import lru_cache
+import copy
+import threading
 import torch
 import os
+import time
+
+# Fallback when neither the config nor the caller gives a context length
+DEFAULT_CONTEXT_TOKENS = 2048
+
+class _TimingStreamer(BaseStreamer):
+    """Records time-to-first-token (prefill) and decode time, forwarding to an optional inner streamer."""
+    def __init__(self, inner=None):
+        self.inner = inner
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self.new_tokens = 0
+        self.steps = 0  # target-model forward passes that produced tokens
+        self._prompt_seen = False
+
+    def put(self, value):
+        if not self._prompt_seen:
+            # generate() pushes the prompt ids first; everything after that is generated
+            self._prompt_seen = True
+        else:
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            self.new_tokens += value.numel()
+            self.steps += 1
+        if self.inner is not None:
+            self.inner.put(value)
+
+    def end(self):
+        if self.inner is not None:
+            self.inner.end()
+
+    def record(self, model_label, draft_tokens=None):
+        """Observes the call's metrics and returns them; draft_tokens is the number of tokens the draft model proposed."""
+        end = time.perf_counter()
+        first = self.first_token_at or end
+        STAGE_SECONDS.labels("prefill").observe(first - self.start)
+        record_span("llm.prefill", self.start, first)
+        record_span("llm.decode", first, end, new_tokens=self.new_tokens)
+        decode_seconds = end - first
+        STAGE_SECONDS.labels("decode").observe(decode_seconds)
+        TOKENS_GENERATED.labels(model_label).inc(self.new_tokens)
+        if decode_seconds > 0 and self.new_tokens > 1:
+            # The first token is produced by the prefill pass, so exclude it from decode throughput
+            TOKENS_PER_SECOND.labels(model_label).observe((self.new_tokens - 1) / decode_seconds)
+        stats = {"new_tokens": self.new_tokens, "steps": self.steps, "seconds": end - self.start,
+                 "prefill_seconds": first - self.start, "decode_seconds": decode_seconds}
+        if draft_tokens:
+            # Each verification step emits the accepted draft tokens plus one token from the target itself
+            accepted = max(0, self.new_tokens - self.steps)
+            stats["draft_tokens"] = draft_tokens
+            stats["acceptance"] = min(1.0, accepted / draft_tokens)
+            SPECULATIVE_ACCEPTANCE.labels(model_label).observe(stats["acceptance"])
+        return stats
+
+class _GenerationGate:
+    """
+    Keeps background generations (conversation summaries) off the model while a chat reply is being
+    generated: a background call only starts when no generation is running, and chat calls that
+    arrive meanwhile wait for it to finish instead of competing with it for the CPU/GPU.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._running = 0
+        self._background = False
+
+    def enter(self):
+        with self._cond:
+            while self._background:
+                self._cond.wait()
+            self._running += 1
+
+    def leave(self):
+        with self._cond:
+            self._running -= 1
+            self._cond.notify_all()
+
+    def try_enter_background(self):
+        with self._cond:
+            if self._running or self._background:
+                return False
+            self._background = True
+            return True
+
+    def leave_background(self):
+        with self._cond:
+            self._background = False
+            self._cond.notify_all()
+
+@lru_cache(maxsize=4)
+def _load_draft(path, device):
+    # Several target models may share one draft model; load it once per device
+    tokenizer = AutoTokenizer.from_pretrained(path)
+    model = AutoModelForCausalLM.from_pretrained(path)
+    model.to(device)
+    model.eval()
+    return model, tokenizer
 
 class LocalLLM:
     BASE_SYSTEM_PROMPT = (
@@ -22,41 +125,125 @@ class LocalLLM:
         """
     )
 
-    def __init__(self, model_name, device=None):
+    def __init__(self, model_name, device=None, max_context_tokens=None, draft_model=None, draft_tokens=None):
         # If model_name is a local path, use it directly
         if os.path.isdir(model_name):
             model_path = model_name
         else:
             model_path = model_name  # fallback, but should always be a local path now
+        self.model_name = model_name
+        self.metrics_label = os.path.basename(os.path.normpath(model_name))
         self.tokenizer = AutoTokenizer.from_pretrained(model_path)
         self.model = AutoModelForCausalLM.from_pretrained(model_path)
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self.model.to(self.device)
+        self.tokenizer_id = self.metrics_label
+        self.max_context_tokens = max_context_tokens or self._detect_context_tokens()
+        # Token counts are requested repeatedly for the same turns and system prompts
+        self.count_tokens = lru_cache(maxsize=8192)(self._count_tokens)
+        self.template = PromptTemplate(self.tokenizer, self.BASE_SYSTEM_PROMPT)
+        self.last_stats = None
+        self._gate = _GenerationGate()
+        self.set_draft(draft_model, draft_tokens)
+
+    def set_draft(self, draft_model, draft_tokens=None):
+        """
+        Enables assisted (speculative) decoding: the small draft_model proposes tokens and this model
+        verifies them in one forward pass, so output quality is unchanged. draft_model is a path or
+        hub id (None disables it); draft_tokens fixes how many tokens are proposed per step, otherwise
+        transformers adapts the number to the acceptance rate.
+        """
+        self.draft_model = self.draft_tokenizer = self._draft_config = None
+        self._draft_kwargs = {}
+        if not draft_model:
+            return
+        self.draft_model, self.draft_tokenizer = _load_draft(draft_model, self.device)
+        # The loaded draft is shared by every target using it: draft settings go in this target's own
+        # GenerationConfig, attached to a per-call view of the draft (see _draft_view)
+        self._draft_config = copy.deepcopy(self.draft_model.generation_config)
+        if draft_tokens:
+            self._draft_config.num_assistant_tokens = int(draft_tokens)
+            self._draft_config.num_assistant_tokens_schedule = "constant"
+        if self.draft_tokenizer.get_vocab() != self.tokenizer.get_vocab():
+            # Different tokenizer families need the text-level (universal) assisted decoding path
+            self._draft_kwargs.update(tokenizer=self.tokenizer, assistant_tokenizer=self.draft_tokenizer)
+
+    def _detect_context_tokens(self):
+        n = getattr(self.model.config, "max_position_embeddings", None)
+        if not n:
+            n = getattr(self.tokenizer, "model_max_length", None)
+            # Tokenizers without a limit report a huge sentinel value
+            if not n or n > 1_000_000:
+                n = DEFAULT_CONTEXT_TOKENS
+        return int(n)
+
+    def _count_tokens(self, text):
+        return len(self.tokenizer(text, add_special_tokens=False).input_ids)
+
+    def truncate_tokens(self, text, n_tokens):
+        """Keeps the last n_tokens tokens of text."""
+        ids = self.tokenizer(text, add_special_tokens=False).input_ids
+        if len(ids) <= n_tokens:
+            return text
+        return self.tokenizer.decode(ids[-n_tokens:] if n_tokens > 0 else [], skip_special_tokens=True)
 
     def build_system_prompt(self, language="en", tone="friendly"):
-        tone_map = {
-            "friendly": "Be warm, encouraging, and supportive.",
-            "formal": "Use a formal, professional tone.",
-            "concise": "Be brief and to the point, but still helpful.",
-            "playful": "Be witty, playful, and use light humor.",
-        }
-        lang_map = {
-            "en": "Reply in English.",
-            "es": "Responde en español.",
-            "fr": "Réponds en français.",
-            "de": "Antworte auf Deutsch.",
-            "zh": "请用中文回答。",
-            "ar": "أجب باللغة العربية.",
-        }
-        tone_instruction = tone_map.get(tone, "")
-        lang_instruction = lang_map.get(language, "")
-        return self.BASE_SYSTEM_PROMPT + "\n" + tone_instruction + "\n" + lang_instruction
+        # Rendered once per (language, tone) by the template
+        return self.template.system_prompt(language, tone)
+
+    def _draft_view(self, drafted):
+        """
+        A shallow copy of the shared draft model for one generate call: same weights, this target's
+        GenerationConfig, and a forward that counts its passes (one proposed token each) into
+        ``drafted``, so concurrent calls sharing the draft neither see each other's settings nor counts.
+        """
+        view = copy.copy(self.draft_model)
+        view.generation_config = self._draft_config
+        forward = view.forward
+
+        def counting_forward(*args, **kwargs):
+            drafted[0] += 1
+            return forward(*args, **kwargs)
+        view.forward = counting_forward
+        return view
+
+    def _assisted_kwargs(self, drafted):
+        if self.draft_model is None:
+            return {}
+        return dict(self._draft_kwargs, assistant_model=self._draft_view(drafted))
 
     def generate(self, prompt, max_new_tokens=128, stream=False, language="en", tone="friendly"):
-        full_prompt = self.build_system_prompt(language, tone) + "\n" + prompt
-        input_ids = self.tokenizer(full_prompt, return_tensors="pt").input_ids.to(self.device)
+        self._gate.enter()
+        try:
+            return self._traced_generate(prompt, max_new_tokens, stream, language, tone)
+        finally:
+            self._gate.leave()
+
+    def generate_when_idle(self, prompt, max_new_tokens=128, language="en", tone="friendly"):
+        """generate() for background work: returns None at once if a generation is already running."""
+        if not self._gate.try_enter_background():
+            return None
+        try:
+            return self._traced_generate(prompt, max_new_tokens, False, language, tone)
+        finally:
+            self._gate.leave_background()
+
+    def _traced_generate(self, prompt, max_new_tokens, stream, language, tone):
+        with span("llm.generate", model=self.metrics_label, max_new_tokens=max_new_tokens) as s:
+            output = self._generate(prompt, max_new_tokens, stream, language, tone)
+            if s is not None and output is not None:
+                s.attrs["output_chars"] = len(output)
+            return output
+
+    def _generate(self, prompt, max_new_tokens, stream, language, tone):
+        # The system prompt is pre-tokenized; only prompt lines not seen before are tokenized
+        # (timed as "tokenize" inside build_ids)
+        with stage_timer("prompt_build"), span("llm.tokenize"):
+            input_ids = torch.tensor([self.template.build_ids(prompt, language, tone)], device=self.device)
+        PROMPT_TOKENS.labels(self.metrics_label).observe(input_ids.shape[-1])
         if stream:
-            streamer = TextStreamer(self.tokenizer, skip_prompt=True)
+            streamer = _TimingStreamer(TextStreamer(self.tokenizer, skip_prompt=True))
+            drafted = [0]
             self.model.generate(
                 input_ids,
                 max_new_tokens=max_new_tokens,
@@ -65,14 +252,22 @@ class LocalLLM:
                 temperature=0.7,
                 top_p=0.95,
                 pad_token_id=self.tokenizer.eos_token_id,
+                **self._assisted_kwargs(drafted),
             )
+            self.last_stats = streamer.record(self.metrics_label, drafted[0])
         else:
+            streamer = _TimingStreamer()
+            drafted = [0]
             output = self.model.generate(
                 input_ids,
                 max_new_tokens=max_new_tokens,
+                streamer=streamer,
                 do_sample=True,
                 temperature=0.7,
                 top_p=0.95,
                 pad_token_id=self.tokenizer.eos_token_id,
+                **self._assisted_kwargs(drafted),
             )
-            return self.tokenizer.decode(output[0], skip_special_tokens=True)[len(full_prompt):]
+            self.last_stats = streamer.record(self.metrics_label, drafted[0])
+            # Decode only the generated ids rather than slicing the prompt text off the full decode
+            return self.tokenizer.decode(output[0, input_ids.shape[-1]:], skip_special_tokens=True)
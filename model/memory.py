@@ -1,6 +1,9 @@
 import os
 import json
+import threading
 from datetime import datetime
+from model.context import TOKEN_COUNTS, format_turn
+from model.metrics import stage_timer
 
 MEMORY_FILE = os.path.join(os.path.dirname(__file__), 'data', 'chat_memory.json')
 
@@ -10,8 +13,16 @@ class ChatMemory:
         if not os.path.exists(MEMORY_FILE):
             with open(MEMORY_FILE, 'w') as f:
                 json.dump([], f)
+        # tokenizer_id -> count function; registered counters size each turn once, at ingest, into
+        # model.context.TOKEN_COUNTS. Registered from the model warm-up thread, hence the lock.
+        self.token_counters = {}
+        self._counters_lock = threading.Lock()
         self.load()
 
+    def register_token_counter(self, tokenizer_id, count_tokens):
+        with self._counters_lock:
+            self.token_counters[tokenizer_id] = count_tokens
+
     def load(self):
         with open(MEMORY_FILE, 'r') as f:
             self.history = json.load(f)
@@ -20,14 +31,32 @@ class ChatMemory:
         with open(MEMORY_FILE, 'w') as f:
             json.dump(self.history, f, indent=2)
 
-    def add(self, user, message, project_id="default"):
-        self.history.append({
+    def _entry(self, user, message, project_id):
+        entry = {
             'timestamp': datetime.now().isoformat(),
             'user': user,
             'message': message,
             'project_id': project_id
-        })
-        self.save()
+        }
+        with self._counters_lock:
+            counters = list(self.token_counters.items())
+        line = format_turn(entry)
+        for tid, count in counters:
+            TOKEN_COUNTS.put(tid, line, count(line))
+        return entry
+
+    def add(self, user, message, project_id="default"):
+        self.history.append(self._entry(user, message, project_id))
+        with stage_timer("persist"):
+            self.save()
+
+    def add_many(self, messages, project_id="default"):
+        """Appends (user, message) pairs and saves the file once; returns the new entries."""
+        entries = [self._entry(user, message, project_id) for user, message in messages]
+        self.history.extend(entries)
+        with stage_timer("persist"):
+            self.save()
+        return entries
 
     def get_recent(self, n=10, project_id="default"):
         filtered = [h for h in self.history if h.get('project_id', 'default') == project_id]
@@ -44,13 +73,14 @@ class ChatMemory:
         """
         Returns a list of messages (dicts) for the given project that fit within the max_turns and max_chars constraints.
         """
-        filtered = [h for h in self.history if h.get('project_id', 'default') == project_id]
-        context = []
-        total_chars = 0
-        for entry in reversed(filtered):
-            msg = f"{entry['user']}: {entry['message']}"
-            if len(context) >= max_turns or total_chars + len(msg) > max_chars:
-                break
-            context.insert(0, entry)  # Insert at the beginning to maintain order
-            total_chars += len(msg)
-        return context
+        with stage_timer("context_window"):
+            filtered = [h for h in self.history if h.get('project_id', 'default') == project_id]
+            context = []
+            total_chars = 0
+            for entry in reversed(filtered):
+                msg = f"{entry['user']}: {entry['message']}"
+                if len(context) >= max_turns or total_chars + len(msg) > max_chars:
+                    break
+                context.insert(0, entry)  # Insert at the beginning to maintain order
+                total_chars += len(msg)
+            return context
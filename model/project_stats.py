@@ -0,0 +1,70 @@
+# Per-project message counters kept on the projects row, so listing projects never scans chat_messages
+import datetime
+from sqlalchemy import func, update
+from model.db import ChatMessage, Project
+from model.cold_store import get_cold_store
+from model.revisions import bump_project
+
+CHARS_PER_TOKEN = 4   # rough average for the models we serve; counters are for display and sorting
+
+
+def estimate_tokens(text):
+    """Approximate token count of a message (no tokenizer is loaded in the API process)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN if text else 0
+
+
+def record_messages(db, project_id, messages=1, tokens=0, at=None):
+    """
+    Adds to a project's counters, moves its last activity forward and bumps its revision. Runs in
+    the caller's transaction, so the counters commit (or roll back) together with the messages
+    themselves. Relative increments in the UPDATE: concurrent writers never lose each other's counts.
+    """
+    at = at or datetime.datetime.utcnow()
+    db.execute(update(Project).where(Project.id == project_id).values(
+        message_count=Project.message_count + messages,
+        token_count=Project.token_count + tokens,
+        last_message_at=func.max(func.coalesce(Project.last_message_at, at), at),
+        updated_at=datetime.datetime.utcnow()))
+    bump_project(db, project_id)
+
+
+def record_message(db, message):
+    record_messages(db, message.project_id, 1, estimate_tokens(message.content), message.created_at)
+
+
+def reset(db, project_ids):
+    """Zeroes the counters of projects whose messages were all deleted (the caller commits)."""
+    if project_ids:
+        db.execute(update(Project).where(Project.id.in_(project_ids)).values(
+            message_count=0, token_count=0, last_message_at=None))
+        for project_id in project_ids:
+            bump_project(db, project_id)
+
+
+def recompute(db, project_ids=None):
+    """
+    Rebuilds counters from chat_messages (and, for archived projects, the cold store), e.g. after
+    the schema migration or a manual data fix. Commits; returns the number of projects updated.
+    """
+    query = db.query(Project.id, Project.archived)
+    if project_ids is not None:
+        query = query.filter(Project.id.in_(project_ids))
+    updated = 0
+    for project_id, archived in query.all():
+        count, tokens, last = 0, 0, None
+        for content, created_at in db.query(ChatMessage.content, ChatMessage.created_at) \
+                .filter(ChatMessage.project_id == project_id).yield_per(1000):
+            count += 1
+            tokens += estimate_tokens(content)
+            last = max(last, created_at) if last and created_at else (last or created_at)
+        if archived:
+            for m in get_cold_store().iter_messages(project_id):
+                count += 1
+                tokens += estimate_tokens(m.content)
+                last = max(last, m.created_at) if last and m.created_at else (last or m.created_at)
+        db.execute(update(Project).where(Project.id == project_id).values(
+            message_count=count, token_count=tokens, last_message_at=last))
+        bump_project(db, project_id)
+        updated += 1
+    db.commit()
+    return updated
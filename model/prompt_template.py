@@ -0,0 +1,89 @@
+# Precompiled system prompts and cached segment token ids for LocalLLM
+from functools import lru_cache
+from model.metrics import stage_timer
+
+TONE_INSTRUCTIONS = {
+    "friendly": "Be warm, encouraging, and supportive.",
+    "formal": "Use a formal, professional tone.",
+    "concise": "Be brief and to the point, but still helpful.",
+    "playful": "Be witty, playful, and use light humor.",
+}
+LANGUAGE_INSTRUCTIONS = {
+    "en": "Reply in English.",
+    "es": "Responde en español.",
+    "fr": "Réponds en français.",
+    "de": "Antworte auf Deutsch.",
+    "zh": "请用中文回答。",
+    "ar": "أجب باللغة العربية.",
+}
+
+
+class PromptTemplate:
+    """
+    Turns (language, tone, prompt) into model input ids without re-tokenizing the system prompt.
+
+    The system prompt for each (language, tone) is rendered and tokenized once, together with the
+    tokenizer's leading special tokens. The caller's prompt is split into lines (ContextBuilder emits
+    one turn, summary or semantic hit per line) and each line is encoded as "\n" + line through an
+    LRU cache, so turns repeated across calls cost a dict lookup. Encoding the newline with the line
+    keeps it mid-text: the piece a SentencePiece tokenizer (Llama, Mistral) puts in front of any
+    encoded text ("▁") is stripped, so each line gets the same ids as in the whole-string encoding.
+    A tokenizer that merges the newline into the next token falls back to encoding the whole prompt.
+    """
+
+    def __init__(self, tokenizer, base_prompt, cache_size=8192):
+        self.tokenizer = tokenizer
+        self.base_prompt = base_prompt
+        self.special_prefix = self._special_prefix()
+        self.newline_ids, self.text_prefix = self._newline()
+        self.segment = lru_cache(maxsize=cache_size)(self._segment)
+        self.system_prompt = lru_cache(maxsize=None)(self._system_prompt)
+        self._system_ids = lru_cache(maxsize=None)(self._compile_system)
+
+    def _encode(self, text):
+        return tuple(self.tokenizer(text, add_special_tokens=False).input_ids)
+
+    def _special_prefix(self):
+        # Whatever the tokenizer puts in front of plain text (e.g. BOS for Llama, nothing for GPT-2)
+        with_special = self.tokenizer("a").input_ids
+        plain = self.tokenizer("a", add_special_tokens=False).input_ids
+        for i in range(len(with_special) - len(plain) + 1):
+            if with_special[i:i + len(plain)] == plain:
+                return tuple(with_special[:i])
+        return ()
+
+    def _newline(self):
+        # Ids of a newline in the middle of text, and the ids the tokenizer adds at the start of any
+        # encoded text (SentencePiece's "▁"; none for byte-level BPE)
+        a, a_newline, newline = self._encode("a"), self._encode("a\n"), self._encode("\n")
+        mid = a_newline[len(a):] if a_newline[:len(a)] == a else newline
+        prefix = newline[:-len(mid)] if mid and newline[-len(mid):] == mid else ()
+        return mid, prefix
+
+    def _segment(self, line):
+        """Ids of "\n" + line as they appear mid-prompt, or None if the newline merges into the line."""
+        ids = self._encode("\n" + line)[len(self.text_prefix):]
+        n = len(self.newline_ids)
+        return ids if ids[:n] == self.newline_ids else None
+
+    def _system_prompt(self, language, tone):
+        return (self.base_prompt + "\n" + TONE_INSTRUCTIONS.get(tone, "") + "\n"
+                + LANGUAGE_INSTRUCTIONS.get(language, ""))
+
+    def _compile_system(self, language, tone):
+        return self.special_prefix + self._encode(self.system_prompt(language, tone))
+
+    def system_ids(self, language="en", tone="friendly"):
+        return self._system_ids(language, tone)
+
+    def build_ids(self, prompt, language="en", tone="friendly"):
+        """Input ids for system prompt + "\n" + prompt, as a list."""
+        ids = list(self._system_ids(language, tone))
+        # Only lines not seen before reach the tokenizer
+        with stage_timer("tokenize"):
+            segments = [self.segment(line) for line in prompt.split("\n")]
+        if None in segments:
+            return list(self.special_prefix + self._encode(self.system_prompt(language, tone) + "\n" + prompt))
+        for segment in segments:
+            ids.extend(segment)
+        return ids
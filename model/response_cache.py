@@ -0,0 +1,115 @@
+# Opt-in cache of LLM replies for repeated or near-duplicate questions
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from model.metrics import REGISTRY, stage_timer
+
+ENABLED = os.environ.get("MAZGPT_RESPONSE_CACHE", "0") == "1"
+CACHE_TTL = float(os.environ.get("MAZGPT_RESPONSE_CACHE_TTL", "86400"))
+CACHE_SIZE = int(os.environ.get("MAZGPT_RESPONSE_CACHE_SIZE", "1024"))
+SIMILARITY = float(os.environ.get("MAZGPT_RESPONSE_CACHE_SIMILARITY", "0.95"))
+# Very short messages ("and then?", "why?") depend on the conversation, so they are never cached
+MIN_WORDS = 3
+
+RESPONSE_CACHE_LOOKUPS = REGISTRY.counter(
+    "mazgpt_response_cache_lookups_total", "Response cache lookups by result (exact, similar, miss, skip)", ["result"])
+
+_SPACE_RE = re.compile(r"\s+")
+_PUNCT_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_prompt(text):
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub(" ", text.lower())).strip()
+
+
+class ResponseCache:
+    """
+    Replies keyed by (model, system-prompt variant, project) and the normalized user message.
+
+    Lookups try an exact match first, then the most similar cached question by cosine similarity
+    of embeddings (``embed`` is usually SemanticMemory.embed) above ``similarity``. Entries expire
+    after ``ttl`` seconds and the least recently used are evicted beyond ``max_entries``.
+    """
+
+    def __init__(self, embed=None, ttl=CACHE_TTL, max_entries=CACHE_SIZE, similarity=SIMILARITY, min_words=MIN_WORDS):
+        self.embed = embed
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.min_words = min_words
+        # (model, variant, project_id, normalized prompt) -> (expires, response, unit embedding or None)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cacheable(self, prompt):
+        return len(normalize_prompt(prompt).split()) >= self.min_words
+
+    def _unit_vector(self, prompt, embedding):
+        if embedding is None:
+            if self.embed is None:
+                return None
+            embedding = self.embed(prompt)
+        import numpy as np
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else None
+
+    def get(self, model, variant, prompt, project_id="default", embedding=None):
+        """Returns the cached reply or None; ``embedding`` avoids re-embedding a message the caller already embedded."""
+        if not self.cacheable(prompt):
+            RESPONSE_CACHE_LOOKUPS.labels("skip").inc()
+            return None
+        with stage_timer("response_cache"):
+            key = (model, variant, project_id, normalize_prompt(prompt))
+            now = time.monotonic()
+            with self._lock:
+                item = self._entries.get(key)
+                if item is not None and item[0] >= now:
+                    self._entries.move_to_end(key)
+                    RESPONSE_CACHE_LOOKUPS.labels("exact").inc()
+                    return item[1]
+            vec = self._unit_vector(prompt, embedding)
+            if vec is not None:
+                best_key, best_score = None, self.similarity
+                with self._lock:
+                    for other, (expires, _, other_vec) in self._entries.items():
+                        if other[:3] != key[:3] or other_vec is None or expires < now:
+                            continue
+                        score = float(vec @ other_vec)
+                        if score >= best_score:
+                            best_key, best_score = other, score
+                    if best_key is not None:
+                        self._entries.move_to_end(best_key)
+                        RESPONSE_CACHE_LOOKUPS.labels("similar").inc()
+                        return self._entries[best_key][1]
+            RESPONSE_CACHE_LOOKUPS.labels("miss").inc()
+            return None
+
+    def put(self, model, variant, prompt, response, project_id="default", embedding=None):
+        if not response or not self.cacheable(prompt):
+            return
+        vec = self._unit_vector(prompt, embedding)
+        key = (model, variant, project_id, normalize_prompt(prompt))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, response, vec)
+            self._entries.move_to_end(key)
+            now = time.monotonic()
+            # Drop expired entries from the old end first, then the least recently used
+            while self._entries:
+                oldest = next(iter(self._entries))
+                if self._entries[oldest][0] >= now and len(self._entries) <= self.max_entries:
+                    break
+                del self._entries[oldest]
+
+    def clear(self, project_id=None):
+        with self._lock:
+            if project_id is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[2] == project_id]:
+                    del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,15 @@
+# Version stamps for cached reads: per-user and per-project revision counters bumped on every write
+from sqlalchemy import select, update
+from model.db import User, Project
+
+
+def bump_user(db, user_id):
+    """Invalidates the user's cached reads (project list, settings); runs in the caller's transaction."""
+    db.execute(update(User).where(User.id == user_id).values(revision=User.revision + 1))
+
+
+def bump_project(db, project_id):
+    """Invalidates a project's cached reads (history) and its owner's project list; the caller commits."""
+    db.execute(update(Project).where(Project.id == project_id).values(revision=Project.revision + 1))
+    owner = select(Project.user_id).where(Project.id == project_id).scalar_subquery()
+    db.execute(update(User).where(User.id == owner).values(revision=User.revision + 1))
@@ -1,25 +1,119 @@
 import yaml
-from model.llm import LocalLLM
+import logging
+from model.balancer import LoadBalancer, Replica
+from model.workers import WorkerPool, RemoteLLM
+from model.metrics import stage_timer, ROUTED_REQUESTS
+from model.skill_classifier import (
+    SkillClassifier, SKILL_CLASSIFICATIONS, EXEMPLARS_FILE, THRESHOLD, MARGIN, default_embedder, load_exemplars,
+)
+from model.tracing import tracer, span
 import os
 
 class SkillRouter:
-    def __init__(self, config_path="model/model_config.yaml"):
+    def __init__(self, config_path="model/model_config.yaml", embed=None, in_workers=False):
+        """
+        Models with ``workers: N`` (or every model when ``in_workers`` is set, as the API does) are
+        served by N worker processes instead of being loaded into this process; models sharing a
+        ``worker_group`` are hosted together in the same processes.
+        """
         with open(config_path, "r") as f:
             self.config = yaml.safe_load(f)
         self.models = {}
+        self.balancer = LoadBalancer()
+        self.pool = None
+        remote = [m for m in self.config["models"] if in_workers or m.get("workers")]
+        if remote:
+            self._start_workers(remote)
         for m in self.config["models"]:
-            # Always use the local path from config
-            self.models[m["name"]] = LocalLLM(model_name=m["path"])
+            if m in remote:
+                continue
+            # Imported here: processes that only talk to workers never load torch/transformers
+            from model.llm import LocalLLM
+            # replicas load separate copies, spread over devices (e.g. [cuda:0, cuda:1]) when given
+            devices = m.get("devices") or [None]
+            for i in range(int(m.get("replicas", 1))):
+                llm = LocalLLM(device=devices[i % len(devices)], **self._llm_kwargs(m))
+                self.models.setdefault(m["name"], llm)
+                self.balancer.add(Replica(
+                    m["name"], i, llm,
+                    cost=float(m.get("cost", 1.0)),
+                    max_concurrency=int(m.get("max_concurrency", 1)),
+                    max_queue=int(m.get("max_queue", 4)),
+                ))
+        # Relative cost per generated token; cheaper models are preferred for a skill
+        self.costs = {m["name"]: float(m.get("cost", 1.0)) for m in self.config["models"]}
         self.skill_map = self._build_skill_map()
+        self.classifier = self._build_classifier(embed)
+
+    @staticmethod
+    def _llm_kwargs(m):
+        # Always use the local path from config; context_tokens overrides the length detected from the model,
+        # draft/draft_tokens enable speculative decoding with a small model of the same family
+        return {
+            "model_name": m["path"],
+            "max_context_tokens": m.get("context_tokens"),
+            "draft_model": m.get("draft"),
+            "draft_tokens": m.get("draft_tokens"),
+        }
+
+    def _start_workers(self, models):
+        groups = {}
+        for m in models:
+            group = groups.setdefault(m.get("worker_group", m["name"]), {"models": {}, "processes": 1, "devices": None})
+            group["models"][m["name"]] = self._llm_kwargs(m)
+            group["processes"] = max(group["processes"], int(m.get("workers") or 1))
+            group["devices"] = group["devices"] or m.get("devices")
+        self.pool = WorkerPool([dict(g, name=name) for name, g in groups.items()])
+        for m in models:
+            # One replica whose concurrency is the number of processes pulling from the shared queue
+            processes = self.pool.processes(m["name"])
+            llm = RemoteLLM(self.pool, m["name"])
+            self.models[m["name"]] = llm
+            self.balancer.add(Replica(
+                m["name"], 0, llm,
+                cost=float(m.get("cost", 1.0)),
+                max_concurrency=processes,
+                max_queue=int(m.get("max_queue", 4)) * processes,
+            ))
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
 
     def _build_skill_map(self):
         skill_map = {}
         for m in self.config["models"]:
             for skill in m["skills"]:
                 skill_map.setdefault(skill, []).append(m["name"])
-        return skill_map
+        # Cheapest first; sorted() is stable, so config order breaks ties
+        return {skill: sorted(names, key=self.costs.get) for skill, names in skill_map.items()}
+
+    def _build_classifier(self, embed):
+        cfg = self.config.get("router", {})
+        if cfg.get("classifier", "embedding") != "embedding":
+            return None
+        try:
+            return SkillClassifier(
+                embed or default_embedder(),
+                load_exemplars(cfg.get("exemplars", EXEMPLARS_FILE)),
+                threshold=cfg.get("threshold", THRESHOLD),
+                margin=cfg.get("margin", MARGIN),
+            )
+        except Exception as e:
+            logging.warning(f"Embedding skill classifier unavailable, using keyword rules: {e}")
+            return None
 
     def classify(self, query):
+        if self.classifier is not None:
+            skill, confidence = self.classifier.predict(query)
+            if skill in self.skill_map:
+                SKILL_CLASSIFICATIONS.labels("embedding").inc()
+                return skill
+        SKILL_CLASSIFICATIONS.labels("keywords").inc()
+        return self.keyword_classify(query)
+
+    @staticmethod
+    def keyword_classify(query):
         q = query.lower()
         if any(w in q for w in ["code", "python", "function", "bug", "error"]):
             return "code"
@@ -31,16 +125,44 @@ class SkillRouter:
             return "reasoning"
         return "general"
 
-    def route(self, query):
-        skill = self.classify(query)
+    def route(self, query, preferences=None, classify_text=None):
+        """
+        Generates a reply to ``query`` with the model chosen for its skill. ``classify_text`` (usually
+        the bare user message) is classified instead of the full prompt when given; ``preferences``
+        supplies language and tone.
+        """
+        # Starts a trace for CLI/web UI turns; inside an API request this becomes a child span
+        with tracer.start_trace("router.route") as root:
+            return self._route(query, root, preferences or {}, classify_text or query)
+
+    def _route(self, query, root, preferences, classify_text):
+        language, tone = preferences.get("language", "en"), preferences.get("tone", "friendly")
+        with stage_timer("classify"), span("router.classify"):
+            skill = self.classify(classify_text)
+        if root is not None:
+            root.attrs["skill"] = skill
         models = self.skill_map.get(skill, self.skill_map.get("general", []))
         ens = self.config.get("ensembling", {})
         if ens.get("enabled"):
             for strat in ens.get("strategies", []):
                 if strat["skill"] == skill:
-                    outputs = [self.models[m].generate(query) for m in strat["models"]]
+                    for m in strat["models"]:
+                        ROUTED_REQUESTS.labels(skill, m).inc()
+                    with stage_timer("generate"):
+                        outputs = [
+                            self.balancer.generate([m], query, skill=skill, language=language, tone=tone)[1]
+                            for m in strat["models"]
+                        ]
                     if strat["method"] == "best":
                         return max(outputs, key=len)
                     elif strat["method"] == "first":
                         return outputs[0]
-        return self.models[models[0]].generate(query) if models else "No model available for this skill."
+        if not models:
+            return "No model available for this skill."
+        # Least-loaded replica of any eligible model; raises ModelOverloadedError when all are saturated
+        replica = self.balancer.acquire(models, skill)
+        ROUTED_REQUESTS.labels(skill, replica.model).inc()
+        if root is not None:
+            root.attrs["model"] = f"{replica.model}/{replica.index}"
+        with stage_timer("generate"):
+            return replica.run("generate", query, language=language, tone=tone)
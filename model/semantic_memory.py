@@ -1,6 +1,7 @@
 import chromadb
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
+from model.metrics import stage_timer, EMBEDDING_BATCH_SIZE
 
 class SemanticMemory:
     def __init__(self, persist_dir="data/chroma"):
@@ -10,23 +11,45 @@ class SemanticMemory:
         self.collection = self.client.get_or_create_collection("mazgpt_memory")
         self.embedder = SentenceTransformer("all-MiniLM-L6-v2")
 
-    def add_message(self, message_id, text, metadata=None, project_id="default"):
+    def add_message(self, message_id, text, metadata=None, project_id="default", embedding=None):
         meta = metadata.copy() if metadata else {}
         meta["project_id"] = project_id
-        embedding = self.embedder.encode(text).tolist()
-        self.collection.add(
-            ids=[message_id],
-            embeddings=[embedding],
-            documents=[text],
-            metadatas=[meta]
-        )
+        if embedding is None:
+            embedding = self.embed(text)
+        with stage_timer("vector_write"):
+            self.collection.add(
+                ids=[message_id],
+                embeddings=[embedding],
+                documents=[text],
+                metadatas=[meta]
+            )
+
+    def add_messages(self, message_ids, texts, metadatas=None, project_id="default", embeddings=None):
+        """Batch form of add_message: one embedding call and one vector-store write for all texts."""
+        metas = [dict(m or {}, project_id=project_id) for m in (metadatas or [None] * len(texts))]
+        if embeddings is None:
+            embeddings = self.embed(list(texts))
+        with stage_timer("vector_write"):
+            self.collection.add(
+                ids=list(message_ids),
+                embeddings=list(embeddings),
+                documents=list(texts),
+                metadatas=metas
+            )
+
+    def embed(self, text):
+        """Embeds one text, or a list of texts in a single batch."""
+        EMBEDDING_BATCH_SIZE.observe(len(text) if isinstance(text, list) else 1)
+        with stage_timer("embed"):
+            return self.embedder.encode(text).tolist()
 
     def query(self, query_text, n_results=5, project_id="default"):
-        embedding = self.embedder.encode(query_text).tolist()
-        results = self.collection.query(
-            query_embeddings=[embedding],
-            n_results=50  # get more, filter by project below
-        )
+        embedding = self.embed(query_text)
+        with stage_timer("semantic_query"):
+            results = self.collection.query(
+                query_embeddings=[embedding],
+                n_results=50  # get more, filter by project below
+            )
         filtered = [
             (doc, meta, score)
             for doc, meta, score in zip(
@@ -38,5 +61,16 @@ class SemanticMemory:
         ]
         return filtered[:n_results]
 
+    def delete_project(self, project_id, batch_size=1000):
+        """Removes a project's vectors in batches of ``batch_size`` ids; returns how many were deleted."""
+        deleted = 0
+        with stage_timer("vector_delete"):
+            while True:
+                ids = self.collection.get(where={"project_id": project_id}, limit=batch_size, include=[])["ids"]
+                if not ids:
+                    return deleted
+                self.collection.delete(ids=ids)
+                deleted += len(ids)
+
     def persist(self):
         self.client.persist()
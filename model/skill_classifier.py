@@ -0,0 +1,90 @@
+# Nearest-centroid skill classification over exemplar embeddings, used by SkillRouter
+import hashlib
+import json
+import os
+import yaml
+from model.metrics import REGISTRY
+
+EXEMPLARS_FILE = os.path.join(os.path.dirname(__file__), 'skill_exemplars.yaml')
+CENTROIDS_FILE = os.path.join(os.path.dirname(__file__), 'data', 'skill_centroids.json')
+EMBEDDER_NAME = "all-MiniLM-L6-v2"  # same embedder as SemanticMemory
+THRESHOLD = 0.30  # minimum cosine similarity to the best centroid
+MARGIN = 0.02     # minimum lead over the runner-up skill
+
+SKILL_CLASSIFICATIONS = REGISTRY.counter(
+    "mazgpt_skill_classifications_total", "Skill classifications by method (embedding, keywords)", ["method"])
+
+
+def default_embedder(name=EMBEDDER_NAME):
+    """Loads the sentence-transformers model on first use and returns an embed(texts) function."""
+    model = None
+
+    def embed(texts):
+        nonlocal model
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(name)
+        return model.encode(texts)
+    return embed
+
+
+def load_exemplars(path=EXEMPLARS_FILE):
+    with open(path, "r", encoding="utf-8") as f:
+        return {skill: list(examples) for skill, examples in yaml.safe_load(f).items()}
+
+
+class SkillClassifier:
+    """
+    Scores a query against one centroid per skill (the normalized mean embedding of its exemplars).
+
+    Centroids are computed once and cached on disk, keyed by a hash of the embedder name and the
+    exemplars, so restarts only embed the exemplars again after they change. predict() returns
+    (skill, confidence), with skill None when the best match is below ``threshold`` or leads the
+    runner-up by less than ``margin``; callers then fall back to keyword rules.
+    """
+
+    def __init__(self, embed, exemplars, embedder_name=EMBEDDER_NAME, cache_path=CENTROIDS_FILE,
+                 threshold=THRESHOLD, margin=MARGIN):
+        self.embed = embed
+        self.threshold = threshold
+        self.margin = margin
+        self.skills, self.centroids = self._load_centroids(exemplars, embedder_name, cache_path)
+
+    def _load_centroids(self, exemplars, embedder_name, cache_path):
+        import numpy as np
+        key = hashlib.sha256(json.dumps([embedder_name, exemplars], sort_keys=True).encode()).hexdigest()
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, "r") as f:
+                cached = json.load(f)
+            if cached.get("key") == key:
+                return cached["skills"], np.asarray(cached["centroids"], dtype=np.float32)
+        skills = sorted(exemplars)
+        centroids = []
+        for skill in skills:
+            vectors = self._normalize(np.asarray(self.embed(exemplars[skill]), dtype=np.float32))
+            centroids.append(vectors.mean(axis=0))
+        centroids = self._normalize(np.stack(centroids))
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path, "w") as f:
+                json.dump({"key": key, "skills": skills, "centroids": centroids.tolist()}, f)
+        return skills, centroids
+
+    @staticmethod
+    def _normalize(vectors):
+        import numpy as np
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def scores(self, query):
+        import numpy as np
+        vec = self._normalize(np.asarray(self.embed([query]), dtype=np.float32))[0]
+        return dict(zip(self.skills, (self.centroids @ vec).tolist()))
+
+    def predict(self, query):
+        ranked = sorted(self.scores(query).items(), key=lambda kv: kv[1], reverse=True)
+        skill, best = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else -1.0
+        if best < self.threshold or best - runner_up < self.margin:
+            return None, best
+        return skill, best
@@ -0,0 +1,192 @@
+# Hierarchical rolling summaries of long conversations, kept next to the chat memory file
+import json
+import logging
+import os
+import queue
+import re
+import threading
+from model.memory import MEMORY_FILE
+from model.metrics import stage_timer
+
+SUMMARY_FILE = os.path.join(os.path.dirname(MEMORY_FILE), 'chat_summaries.json')
+CHUNK_TURNS = 20      # turns folded into one level-0 summary
+KEEP_RECENT = 20      # newest turns that always stay verbatim
+FANOUT = 4            # summaries merged into one summary of the next level
+MAX_LEVELS = 2        # the top level is a single rolling digest of everything older
+SUMMARY_CHARS = 400   # target length of one summary
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def extractive_summary(lines, max_chars=SUMMARY_CHARS):
+    """Model-free fallback: the first sentence of each line, cut to an even share of max_chars."""
+    if not lines:
+        return ""
+    share = max(40, max_chars // len(lines))
+    parts = []
+    for line in lines:
+        first = _SENTENCE_RE.split(line.strip(), 1)[0]
+        parts.append(first if len(first) <= share else first[:share - 3].rstrip() + "...")
+    return " ".join(parts)[:max_chars]
+
+
+def llm_summarizer(llm, max_new_tokens=160):
+    """
+    Builds a summarize(lines) function backed by a LocalLLM. It never competes with a chat reply for
+    the model: while one is being generated, the chunk is summarized extractively instead.
+    """
+    def summarize(lines, max_chars=SUMMARY_CHARS):
+        prompt = (
+            "Summarize the following conversation excerpt in a few sentences. Keep names, decisions, "
+            "facts and open questions; drop greetings and filler.\n\n" + "\n".join(lines) + "\n\nSummary:"
+        )
+        text = (llm.generate_when_idle(prompt, max_new_tokens=max_new_tokens, tone="concise") or "").strip()
+        return text[:max_chars] or extractive_summary(lines, max_chars)
+    return summarize
+
+
+class SummaryStore:
+    """Per-project summary levels: levels[0] summarizes CHUNK_TURNS turns, levels[i] merges FANOUT of levels[i-1]."""
+
+    def __init__(self, path=SUMMARY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.data = json.load(f)
+        else:
+            self.data = {}
+
+    def project(self, project_id):
+        return self.data.setdefault(project_id, {"covered": 0, "levels": []})
+
+    def save(self):
+        with self._lock:
+            tmp = self.path + ".tmp"
+            with open(tmp, 'w') as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(tmp, self.path)
+
+    def reset(self, project_id=None):
+        if project_id is None:
+            self.data = {}
+        else:
+            self.data.pop(project_id, None)
+        self.save()
+
+
+class ConversationSummarizer:
+    """
+    Incrementally compacts older turns of each project into rolling summaries.
+
+    Turns older than the newest keep_recent are folded, chunk_turns at a time, into level-0
+    summaries; whenever a level holds more than fanout summaries, its oldest fanout are merged
+    into one summary on the next level. The top level (max_levels - 1) is a single rolling
+    digest that absorbs each merge, so a project keeps at most fanout * (max_levels - 1) + 1
+    summaries however long it grows, and each update only summarizes the new chunk.
+    """
+
+    def __init__(self, memory, store=None, summarize=extractive_summary,
+                 chunk_turns=CHUNK_TURNS, keep_recent=KEEP_RECENT, fanout=FANOUT, max_levels=MAX_LEVELS):
+        self.memory = memory
+        self.store = store or SummaryStore()
+        self.summarize = summarize
+        self.chunk_turns = chunk_turns
+        self.keep_recent = keep_recent
+        self.fanout = fanout
+        self.max_levels = max_levels
+        self._lock = threading.Lock()           # summary state; never held while summarizing
+        self._schedule_lock = threading.Lock()  # background queue bookkeeping
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._worker = None
+
+    def _project_history(self, project_id):
+        return [h for h in self.memory.history if h.get('project_id', 'default') == project_id]
+
+    def update(self, project_id):
+        """Summarizes every complete chunk that has aged out of the verbatim window; returns chunks added."""
+        added = 0
+        while True:
+            # Snapshot under the lock, summarize without it (summarize may be a full LLM call), then
+            # commit only if nobody reset or advanced this project in the meantime
+            with self._lock:
+                history = self._project_history(project_id)
+                state = self.store.project(project_id)
+                if state["covered"] > len(history):
+                    # History was cleared or rewritten underneath us; start over
+                    state["covered"], state["levels"] = 0, []
+                covered = state["covered"]
+                if covered + self.chunk_turns > len(history) - self.keep_recent:
+                    break
+                chunk = history[covered:covered + self.chunk_turns]
+                levels = [list(level) for level in state["levels"]]
+            with stage_timer("summarize"):
+                text = self.summarize([f"{h['user']}: {h['message']}" for h in chunk])
+            self._push(levels, 0, {"text": text, "turns": len(chunk)})
+            with self._lock:
+                if self.store.data.get(project_id) is not state or state["covered"] != covered:
+                    break
+                state["levels"], state["covered"] = levels, covered + len(chunk)
+                added += 1
+        if added:
+            with self._lock:
+                self.store.save()
+        return added
+
+    def _push(self, levels, level, summary):
+        while len(levels) <= level:
+            levels.append([])
+        levels[level].append(summary)
+        if level == self.max_levels - 1:
+            if len(levels[level]) > 1:
+                with stage_timer("summarize"):
+                    text = self.summarize([s["text"] for s in levels[level]])
+                levels[level] = [{"text": text, "turns": sum(s["turns"] for s in levels[level])}]
+        elif len(levels[level]) > self.fanout:
+            merged, levels[level] = levels[level][:self.fanout], levels[level][self.fanout:]
+            with stage_timer("summarize"):
+                text = self.summarize([s["text"] for s in merged])
+            self._push(levels, level + 1, {"text": text, "turns": sum(s["turns"] for s in merged)})
+
+    def summaries(self, project_id):
+        """Summary texts oldest-first: the highest (oldest, coarsest) level comes first."""
+        state = self.store.data.get(project_id)
+        if not state:
+            return []
+        return [s["text"] for level in reversed(state["levels"]) for s in level]
+
+    def recent_history(self, project_id, max_turns=None):
+        """Turns not yet covered by a summary, i.e. what the prompt must still carry verbatim."""
+        history = self._project_history(project_id)
+        state = self.store.data.get(project_id)
+        covered = state["covered"] if state and state["covered"] <= len(history) else 0
+        recent = history[covered:]
+        return recent[-max_turns:] if max_turns else recent
+
+    def reset(self, project_id=None):
+        with self._lock:
+            self.store.reset(project_id)
+
+    # --- Background worker ---
+    def schedule(self, project_id):
+        """Queues an incremental update on the background thread (duplicate requests collapse)."""
+        with self._schedule_lock:
+            if project_id in self._pending:
+                return
+            self._pending.add(project_id)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="summarizer", daemon=True)
+                self._worker.start()
+        self._queue.put(project_id)
+
+    def _run(self):
+        while True:
+            project_id = self._queue.get()
+            with self._schedule_lock:
+                self._pending.discard(project_id)
+            try:
+                self.update(project_id)
+            except Exception:
+                logging.exception(f"Summarizing project {project_id} failed")
@@ -0,0 +1,151 @@
+# Hot/cold tiering: archived projects' messages move from chat_messages to the compressed cold store
+import logging
+import uuid
+from itertools import islice
+from sqlalchemy import delete, func, insert
+from model.db import ChatMessage, VectorTombstone
+from model.cold_store import get_cold_store, SEGMENT_ROWS
+from model.deletion import VECTOR_TOMBSTONES
+from model.metrics import REGISTRY, stage_timer
+
+HOT_MESSAGES = REGISTRY.gauge(
+    "mazgpt_hot_messages", "Rows in the hot chat_messages table")
+TIERED_MESSAGES = REGISTRY.counter(
+    "mazgpt_tiered_messages_total", "Messages moved between the hot table and the cold store", ["direction"])
+
+
+def refresh_hot_size(db):
+    HOT_MESSAGES.set(db.query(func.count(ChatMessage.id)).scalar())
+
+
+def freeze_project(db, user_id, project_id, store=None, segment_rows=SEGMENT_ROWS):
+    """
+    Moves a project's messages to the cold store one segment at a time: the segment is committed to
+    the cold store before its rows are deleted from chat_messages, and a segment that is already
+    stored (an interrupted earlier run) is not written twice. The project's vectors are queued for
+    removal from the live index. Returns the number of messages moved.
+    """
+    store = store or get_cold_store()
+    moved = 0
+    while True:
+        rows = db.query(ChatMessage.id, ChatMessage.sender, ChatMessage.content, ChatMessage.version,
+                        ChatMessage.created_at, ChatMessage.updated_at) \
+            .filter(ChatMessage.user_id == user_id, ChatMessage.project_id == project_id) \
+            .order_by(ChatMessage.id).limit(segment_rows).all()
+        if not rows:
+            break
+        if not store.has_segment(project_id, rows[0].id, rows[-1].id):
+            store.write_segment(user_id, project_id, rows)
+        with stage_timer("delete_chunk"):
+            db.execute(delete(ChatMessage).where(ChatMessage.id.in_([r.id for r in rows])))
+            db.commit()
+        moved += len(rows)
+    if moved:
+        db.add(VectorTombstone(project_key=str(project_id)))
+        db.commit()
+        VECTOR_TOMBSTONES.inc()
+    TIERED_MESSAGES.labels("to_cold").inc(moved)
+    refresh_hot_size(db)
+    logging.info(f"Moved {moved} messages of project {project_id} to the cold store")
+    return moved
+
+
+def thaw_project(db, user_id, project_id, store=None, chunk_rows=SEGMENT_ROWS):
+    """
+    Moves a project's archived messages back into chat_messages (new ids, original order and
+    timestamps) and drops its cold segments. Pending vector removal for the project is cancelled;
+    use reindex_project to rebuild its vectors. Returns the number of messages restored.
+    """
+    store = store or get_cold_store()
+    restored, batch = 0, []
+
+    def flush():
+        db.execute(insert(ChatMessage), [
+            {"project_id": project_id, "user_id": user_id, "sender": m.sender, "content": m.content,
+             "version": m.version, "created_at": m.created_at, "updated_at": m.updated_at} for m in batch])
+        batch.clear()
+
+    for m in store.iter_messages(project_id):
+        batch.append(m)
+        restored += 1
+        if len(batch) >= chunk_rows:
+            flush()
+    if batch:
+        flush()
+    db.query(VectorTombstone).filter(VectorTombstone.project_key == str(project_id)).delete()
+    db.commit()
+    # Only dropped once the hot copy is committed
+    store.drop_project(project_id)
+    TIERED_MESSAGES.labels("to_hot").inc(restored)
+    refresh_hot_size(db)
+    return restored
+
+
+def read_messages(db, project, limit, store=None):
+    """
+    A project's first ``limit`` messages, oldest first: an archived project's cold segments, then its
+    hot rows (messages sent after archiving, or a project archived before tiering existed).
+    """
+    out = []
+    if has_cold_messages(project, store):
+        for m in (store or get_cold_store()).iter_messages(project.id):
+            if len(out) >= limit:
+                return out
+            out.append(m)
+    return out + db.query(ChatMessage).filter(ChatMessage.project_id == project.id, ChatMessage.user_id == project.user_id) \
+        .order_by(ChatMessage.created_at.asc()).limit(limit - len(out)).all()
+
+
+def has_cold_messages(project, store=None):
+    return bool(project.archived) and (store or get_cold_store()).message_count(project.id) > 0
+
+
+def search_cold(project, needle, store=None):
+    """
+    Yields case-insensitive substring matches in an archived project's cold segments, newest first;
+    segments are only decompressed as the caller reads on, so a page of results stops the scan early.
+    """
+    needle = needle.lower()
+    for m in (store or get_cold_store()).iter_messages(project.id, newest_first=True):
+        if needle in m.content.lower():
+            yield m
+
+
+def search_page(hot_matches, project, needle, offset, limit, store=None):
+    """
+    One page of an archived project's keyword matches, newest first: ``hot_matches`` (a query over
+    its chat_messages rows, newest first), then its cold segments. The cold scan stops one match
+    past the page, so the returned total is exact on the last page and otherwise only tells that
+    another page follows (total > offset + limit). Returns (messages, total).
+    """
+    hot_total = hot_matches.count()
+    page = hot_matches.offset(offset).limit(limit).all()
+    skip, take = max(0, offset - hot_total), limit - len(page)
+    cold = list(islice(search_cold(project, needle, store), skip + take + 1))
+    return page + cold[skip:skip + take], hot_total + len(cold)
+
+
+def reindex_project(semantic_memory, session_factory, user_id, project_id, batch_size=64):
+    """
+    Rebuilds a project's vectors from its hot messages, in batches (run after thaw_project). Vectors
+    already in the index are dropped first: thawing cancels their pending removal, so without this
+    a project whose vectors the cleaner had not reached yet would be indexed twice.
+    """
+    cleared = semantic_memory.delete_project(str(project_id))
+    db = session_factory()
+    indexed, last_id = 0, 0
+    try:
+        while True:
+            rows = db.query(ChatMessage.id, ChatMessage.sender, ChatMessage.content) \
+                .filter(ChatMessage.user_id == user_id, ChatMessage.project_id == project_id, ChatMessage.id > last_id) \
+                .order_by(ChatMessage.id).limit(batch_size).all()
+            if not rows:
+                break
+            semantic_memory.add_messages([str(uuid.uuid4()) for _ in rows], [r.content for r in rows],
+                                         [{"user": r.sender} for r in rows], project_id=str(project_id))
+            indexed += len(rows)
+            last_id = rows[-1].id
+    finally:
+        db.close()
+    logging.info(f"Re-indexed {indexed} messages of unarchived project {project_id} ({cleared} old vectors dropped)")
+    return indexed
@@ -0,0 +1,172 @@
+# Lightweight in-process span tracer for MazGPT (replaces full-rate Sentry tracing)
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+TRACE_SAMPLE_RATE = float(os.environ.get("MAZGPT_TRACE_SAMPLE_RATE", "0.01"))
+TRACE_SLOW_MS = float(os.environ.get("MAZGPT_TRACE_SLOW_MS", "1000"))
+TRACE_BUFFER_SIZE = int(os.environ.get("MAZGPT_TRACE_BUFFER", "200"))
+TRACE_MAX_SPANS = int(os.environ.get("MAZGPT_TRACE_MAX_SPANS", "500"))
+
+_current_trace = ContextVar("mazgpt_current_trace", default=None)
+_current_span = ContextVar("mazgpt_current_span", default=None)
+_ids = itertools.count(1)
+
+
+class Span:
+    __slots__ = ("span_id", "parent_id", "name", "start", "end", "attrs", "thread_id")
+
+    def __init__(self, name, parent_id=None, attrs=None, start=None):
+        self.span_id = next(_ids)
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        self.attrs = attrs or {}
+        self.thread_id = threading.get_ident()
+
+    @property
+    def duration_ms(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self):
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "duration_ms": round(self.duration_ms, 3),
+            "attrs": self.attrs,
+        }
+
+
+class Trace:
+    def __init__(self, name, sampled, attrs=None, max_spans=TRACE_MAX_SPANS):
+        self.trace_id = next(_ids)
+        self.sampled = sampled
+        self.wall_start = time.time()
+        self.root = Span(name, attrs=attrs)
+        self.spans = [self.root]
+        self.max_spans = max_spans
+        self.dropped_spans = 0
+
+    def add(self, s):
+        # Whether a trace is kept is only known when it ends (tail sampling), so every trace records
+        # its spans; the cap bounds what a long loop of queries can pin until then.
+        if len(self.spans) < self.max_spans:
+            self.spans.append(s)
+        else:
+            self.dropped_spans += 1
+
+    @property
+    def duration_ms(self):
+        return self.root.duration_ms
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "started_at": self.wall_start,
+            "duration_ms": round(self.duration_ms, 3),
+            "sampled": self.sampled,
+            "dropped_spans": self.dropped_spans,
+            "spans": [s.to_dict() for s in self.spans],
+        }
+
+
+class Tracer:
+    """Head-samples a fraction of traces and tail-samples every trace slower than slow_ms."""
+
+    def __init__(self, sample_rate=TRACE_SAMPLE_RATE, slow_ms=TRACE_SLOW_MS, capacity=TRACE_BUFFER_SIZE,
+                 max_spans=TRACE_MAX_SPANS):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_spans = max_spans
+        self._buffer = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def start_trace(self, name, **attrs):
+        if _current_trace.get() is not None:
+            # Nested entry points (e.g. router called from an API request) become spans
+            with span(name, **attrs) as s:
+                yield s
+            return
+        trace = Trace(name, sampled=random.random() < self.sample_rate, attrs=attrs, max_spans=self.max_spans)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(trace.root)
+        try:
+            yield trace.root
+        finally:
+            trace.root.end = time.perf_counter()
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            if trace.sampled or trace.duration_ms >= self.slow_ms:
+                with self._lock:
+                    self._buffer.append(trace)
+
+    def recent(self, limit=None):
+        with self._lock:
+            traces = list(self._buffer)
+        traces.reverse()
+        return traces[:limit] if limit else traces
+
+    def clear(self):
+        with self._lock:
+            self._buffer.clear()
+
+    def export_chrome(self, limit=None):
+        """Returns traces in the Chrome trace event format (load in chrome://tracing or Perfetto)."""
+        events = []
+        for trace in self.recent(limit):
+            offset_us = trace.wall_start * 1e6 - trace.root.start * 1e6
+            for s in trace.spans:
+                end = s.end if s.end is not None else trace.root.end
+                events.append({
+                    "name": s.name,
+                    "cat": "mazgpt",
+                    "ph": "X",
+                    "ts": round(s.start * 1e6 + offset_us),
+                    "dur": round((end - s.start) * 1e6),
+                    "pid": trace.trace_id,
+                    "tid": s.thread_id,
+                    "args": dict(s.attrs, span_id=s.span_id, parent_id=s.parent_id),
+                })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+tracer = Tracer()
+
+
+@contextmanager
+def span(name, **attrs):
+    """Records a child span of the active trace; a no-op outside a trace."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    s = Span(name, parent_id=parent.span_id if parent else None, attrs=attrs)
+    trace.add(s)
+    token = _current_span.set(s)
+    try:
+        yield s
+    finally:
+        s.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def record_span(name, start, end, **attrs):
+    """Adds an already-timed span (e.g. from SQLAlchemy events) to the active trace."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    parent = _current_span.get()
+    s = Span(name, parent_id=parent.span_id if parent else None, attrs=attrs, start=start)
+    s.end = end
+    trace.add(s)
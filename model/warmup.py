@@ -0,0 +1,61 @@
+# Background loading of heavy resources (models, embedders) so interactive front ends start instantly
+import logging
+import threading
+import time
+from model.metrics import stage_timer
+
+
+class BackgroundResource:
+    """Builds a resource with ``factory`` on a daemon thread; ``get()`` blocks only if it is not ready yet."""
+
+    def __init__(self, name, factory, start=True, on_ready=None):
+        self.name = name
+        self._factory = factory
+        self._on_ready = on_ready
+        self._value = None
+        self._error = None
+        self._done = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+        self.load_seconds = None
+        if start:
+            self.start()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._load, name=f"warmup-{self.name}", daemon=True).start()
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            with stage_timer("warmup_" + self.name.replace(" ", "_")):
+                self._value = self._factory()
+            if self._on_ready is not None:
+                self._on_ready(self._value)
+        except BaseException as e:
+            self._error = e
+            logging.exception(f"Loading {self.name} failed")
+        finally:
+            self.load_seconds = time.perf_counter() - start
+            self._done.set()
+
+    @property
+    def ready(self):
+        return self._done.is_set() and self._error is None
+
+    def get(self, on_wait=None):
+        """Returns the resource, starting the load if needed; ``on_wait`` is called once if we have to block."""
+        if not self._done.is_set():
+            self.start()
+            if on_wait is not None:
+                on_wait(self.name)
+            self._done.wait()
+        if self._error is not None:
+            raise RuntimeError(f"{self.name} failed to load: {self._error}") from self._error
+        return self._value
+
+    def get_if_ready(self):
+        return self._value if self.ready else None
@@ -0,0 +1,306 @@
+# Multi-process model serving: worker processes host LocalLLMs and pull requests from shared queues
+import importlib
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from model.metrics import REGISTRY, QUEUE_WAIT_SECONDS
+
+DEFAULT_FACTORY = "model.llm:LocalLLM"
+HEARTBEAT_INTERVAL = 1.0
+HEARTBEAT_TIMEOUT = float(os.environ.get("MAZGPT_WORKER_HEARTBEAT_TIMEOUT", "30"))
+REQUEST_TIMEOUT = float(os.environ.get("MAZGPT_WORKER_REQUEST_TIMEOUT", "300"))
+MAX_RESTART_DELAY = 30.0
+# A worker that has stayed ready this long starts its restart back-off from scratch on its next crash
+HEALTHY_AFTER = float(os.environ.get("MAZGPT_WORKER_HEALTHY_AFTER", "300"))
+
+WORKER_RESTARTS = REGISTRY.counter(
+    "mazgpt_worker_restarts_total", "Model worker processes restarted after a crash or missed heartbeats", ["group"])
+WORKER_PENDING = REGISTRY.gauge(
+    "mazgpt_worker_pending", "Requests queued or running per worker group", ["group"])
+
+_pools = weakref.WeakSet()
+
+
+class WorkerError(RuntimeError):
+    """A request failed inside a model worker."""
+
+
+class WorkerCrashedError(WorkerError):
+    """The worker handling a request died or stopped sending heartbeats."""
+
+
+def _load_factory(path):
+    module, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+def _worker_main(worker_id, group, models, factory, device, requests, results, heartbeat):
+    # Runs in the child process: load the hosted models, then serve the group's queue until told to stop
+    def beat():
+        while True:
+            heartbeat.value = time.time()
+            time.sleep(HEARTBEAT_INTERVAL)
+    threading.Thread(target=beat, daemon=True).start()
+    try:
+        build = _load_factory(factory)
+        hosted = {}
+        for name, kwargs in models.items():
+            kwargs = dict(kwargs)
+            if device is not None:
+                kwargs["device"] = device
+            hosted[name] = build(**kwargs)
+    except Exception as e:
+        results.put(("failed", worker_id, f"{type(e).__name__}: {e}"))
+        return
+    results.put(("ready", worker_id, os.getpid()))
+    while True:
+        msg = requests.get()
+        if msg is None:
+            break
+        req_id, model, method, args, kwargs, enqueued_at = msg
+        results.put(("start", worker_id, req_id, time.time() - enqueued_at))
+        try:
+            out = getattr(hosted[model], method)(*args, **kwargs)
+            results.put(("done", worker_id, req_id, True, out))
+        except Exception as e:
+            results.put(("done", worker_id, req_id, False, f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, worker_id, group, device):
+        self.id = worker_id
+        self.group = group
+        self.device = device
+        self.process = None
+        self.heartbeat = None
+        self.pid = None
+        self.ready = False
+        self.ready_at = None
+        self.current = None  # request id being served
+        self.restarts = 0
+        self.restart_at = None  # set while waiting to be restarted
+        self.error = None
+
+
+class WorkerPool:
+    """
+    Serves model calls from ``processes`` worker processes per group.
+
+    ``groups`` is a list of {"name", "models": {model_name: factory kwargs}, "processes", "devices"}.
+    Every worker of a group hosts all the group's models and pulls from the group's shared queue,
+    so an idle worker always takes the next request. Workers are spawned (not forked) so CUDA and
+    tokenizer threads start clean. A monitor thread restarts workers that exit or stop sending
+    heartbeats, with exponential back-off, and fails the request they were serving with
+    WorkerCrashedError. While every worker of a group is down, the group's queued requests fail
+    with WorkerError instead of waiting out their timeout.
+    """
+
+    def __init__(self, groups, factory=DEFAULT_FACTORY, heartbeat_timeout=HEARTBEAT_TIMEOUT,
+                 healthy_after=HEALTHY_AFTER):
+        self.factory = factory
+        self.heartbeat_timeout = heartbeat_timeout
+        self.healthy_after = healthy_after
+        self._ctx = mp.get_context("spawn")
+        # SimpleQueue writes synchronously, so a "start" message is never lost if the worker dies right after
+        self._results = self._ctx.SimpleQueue()
+        self._groups = {}
+        self._model_groups = {}
+        self._futures = {}  # request id -> (future, group name)
+        self._pending = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._workers = []
+        for group in groups:
+            name = group["name"]
+            self._groups[name] = {"models": group["models"], "queue": self._ctx.Queue()}
+            self._pending[name] = 0
+            for model in group["models"]:
+                self._model_groups.setdefault(model, []).append(name)
+            devices = group.get("devices") or [None]
+            for i in range(int(group.get("processes", 1))):
+                worker = _Worker(len(self._workers), name, devices[i % len(devices)])
+                self._workers.append(worker)
+                self._spawn(worker)
+        threading.Thread(target=self._collect, name="worker-results", daemon=True).start()
+        threading.Thread(target=self._monitor, name="worker-monitor", daemon=True).start()
+        _pools.add(self)
+
+    def _spawn(self, worker):
+        group = self._groups[worker.group]
+        worker.heartbeat = self._ctx.Value("d", time.time())
+        worker.ready = False
+        worker.current = None
+        worker.restart_at = None
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.id, worker.group, group["models"], self.factory, worker.device,
+                  group["queue"], self._results, worker.heartbeat),
+            name=f"mazgpt-worker-{worker.group}-{worker.id}",
+            daemon=True,
+        )
+        worker.process.start()
+
+    # --- Client side ---
+    def submit(self, model, method, *args, **kwargs):
+        """Queues backend.<method>(*args, **kwargs) on a worker hosting ``model``; returns a Future."""
+        if self._closed:
+            raise WorkerError("Worker pool is shut down")
+        names = self._model_groups.get(model)
+        if not names:
+            raise KeyError(f"No worker group hosts model '{model}'")
+        future = Future()
+        with self._lock:
+            group = min(names, key=self._pending.get)
+            req_id = next(self._ids)
+            self._futures[req_id] = (future, group)
+            self._pending[group] += 1
+        WORKER_PENDING.labels(group).inc()
+        self._groups[group]["queue"].put((req_id, model, method, args, kwargs, time.time()))
+        return future
+
+    def call(self, model, method, *args, timeout=REQUEST_TIMEOUT, **kwargs):
+        return self.submit(model, method, *args, **kwargs).result(timeout=timeout)
+
+    def processes(self, model):
+        """Number of worker processes able to serve ``model``."""
+        return sum(1 for w in self._workers if w.group in self._model_groups.get(model, ()))
+
+    def _resolve(self, req_id, ok, value):
+        with self._lock:
+            entry = self._futures.pop(req_id, None)
+            if entry is None:
+                return
+            future, group = entry
+            self._pending[group] -= 1
+        WORKER_PENDING.labels(group).dec()
+        if ok:
+            future.set_result(value)
+        else:
+            future.set_exception(value if isinstance(value, BaseException) else WorkerError(value))
+
+    def _collect(self):
+        while True:
+            try:
+                msg = self._results.get()
+            except (EOFError, OSError):
+                return
+            kind, worker = msg[0], self._workers[msg[1]]
+            if kind == "ready":
+                worker.ready, worker.ready_at, worker.pid, worker.error = True, time.time(), msg[2], None
+                logging.info(f"Model worker {worker.id} ({worker.group}) ready, pid {worker.pid}")
+            elif kind == "failed":
+                worker.error = msg[2]
+                logging.error(f"Model worker {worker.id} ({worker.group}) failed to load: {msg[2]}")
+            elif kind == "start":
+                worker.current = msg[2]
+                QUEUE_WAIT_SECONDS.labels(f"worker:{worker.group}").observe(max(0.0, msg[3]))
+            elif kind == "done":
+                if worker.current == msg[2]:
+                    worker.current = None
+                self._resolve(msg[2], msg[3], msg[4])
+
+    # --- Health and restarts ---
+    def _monitor(self):
+        while not self._closed:
+            time.sleep(HEARTBEAT_INTERVAL)
+            now = time.time()
+            for worker in self._workers:
+                if self._closed:
+                    return
+                if worker.restart_at is not None:
+                    if now >= worker.restart_at:
+                        self._spawn(worker)
+                    continue
+                dead = not worker.process.is_alive()
+                stale = now - worker.heartbeat.value > self.heartbeat_timeout
+                if dead or stale:
+                    self._fail_worker(worker, "exited" if dead else "stopped sending heartbeats")
+                elif worker.restarts and worker.ready and now - worker.ready_at >= self.healthy_after:
+                    worker.restarts = 0
+            for name in self._groups:
+                workers = [w for w in self._workers if w.group == name]
+                if all(w.restart_at is not None for w in workers):
+                    self._fail_queued(name, workers)
+
+    def _fail_queued(self, name, workers):
+        with self._lock:
+            queued = [req_id for req_id, (_, group) in self._futures.items() if group == name]
+        if not queued:
+            return
+        # Drop the queued messages so the restarted workers don't run requests nobody waits for
+        group_queue = self._groups[name]["queue"]
+        try:
+            while True:
+                group_queue.get_nowait()
+        except queue.Empty:
+            pass
+        errors = {w.error for w in workers if w.error}
+        reason = f": {'; '.join(sorted(errors))}" if errors else ""
+        logging.error(f"No model worker of group {name} is running; failing {len(queued)} queued requests")
+        for req_id in queued:
+            self._resolve(req_id, False, WorkerError(f"No model worker of group '{name}' is running{reason}"))
+
+    def _fail_worker(self, worker, reason):
+        logging.error(f"Model worker {worker.id} ({worker.group}) {reason}; restarting")
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join(timeout=5)
+        if worker.current is not None:
+            self._resolve(worker.current, False, WorkerCrashedError(f"Model worker {worker.id} {reason}"))
+        worker.restarts += 1
+        WORKER_RESTARTS.labels(worker.group).inc()
+        worker.ready = False
+        worker.restart_at = time.time() + min(MAX_RESTART_DELAY, 2 ** (worker.restarts - 1) - 1)
+
+    def health(self):
+        now = time.time()
+        return [
+            {
+                "worker": w.id, "group": w.group, "pid": w.pid, "alive": bool(w.process and w.process.is_alive()),
+                "ready": w.ready, "busy": w.current is not None, "restarts": w.restarts, "error": w.error,
+                "heartbeat_age": round(now - w.heartbeat.value, 3) if w.heartbeat else None,
+                "pending": self._pending[w.group],
+            }
+            for w in self._workers
+        ]
+
+    def shutdown(self, timeout=10):
+        self._closed = True
+        for name, group in self._groups.items():
+            for _ in range(sum(1 for w in self._workers if w.group == name)):
+                group["queue"].put(None)
+        deadline = time.time() + timeout
+        for worker in self._workers:
+            worker.process.join(timeout=max(0.1, deadline - time.time()))
+            if worker.process.is_alive():
+                worker.process.kill()
+        with self._lock:
+            pending = list(self._futures)
+        for req_id in pending:
+            self._resolve(req_id, False, WorkerError("Worker pool shut down"))
+
+
+def active_pools():
+    return list(_pools)
+
+
+class RemoteLLM:
+    """LocalLLM-compatible client for a model hosted in a WorkerPool (generate only; output is returned whole)."""
+
+    def __init__(self, pool, model_name, timeout=REQUEST_TIMEOUT):
+        self.pool = pool
+        self.model_name = model_name
+        self.metrics_label = model_name
+        self.timeout = timeout
+
+    def generate(self, prompt, max_new_tokens=128, stream=False, language="en", tone="friendly"):
+        # Streaming prints from the worker's stdout would be lost, so the reply is always returned whole
+        return self.pool.call(self.model_name, "generate", prompt, max_new_tokens=max_new_tokens,
+                              language=language, tone=tone, timeout=self.timeout)
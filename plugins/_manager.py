@@ -0,0 +1,242 @@
+"""
+Plugin Manager
+--------------
+Discovers plugins in this directory and routes each message with one lookup.
+
+Plugins declare how they are triggered in their ``meta`` dict:
+
+- commands: leading command words, e.g. ["/upload", "/download"]
+- triggers: regular expressions searched anywhere in the message
+- priority: higher runs first when several plugins match (default 0)
+- budget_ms: expected worst-case handle() time; overruns are logged and counted
+- timeout_ms: hard limit after which the plugin's answer is abandoned (default 5000)
+- max_concurrency: how many calls of this plugin may run at once (default 4)
+
+Commands go into a dict keyed by the message's first word and all trigger
+patterns are compiled into a single regex, so routing a message costs one dict
+lookup plus one regex match. Plugins that declare neither are treated as
+catch-alls and are offered every message after the indexed candidates.
+
+handle() never runs on the caller's thread: sync plugins run on a shared thread
+pool and ``async def handle`` plugins on a background event loop, so a slow
+plugin cannot stall the CLI prompt or the web UI handler, and callers can use
+dispatch_async() to overlap plugin I/O with retrieval and prompt building.
+"""
+import asyncio
+import importlib
+import inspect
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict
+
+from model.metrics import PLUGIN_SECONDS, REGISTRY
+
+PLUGINS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PRIORITY = 0
+DEFAULT_BUDGET_MS = 500
+DEFAULT_TIMEOUT_MS = 5000
+DEFAULT_MAX_CONCURRENCY = 4
+PLUGIN_WORKERS = int(os.environ.get("MAZGPT_PLUGIN_WORKERS", "8"))
+# Concurrent dispatches (each waits on its candidates one after another); one per chat turn in flight
+PLUGIN_DISPATCHERS = int(os.environ.get("MAZGPT_PLUGIN_DISPATCHERS", str(PLUGIN_WORKERS)))
+
+PLUGIN_BUDGET_EXCEEDED = REGISTRY.counter(
+    "mazgpt_plugin_budget_exceeded_total", "Plugin handle() calls that exceeded their time budget", ["plugin"])
+PLUGIN_FAILURES = REGISTRY.counter(
+    "mazgpt_plugin_failures_total", "Plugin calls that timed out, were rejected or raised", ["plugin", "reason"])
+
+class _AsyncRunner:
+    """Owns an event loop on a daemon thread for plugins with ``async def handle``."""
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def submit(self, coro):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="plugin-async", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def stop(self):
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+
+class PluginManager:
+    def __init__(self):
+        self.plugins: Dict[str, Any] = {}
+        self.metadata: Dict[str, dict] = {}
+        self._commands: Dict[str, list] = {}
+        self._trigger_re = None
+        self._trigger_groups: Dict[str, str] = {}
+        self._catch_all: list = []
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._executor = ThreadPoolExecutor(max_workers=PLUGIN_WORKERS, thread_name_prefix="plugin")
+        # Dispatch runs candidates one after another, so it gets its own pool to never wait on itself
+        self._dispatcher = ThreadPoolExecutor(max_workers=PLUGIN_DISPATCHERS, thread_name_prefix="plugin-dispatch")
+        self._async_runner = _AsyncRunner()
+        self.load_plugins()
+
+    def load_plugins(self):
+        self.plugins.clear()
+        self.metadata.clear()
+        sys.path.insert(0, PLUGINS_DIR)
+        for fname in sorted(os.listdir(PLUGINS_DIR)):
+            if fname.endswith('.py') and not fname.startswith('_'):
+                mod_name = fname[:-3]
+                qualified = f'plugins.{mod_name}'
+                try:
+                    if qualified in sys.modules:
+                        # Reload if already loaded
+                        module = importlib.reload(sys.modules[qualified])
+                    else:
+                        module = importlib.import_module(qualified)
+                    if hasattr(module, 'register'):
+                        plugin = module.register()
+                        self.plugins[mod_name] = plugin
+                        # Plugin metadata: docstring or .meta attribute
+                        meta = dict(getattr(plugin, 'meta', {}))
+                        if not meta and plugin.__doc__:
+                            meta = {'description': plugin.__doc__}
+                        self.metadata[mod_name] = meta
+                except Exception as e:
+                    print(f"Error loading plugin {mod_name}: {e}")
+        sys.path.pop(0)
+        self._build_dispatch_table()
+
+    def reload_plugins(self):
+        self.load_plugins()
+
+    def get_plugin(self, name):
+        return self.plugins.get(name)
+
+    def list_plugins(self):
+        return list(self.plugins.keys())
+
+    def get_metadata(self, name):
+        return self.metadata.get(name, {})
+
+    def priority(self, name):
+        return self.metadata.get(name, {}).get('priority', DEFAULT_PRIORITY)
+
+    # --- Dispatch table ---
+    def _build_dispatch_table(self):
+        self._commands = {}
+        self._catch_all = []
+        self._trigger_groups = {}
+        self._slots = {
+            name: threading.BoundedSemaphore(self.metadata.get(name, {}).get('max_concurrency', DEFAULT_MAX_CONCURRENCY))
+            for name in self.plugins
+        }
+        ordered = sorted(self.plugins, key=lambda n: -self.priority(n))
+        alternatives = []
+        for idx, name in enumerate(ordered):
+            if not hasattr(self.plugins[name], 'handle'):
+                continue
+            meta = self.metadata.get(name, {})
+            commands = meta.get('commands') or []
+            triggers = meta.get('triggers') or []
+            for cmd in commands:
+                self._commands.setdefault(cmd.lower(), []).append(name)
+            if triggers:
+                group = f"p{idx}"
+                self._trigger_groups[group] = name
+                pattern = "|".join(f"(?:{t})" for t in triggers)
+                # A zero-width lookahead per plugin lets one match() report every plugin whose trigger occurs
+                alternatives.append(f"(?:(?=[\\s\\S]*?(?P<{group}>{pattern}))|)")
+            if not commands and not triggers:
+                self._catch_all.append(name)
+        self._trigger_re = None
+        if alternatives:
+            try:
+                self._trigger_re = re.compile("^" + "".join(alternatives), re.IGNORECASE)
+            except re.error as e:
+                logging.error(f"Invalid plugin trigger pattern, triggers disabled: {e}")
+
+    def candidates(self, text):
+        """Plugins that should see this message, in the order they are tried."""
+        stripped = text.strip()
+        first = stripped.split(maxsplit=1)[0].lower() if stripped else ""
+        names = list(self._commands.get(first, ()))
+        if self._trigger_re is not None:
+            match = self._trigger_re.match(text)
+            triggered = [self._trigger_groups[g] for g, v in match.groupdict().items() if v is not None]
+            names.extend(n for n in triggered if n not in names)
+        names.extend(n for n in self._catch_all if n not in names)
+        return names
+
+    def dispatch(self, text):
+        """Returns (plugin_name, response) for the first plugin that answers, else (None, None)."""
+        return self._first_answer(self.candidates(text), text)
+
+    def dispatch_async(self, text):
+        """Starts dispatch in the background and returns a Future of (plugin_name, response)."""
+        names = self.candidates(text)
+        if not names:
+            # Most messages match no plugin: answered at once, never queued behind slow dispatches
+            future = Future()
+            future.set_result((None, None))
+            return future
+        return self._dispatcher.submit(self._first_answer, names, text)
+
+    def _first_answer(self, names, text):
+        for name in names:
+            response = self._call(name, text)
+            if response:
+                return name, response
+        return None, None
+
+    def shutdown(self):
+        self._dispatcher.shutdown(wait=False, cancel_futures=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._async_runner.stop()
+
+    def _call(self, name, text):
+        """Runs one plugin off the caller's thread, enforcing its concurrency cap and timeout."""
+        plugin = self.plugins[name]
+        meta = self.metadata.get(name, {})
+        budget_ms = meta.get('budget_ms', DEFAULT_BUDGET_MS)
+        timeout_ms = meta.get('timeout_ms', DEFAULT_TIMEOUT_MS)
+        slot = self._slots[name]
+        if not slot.acquire(blocking=False):
+            PLUGIN_FAILURES.labels(name, "busy").inc()
+            logging.warning(f"Plugin {name} skipped: {meta.get('max_concurrency', DEFAULT_MAX_CONCURRENCY)} calls already running")
+            return None
+        start = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(plugin.handle):
+                future = self._async_runner.submit(plugin.handle(text))
+            else:
+                future = self._executor.submit(plugin.handle, text)
+        except BaseException:
+            slot.release()
+            raise
+        # The slot is held until the call really finishes, so a hung plugin stays capped after it times out
+        future.add_done_callback(lambda _: self._finish(name, start, budget_ms, slot))
+        try:
+            return future.result(timeout=timeout_ms / 1000)
+        except FutureTimeoutError:
+            # Cancels async plugins (and sync calls still queued); a running sync call is abandoned
+            future.cancel()
+            PLUGIN_FAILURES.labels(name, "timeout").inc()
+            logging.warning(f"Plugin {name} timed out after {timeout_ms}ms")
+        except Exception:
+            PLUGIN_FAILURES.labels(name, "error").inc()
+            logging.exception(f"Plugin {name} failed")
+        return None
+
+    def _finish(self, name, start, budget_ms, slot):
+        slot.release()
+        elapsed = time.perf_counter() - start
+        PLUGIN_SECONDS.labels(name).observe(elapsed)
+        if elapsed * 1000 > budget_ms:
+            PLUGIN_BUDGET_EXCEEDED.labels(name).inc()
+            logging.warning(f"Plugin {name} took {elapsed * 1000:.0f}ms (budget {budget_ms}ms)")
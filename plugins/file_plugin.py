@@ -16,7 +16,11 @@ class FilePlugin:
     meta = {
         "description": "Handles file upload and download for MazGPT.",
         "version": "1.0.0",
-        "author": "MazGPT Team"
+        "author": "MazGPT Team",
+        "commands": ["/upload", "/download", "/listfiles"],
+        "priority": 10,
+        "budget_ms": 2000,
+        "timeout_ms": 30000
     }
 
     def handle(self, text):
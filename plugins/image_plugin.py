@@ -16,7 +16,11 @@ class ImagePlugin:
     meta = {
         "description": "Handles image upload and basic info for MazGPT.",
         "version": "1.0.0",
-        "author": "MazGPT Team"
+        "author": "MazGPT Team",
+        "commands": ["/imgupload", "/imginfo", "/listimages"],
+        "priority": 10,
+        "budget_ms": 2000,
+        "timeout_ms": 30000
     }
 
     def handle(self, text):
@@ -4,6 +4,13 @@ def register():
     return SamplePlugin()
 
 class SamplePlugin:
+    meta = {
+        "description": "Responds to greetings.",
+        "version": "1.0.0",
+        "author": "MazGPT Team",
+        "triggers": [r"\bhello\b"]
+    }
+
     def handle(self, text):
         if 'hello' in text.lower():
             return 'Hi! This is a response from the sample plugin.'
@@ -1,14 +1,107 @@
-import requests
-from bs4 import BeautifulSoup
+"""
+Web Search Plugin
+-----------------
+Answers questions from DuckDuckGo HTML results. Uses a pooled HTTP session with
+timeouts, a TTL+LRU cache keyed by normalized query, and coalesces identical
+in-flight searches so concurrent turns share one request.
+"""
+import html
+import os
 import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+
+SEARCH_URL = os.environ.get("MAZGPT_SEARCH_URL", "https://duckduckgo.com/html/")
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = float(os.environ.get("MAZGPT_SEARCH_TIMEOUT", "8"))
+CACHE_TTL = float(os.environ.get("MAZGPT_SEARCH_CACHE_TTL", "600"))
+CACHE_SIZE = int(os.environ.get("MAZGPT_SEARCH_CACHE_SIZE", "256"))
+MAX_RESULTS = 5
+
+_SNIPPET_RE = re.compile(r'class="result__snippet"[^>]*>(.*?)</(?:a|div)>', re.S)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+# Explicit search intent only; plain questions go to the LLM instead of the web
+TRIGGERS = [r"\b(?:search|look up|google)\b", r"\bon the (?:web|internet)\b", r"\bfind online\b"]
+_TRIGGER_RE = re.compile("|".join(TRIGGERS), re.IGNORECASE)
 
 def register():
     return WebSearchPlugin()
 
+def normalize_query(query):
+    return _SPACE_RE.sub(" ", query.strip().lower()).rstrip("?!. ")
+
+def make_session(pool_size=16):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=1)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({'User-Agent': 'Mozilla/5.0'})
+    return session
+
+class _TTLCache:
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
 class WebSearchPlugin:
+    meta = {
+        "description": "Searches the web and extracts a short answer.",
+        "version": "1.1.0",
+        "author": "MazGPT Team",
+        "triggers": TRIGGERS,
+        "priority": -10,
+        "budget_ms": 10000,
+        "timeout_ms": 15000,
+        "max_concurrency": 8
+    }
+
+    def __init__(self, search_url=None, session=None, cache_ttl=CACHE_TTL, cache_size=CACHE_SIZE,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)):
+        self.search_url = search_url or SEARCH_URL
+        self.timeout = timeout
+        self._session = session
+        self._session_lock = threading.Lock()
+        self._cache = _TTLCache(cache_ttl, cache_size)
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = make_session()
+        return self._session
+
     def handle(self, text):
-        keywords = ['search', 'find', 'look up', 'web', 'internet', 'google']
-        if any(k in text.lower() for k in keywords) or text.strip().endswith('?'):
+        if _TRIGGER_RE.search(text):
             query = text
             answer = self.web_search_and_extract_answer(query)
             if answer:
@@ -18,30 +111,72 @@ class WebSearchPlugin:
         return None
 
     def web_search_and_extract_answer(self, query):
+        key = normalize_query(query)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        # Coalesce identical in-flight queries: followers wait on the leader's future
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        if not leader:
+            return future.result(timeout=sum(self.timeout) + 1)
         try:
-            url = f'https://duckduckgo.com/html/?q={requests.utils.quote(query)}'
-            resp = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'})
-            if resp.status_code == 200:
-                soup = BeautifulSoup(resp.text, 'html.parser')
-                results = soup.find_all('div', class_='result')
-                snippets = []
-                for result in results[:5]:
-                    title = result.find('a', class_='result__a')
-                    snippet = result.find('a', class_='result__snippet')
-                    if not snippet:
-                        snippet = result.find('div', class_='result__snippet')
-                    if title and snippet:
-                        snippets.append(snippet.get_text(strip=True))
-                # Try to extract a direct answer for fact-based questions
-                answer = self.extract_direct_answer(query, snippets)
-                if answer:
-                    return f'Web answer: {answer}'
-                # Fallback: join the best snippets
-                if snippets:
-                    return 'Web summary: ' + ' | '.join(snippets)
-        except Exception as e:
-            return f"Web search error: {e}"
-        return None
+            answer, cacheable = self._search(query)
+            if cacheable and answer is not None:
+                self._cache.set(key, answer)
+            future.set_result(answer)
+            return answer
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _search(self, query):
+        """Returns (answer, cacheable); transport errors are reported but never cached."""
+        try:
+            resp = self.session.get(self.search_url, params={'q': query}, timeout=self.timeout)
+        except requests.RequestException as e:
+            return f"Web search error: {e}", False
+        if resp.status_code != 200:
+            return None, False
+        snippets = self.parse_snippets(resp.text)
+        # Try to extract a direct answer for fact-based questions
+        answer = self.extract_direct_answer(query, snippets)
+        if answer:
+            return f'Web answer: {answer}', True
+        # Fallback: join the best snippets
+        if snippets:
+            return 'Web summary: ' + ' | '.join(snippets), True
+        return None, True
+
+    def parse_snippets(self, page):
+        # Fast path: the result markup is regular enough for a regex; only fall back to a full parse when it is not
+        if 'result__snippet' not in page:
+            return []
+        snippets = []
+        for raw in _SNIPPET_RE.findall(page):
+            text = _SPACE_RE.sub(" ", html.unescape(_TAG_RE.sub("", raw))).strip()
+            if text:
+                snippets.append(text)
+            if len(snippets) >= MAX_RESULTS:
+                return snippets
+        return snippets or self._parse_snippets_soup(page)
+
+    def _parse_snippets_soup(self, page):
+        from bs4 import BeautifulSoup, SoupStrainer
+        soup = BeautifulSoup(page, 'html.parser', parse_only=SoupStrainer('div', class_='result'))
+        snippets = []
+        for result in soup.find_all('div', class_='result')[:MAX_RESULTS]:
+            snippet = result.find(class_='result__snippet')
+            if snippet:
+                snippets.append(snippet.get_text(strip=True))
+        return snippets
 
     def extract_direct_answer(self, query, snippets):
         # Prefer snippets with recent years or 'current'
@@ -0,0 +1,38 @@
+# Moves the legacy chat_memory JSON blobs into chat_messages rows while the app keeps serving.
+# Each batch of blobs is exploded and deleted in one short transaction, so the tool can be stopped
+# and re-run at any time (the Alembic revision 2d7f4b8c1e60 runs the same backfill in one go).
+#
+#   python scripts/backfill_chat_memory.py [--batch 50] [--pause 0.05] [--limit N] [--dry-run]
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill legacy chat_memory blobs into chat_messages")
+    parser.add_argument("--batch", type=int, default=50, help="blobs per transaction")
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many blobs")
+    parser.add_argument("--dry-run", action="store_true", help="only report how many blobs are left")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    from model.db import SessionLocal
+    from model.legacy_backfill import backfill, refresh_pending
+    db = SessionLocal()
+    try:
+        pending = refresh_pending(db)
+        print(f"{pending} chat_memory blobs to move")
+        if args.dry_run or not pending:
+            return
+        done = backfill(db, blobs_per_batch=args.batch, pause=args.pause, limit=args.limit)
+        print(f"Moved {done['blobs']} blobs ({done['messages']} messages); {refresh_pending(db)} left")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Benchmark for cached read endpoints (api/caching.py): /chat/history, /project/list and settings
+# called directly with a request that has (a) no cache, (b) a warm in-process cache, (c) a
+# matching If-None-Match (304). Each case includes the endpoint's own project/user lookup.
+#
+#   python scripts/bench_conditional_get.py [--messages 100] [--projects 50]
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def latency(fn, repeat=200):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def request(if_none_match=None):
+    from starlette.requests import Request
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "query_string": b""})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MazGPT conditional GET benchmark")
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--projects", type=int, default=50)
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from model.db import Base, User, Project
+    from model.bulk_import import insert_messages
+    from api import caching
+    from api.chat import get_chat_history
+    from api.project import list_projects
+    from api.settings import get_settings
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'cache.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        user = User(email="bench@example.com", name="Bench", password_hash="x")
+        db.add(user)
+        db.commit()
+        for p in range(args.projects):
+            project = Project(user_id=user.id, name=f"project-{p}")
+            db.add(project)
+            db.flush()
+            insert_messages(db, user.id, project.id, [("user", f"message {i} about the planning meeting", None)
+                                                      for i in range(args.messages)])
+        db.commit()
+        db.refresh(user)
+        pid = str(project.id)
+
+        endpoints = {
+            "history": lambda r: get_chat_history(r, project_id=pid, limit=100, current_user=user, db=db),
+            "list": lambda r: list_projects(r, archived=None, sort="updated", limit=50, cursor=None, current_user=user, db=db),
+            "settings": lambda r: get_settings(r, current_user=user, db=db),
+        }
+        results = {}
+        for name, call in endpoints.items():
+            def cold():
+                caching.response_cache.clear()
+                return call(request())
+            etag = call(request()).headers["ETag"]
+            results[name] = (latency(cold), latency(lambda: call(request())), latency(lambda: call(request(etag))),
+                             len(call(request()).body))
+        db.close()
+
+    print(f"{'endpoint':>9} {'uncached ms':>12} {'cached ms':>10} {'304 ms':>8} {'body bytes':>11}")
+    for name, (cold, warm, not_modified, size) in results.items():
+        print(f"{name:>9} {cold:>12.3f} {warm:>10.3f} {not_modified:>8.3f} {size:>11}")
+
+
+if __name__ == "__main__":
+    main()
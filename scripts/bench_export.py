@@ -0,0 +1,96 @@
+# Benchmark for the GDPR data export on a large account.
+# Seeds a throwaway SQLite database with one user owning --messages chat messages spread over
+# --projects projects, then exports it in a child process per mode and reports wall time, output
+# size and peak RSS. "stream" is the /user/export-data path (model/export.py); "materialize" loads
+# every row and serializes one document, as the endpoint used to.
+#
+#   python scripts/bench_export.py [--messages 1000000] [--projects 20] [--modes stream ndjson materialize]
+import argparse
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+def seed(path, n_messages, n_projects, batch=50_000):
+    from sqlalchemy import create_engine, insert
+    from model.db import Base, User, Project, ChatMessage
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    now = datetime.datetime.utcnow()
+    with engine.begin() as conn:
+        user_id = conn.execute(insert(User).values(email="bench@example.com", name="Bench", password_hash="x")).inserted_primary_key[0]
+        project_ids = [conn.execute(insert(Project).values(user_id=user_id, name=f"project {i}")).inserted_primary_key[0]
+                       for i in range(n_projects)]
+        for start in range(0, n_messages, batch):
+            rows = [{"project_id": project_ids[i % n_projects], "user_id": user_id, "sender": "user" if i % 2 == 0 else "ai",
+                     "content": f"message {i}: " + "lorem ipsum dolor sit amet " * 4, "version": 1,
+                     "created_at": now, "updated_at": now}
+                    for i in range(start, min(n_messages, start + batch))]
+            conn.execute(insert(ChatMessage), rows)
+    return user_id
+
+
+def export(path, user_id, mode):
+    # Runs in the child process so peak RSS belongs to this mode alone
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from model.db import Project, ChatMessage
+    from model.export import iter_export
+    db = sessionmaker(bind=create_engine(f"sqlite:///{path}"))()
+    start, size = time.perf_counter(), 0
+    with open(os.devnull, "w") as out:
+        if mode == "materialize":
+            projects = db.query(Project).filter(Project.user_id == user_id).all()
+            messages = db.query(ChatMessage).filter(ChatMessage.user_id == user_id).all()
+            doc = json.dumps({
+                "projects": [{"id": p.id, "name": p.name} for p in projects],
+                "chats": [{"project_id": p.id, "messages": [
+                    {"sender": m.sender, "text": m.content, "timestamp": m.created_at.isoformat()}
+                    for m in messages if m.project_id == p.id]} for p in projects],
+            })
+            size = len(doc)
+            out.write(doc)
+        else:
+            for chunk in iter_export(db, user_id, "ndjson" if mode == "ndjson" else "json"):
+                size += len(chunk)
+                out.write(chunk)
+    seconds = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"seconds": seconds, "bytes": size, "peak_rss_mb": peak_mb}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MazGPT data export benchmark")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--modes", nargs="+", default=["stream", "ndjson", "materialize"],
+                        choices=["stream", "ndjson", "materialize"])
+    parser.add_argument("--child", nargs=3, metavar=("DB", "USER_ID", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        export(args.child[0], int(args.child[1]), args.child[2])
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "export_bench.db")
+        start = time.perf_counter()
+        user_id = seed(path, args.messages, args.projects)
+        print(f"seeded {args.messages} messages in {args.projects} projects in {time.perf_counter() - start:.1f}s")
+        print(f"{'mode':>12} {'seconds':>8} {'MB out':>8} {'peak RSS MB':>12}")
+        for mode in args.modes:
+            result = subprocess.run([sys.executable, __file__, "--child", path, str(user_id), mode],
+                                    capture_output=True, text=True, check=True)
+            r = json.loads(result.stdout.strip().splitlines()[-1])
+            print(f"{mode:>12} {r['seconds']:>8.2f} {r['bytes'] / 1e6:>8.1f} {r['peak_rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Benchmark for serializing a 500-message /chat/history response.
+#   pydantic   ChatMessageOut per row, response_model validation, jsonable_encoder + json (the old path)
+#   fast       plain dicts from the rows + api.fastjson.dumps (orjson when installed)
+#   fast+gzip  the fast body gzip-compressed (sent to clients that accept it; cached with the body)
+#
+#   python scripts/bench_history_json.py [--messages 500] [--chars 300]
+import argparse
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import namedtuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+Row = namedtuple("Row", "sender content created_at")
+
+
+def latency(fn, repeat=200):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), len(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MazGPT history serialization benchmark")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--chars", type=int, default=300, help="characters per message")
+    args = parser.parse_args()
+
+    from fastapi.encoders import jsonable_encoder
+    from api import fastjson
+    from api.chat import ChatMessageOut, ChatHistoryResponse
+
+    rng = random.Random(0)
+    words = [w for w in open(__file__, encoding="utf-8").read().split() if w.isalpha()]
+    now = datetime.datetime.utcnow()
+    rows = []
+    for i in range(args.messages):
+        text = ""
+        while len(text) < args.chars:
+            text += rng.choice(words) + " "
+        rows.append(Row("user" if i % 2 == 0 else "ai", text.strip(), now + datetime.timedelta(seconds=i)))
+
+    def pydantic_path():
+        data = {"project_id": "p", "messages": [ChatMessageOut(sender=r.sender, text=r.content, timestamp=r.created_at.isoformat())
+                                               for r in rows]}
+        validated = ChatHistoryResponse.model_validate(jsonable_encoder(data))
+        return json.dumps(jsonable_encoder(validated), ensure_ascii=False, allow_nan=False,
+                          separators=(",", ":")).encode("utf-8")
+
+    def fast_path():
+        return fastjson.dumps({"project_id": "p", "messages": [
+            {"sender": r.sender, "text": r.content, "timestamp": r.created_at.isoformat()} for r in rows]})
+
+    body = fast_path()
+    results = {
+        "pydantic": latency(pydantic_path),
+        "fast": latency(fast_path),
+        "fast+gzip": latency(lambda: fastjson.compress(fast_path(), "gzip")),
+    }
+    assert json.loads(pydantic_path()) == json.loads(body)
+    print(f"messages={args.messages} orjson={fastjson.USE_ORJSON} brotli={fastjson.brotli is not None}")
+    print(f"{'path':>10} {'ms':>8} {'bytes':>9}")
+    for path, (ms, size) in results.items():
+        print(f"{path:>10} {ms:>8.3f} {size:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Benchmark for chat imports (CLI /import and /user/import-data).
+# Writes a --messages message JSON file and imports it:
+#   memory       per-message ChatMemory.add (the old CLI loop; file rewritten every message), first --legacy-limit only
+#   memory_bulk  model.bulk_import.import_into_memory (streamed file, one save per chunk)
+#   sql_orm      one ORM object per message, single commit
+#   sql_bulk     model.bulk_import.import_chats (multi-row INSERT per chunk, single transaction)
+# With --embed, also compares one embedding call per message with batched embedding (sentence-transformers).
+#
+#   python scripts/bench_import.py [--messages 100000] [--legacy-limit 2000] [--embed]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def write_file(path, n):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([{"user": "user" if i % 2 == 0 else "MazGPT",
+                    "message": f"message {i}: how do I keep my project notes organised?"} for i in range(n)], f)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    count = fn()
+    return count, time.perf_counter() - start
+
+
+def bench_memory(tmp, path, n, legacy_limit):
+    import model.memory
+    from model.bulk_import import iter_message_file, import_into_memory
+    results = {}
+    model.memory.MEMORY_FILE = os.path.join(tmp, "memory_legacy.json")
+    memory = model.memory.ChatMemory()
+
+    def legacy():
+        count = 0
+        for m in iter_message_file(path):
+            if count >= legacy_limit:
+                break
+            memory.add(m.get('user', 'user'), m.get('message', ''))
+            count += 1
+        return count
+    results["memory"] = timed(legacy)
+    model.memory.MEMORY_FILE = os.path.join(tmp, "memory_bulk.json")
+    memory = model.memory.ChatMemory()
+    results["memory_bulk"] = timed(lambda: len(import_into_memory(memory, iter_message_file(path))))
+    return results
+
+
+def bench_sql(tmp, path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from model.db import Base, User, Project, ChatMessage
+    from model.bulk_import import iter_message_file, import_chats
+    results = {}
+    for mode in ("sql_orm", "sql_bulk"):
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, mode + '.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        user = User(email="bench@example.com", name="Bench", password_hash="x")
+        db.add(user)
+        db.commit()
+        messages = list(iter_message_file(path))
+        if mode == "sql_orm":
+            def orm():
+                project = Project(user_id=user.id, name="default")
+                db.add(project)
+                db.flush()
+                for m in messages:
+                    db.add(ChatMessage(project_id=project.id, user_id=user.id, sender=m["user"], content=m["message"], version=1))
+                db.commit()
+                return len(messages)
+            results[mode] = timed(orm)
+        else:
+            results[mode] = timed(lambda: import_chats(db, user.id, [{"project_id": "default", "messages": messages}])["messages"])
+        db.close()
+    return results
+
+
+def bench_embed(path, sample, batch):
+    from sentence_transformers import SentenceTransformer
+    from model.bulk_import import iter_message_file, chunked
+    embedder = SentenceTransformer("all-MiniLM-L6-v2")
+    texts = [m["message"] for _, m in zip(range(sample), iter_message_file(path))]
+    embedder.encode(texts[:8])
+
+    def single():
+        for t in texts:
+            embedder.encode(t)
+        return len(texts)
+
+    def batched():
+        for chunk in chunked(texts, batch):
+            embedder.encode(chunk)
+        return len(texts)
+    return {"embed_single": timed(single), "embed_batched": timed(batched)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MazGPT bulk import benchmark")
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--legacy-limit", type=int, default=2000, help="messages imported with the per-message loop")
+    parser.add_argument("--embed", action="store_true")
+    parser.add_argument("--embed-sample", type=int, default=2000)
+    parser.add_argument("--embed-batch", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "import.json")
+        write_file(path, args.messages)
+        results = bench_memory(tmp, path, args.messages, args.legacy_limit)
+        results.update(bench_sql(tmp, path))
+        if args.embed:
+            results.update(bench_embed(path, args.embed_sample, args.embed_batch))
+
+    print(f"messages={args.messages}")
+    print(f"{'mode':>14} {'messages':>9} {'seconds':>8} {'msg/s':>10}")
+    for mode, (count, seconds) in results.items():
+        print(f"{mode:>14} {count:>9} {seconds:>8.2f} {count / seconds if seconds else 0:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Benchmark for the chat_memory -> chat_messages backfill on a large account.
+# Seeds one user with --projects projects whose conversations (--messages each) are stored as
+# legacy chat_memory blobs, then measures the history read (limit 100) and a full export:
+#   blob      history decoded from the project's JSON blob, as the legacy readers did
+#   dual      /chat/history's path while blobs remain (model.legacy_backfill.pending_messages)
+#   rows      /chat/history's path after the backfill (indexed chat_messages query)
+# plus the backfill's own throughput.
+#
+#   python scripts/bench_legacy_backfill.py [--projects 20] [--messages 20000]
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def latency(fn, repeat=10):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MazGPT legacy backfill benchmark")
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=20_000)
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from model.db import Base, User, Project, ChatMemory
+    from model import legacy_backfill, tiering
+    from model.export import iter_export
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'legacy.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        user = User(email="bench@example.com", name="Bench", password_hash="x")
+        db.add(user)
+        db.commit()
+        for p in range(args.projects):
+            project = Project(user_id=user.id, name=f"project-{p}")
+            db.add(project)
+            db.flush()
+            db.add(ChatMemory(user_id=user.id, project_id=project.id, messages=[
+                {"user": "user" if i % 2 == 0 else "MazGPT", "message": f"message {i}: notes about the planning meeting",
+                 "timestamp": "2024-05-01T12:00:00"} for i in range(args.messages)]))
+            db.commit()
+        project = db.query(Project).filter(Project.user_id == user.id).first()
+
+        def blob_history():
+            blob = db.query(ChatMemory).filter(ChatMemory.project_id == project.id).one()
+            db.expire(blob)
+            return blob.messages[:100]
+        results = {
+            "blob": latency(blob_history),
+            "dual": latency(lambda: (db.expire_all(), legacy_backfill.pending_messages(db, project, 100))),
+        }
+        start = time.perf_counter()
+        done = legacy_backfill.backfill(db, pause=0)
+        backfill_seconds = time.perf_counter() - start
+        results["rows"] = latency(lambda: tiering.read_messages(db, project, 100))
+        start = time.perf_counter()
+        size = sum(len(chunk) for chunk in iter_export(db, user.id))
+        export_seconds = time.perf_counter() - start
+        db.close()
+
+    print(f"projects={args.projects} messages/project={args.messages}")
+    for mode, ms in results.items():
+        print(f"history {mode:>5}: {ms:8.2f} ms")
+    print(f"backfill: {done['messages']} messages in {backfill_seconds:.1f}s ({done['messages'] / backfill_seconds:.0f} msg/s)")
+    print(f"export after backfill: {size / 1e6:.1f} MB in {export_seconds:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
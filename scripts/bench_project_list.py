@@ -0,0 +1,68 @@
+# Benchmark for /project/list on an account with many projects and messages.
+#   aggregate  COUNT/MAX over chat_messages per project (what a list with stats would cost without counters)
+#   counters   model.project_stats columns, one page of --limit projects (api.project.project_page)
+#
+#   python scripts/bench_project_list.py [--projects 500] [--messages 1000] [--limit 50]
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def latency(fn, repeat=20):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MazGPT project list benchmark")
+    parser.add_argument("--projects", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine, func
+    from sqlalchemy.orm import sessionmaker
+    from model.db import Base, User, Project, ChatMessage
+    from model.bulk_import import insert_messages
+    from api.project import project_page
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'list.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        user = User(email="bench@example.com", name="Bench", password_hash="x")
+        db.add(user)
+        db.commit()
+        for p in range(args.projects):
+            project = Project(user_id=user.id, name=f"project-{p}")
+            db.add(project)
+            db.flush()
+            insert_messages(db, user.id, project.id, [("user", f"message {i} about planning", None) for i in range(args.messages)])
+        db.commit()
+
+        def aggregate():
+            return db.query(Project.id, Project.name, func.count(ChatMessage.id), func.max(ChatMessage.created_at)) \
+                .outerjoin(ChatMessage, ChatMessage.project_id == Project.id).filter(Project.user_id == user.id) \
+                .group_by(Project.id).order_by(func.max(ChatMessage.created_at).desc()).limit(args.limit).all()
+        results = {
+            "aggregate": latency(aggregate),
+            "counters": latency(lambda: project_page(db, user.id, archived=False, sort="updated", limit=args.limit)),
+        }
+        db.close()
+
+    print(f"projects={args.projects} messages/project={args.messages} page={args.limit}")
+    for mode, ms in results.items():
+        print(f"{mode:>10}: {ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# CPU benchmark for the per-call prompt overhead of LocalLLM.generate (no model forward passes).
+# Compares the old path (rebuild the system prompt string, tokenize system prompt + context in one
+# go, decode prompt + reply and slice the prompt text off) with PromptTemplate (pre-tokenized
+# system prompt, cached per-line ids, decode of the generated ids only) on growing chat contexts,
+# where successive calls share all but the newest turns.
+#
+#   python scripts/bench_prompt_build.py --tokenizer meta-llama/Meta-Llama-3-8B-Instruct \
+#       [--turns 10 50 200] [--calls 20] [--reply-tokens 128]
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+WORDS = ("the model keeps track of what we said earlier so it can answer follow up questions "
+         "about projects code recipes travel plans and anything else that came up").split()
+
+
+def make_turn(i):
+    words = [WORDS[(i * 7 + k) % len(WORDS)] for k in range(12 + i % 20)]
+    return f"{'user' if i % 2 == 0 else 'MazGPT'}: {' '.join(words)}"
+
+
+def legacy_call(tokenizer, base_prompt, prompt, reply_ids, language, tone):
+    from model.prompt_template import TONE_INSTRUCTIONS, LANGUAGE_INSTRUCTIONS
+    tone_map, lang_map = dict(TONE_INSTRUCTIONS), dict(LANGUAGE_INSTRUCTIONS)
+    full_prompt = base_prompt + "\n" + tone_map.get(tone, "") + "\n" + lang_map.get(language, "") + "\n" + prompt
+    ids = tokenizer(full_prompt).input_ids
+    return tokenizer.decode(ids + reply_ids, skip_special_tokens=True)[len(full_prompt):]
+
+
+def template_call(template, tokenizer, prompt, reply_ids, language, tone):
+    template.build_ids(prompt, language, tone)
+    return tokenizer.decode(reply_ids, skip_special_tokens=True)
+
+
+def bench(fn, prompts):
+    start = time.perf_counter()
+    for prompt in prompts:
+        fn(prompt)
+    return (time.perf_counter() - start) / len(prompts) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MazGPT prompt build/tokenize/decode overhead benchmark")
+    parser.add_argument("--tokenizer", required=True)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--calls", type=int, default=20, help="consecutive calls, one new turn each")
+    parser.add_argument("--reply-tokens", type=int, default=128)
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+    from model.llm import LocalLLM
+    from model.prompt_template import PromptTemplate
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    reply_ids = tokenizer(" ".join(WORDS * 8), add_special_tokens=False).input_ids[:args.reply_tokens]
+
+    print(f"tokenizer={args.tokenizer} calls={args.calls} reply_tokens={len(reply_ids)}")
+    print(f"{'turns':>6} {'tokens':>7} {'legacy ms':>10} {'template ms':>12} {'speed-up':>9}")
+    for turns in args.turns:
+        prompts = []
+        for c in range(args.calls):
+            lines = [make_turn(i) for i in range(c, c + turns)]
+            prompts.append("\n".join(lines) + "\nuser: what did we decide?\nMazGPT:")
+        template = PromptTemplate(tokenizer, LocalLLM.BASE_SYSTEM_PROMPT)
+        legacy = bench(lambda p: legacy_call(tokenizer, LocalLLM.BASE_SYSTEM_PROMPT, p, reply_ids, "en", "friendly"), prompts)
+        compiled = bench(lambda p: template_call(template, tokenizer, p, reply_ids, "en", "friendly"), prompts)
+        n_tokens = len(template.build_ids(prompts[-1]))
+        print(f"{turns:>6} {n_tokens:>7} {legacy:>10.2f} {compiled:>12.2f} {legacy / compiled:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Benchmark for the in-process rate limiter (api/ratelimit.py): acquisitions per second on the
+# MemoryStore from N threads, each thread limiting its own set of users (the common case) or all
+# threads hitting one key (worst-case contention on a single lock stripe).
+#
+#   python scripts/bench_ratelimit.py [--threads 1 4 16] [--ops 200000]
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def run(store, bucket, threads, ops, shared_key):
+    per_thread = ops // threads
+
+    def work(t):
+        for i in range(per_thread):
+            key = "read:user:0" if shared_key else f"read:user:{t * 1000 + i % 1000}"
+            store.acquire(key, bucket)
+
+    workers = [threading.Thread(target=work, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--ops", type=int, default=200000)
+    args = parser.parse_args()
+
+    from api.ratelimit import Bucket, MemoryStore
+    bucket = Bucket(rate=1e9, burst=1e9)  # never rejects: measures the bookkeeping only
+    print(f"{'threads':>8} {'distinct keys/s':>16} {'one key/s':>12}")
+    for threads in args.threads:
+        distinct = run(MemoryStore(), bucket, threads, args.ops, shared_key=False)
+        shared = run(MemoryStore(), bucket, threads, args.ops, shared_key=True)
+        print(f"{threads:>8} {distinct:>16,.0f} {shared:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
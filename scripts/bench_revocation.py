@@ -0,0 +1,66 @@
+# Benchmark for token verification (api/auth.verify_token) on each denylist backend
+# (api/revocation.py): the SQLite table with its in-memory snapshot, and Redis when one is
+# reachable at MAZGPT_REDIS_URL. The denylist holds --revoked unexpired entries; the verified
+# token is not among them (the common case).
+#
+#   python scripts/bench_revocation.py [--revoked 10000] [--repeat 5000]
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def latency(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(times), statistics.quantiles(times, n=100)[98]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--revoked", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5000)
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    import api.revocation
+    from api.auth import create_access_token, verify_token
+    from model.db import Base, RevokedToken
+
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'revoked.db')}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    exp = int(time.time()) + 3600
+    db = session_factory()
+    db.bulk_insert_mappings(RevokedToken, [{"jti": f"revoked-{i}", "expires_at": exp} for i in range(args.revoked)])
+    db.commit()
+    db.close()
+
+    token = create_access_token({"sub": "bench@example.com"})
+    backends = [("sqlite snapshot", api.revocation.SqlRevocationStore(session_factory)),
+                ("sqlite, refresh every lookup", api.revocation.SqlRevocationStore(session_factory, refresh_interval=0))]
+    try:
+        store = api.revocation.RedisRevocationStore()
+        store.is_revoked("probe")
+        backends.append(("redis", store))
+    except Exception as e:
+        print(f"redis: skipped ({type(e).__name__}: {e})")
+
+    print(f"{'backend':<30} {'median us':>10} {'p99 us':>10}")
+    for name, store in backends:
+        api.revocation._store = store
+        assert verify_token(token) is not None
+        median, p99 = latency(lambda: verify_token(token), args.repeat)
+        print(f"{name:<30} {median:>10.1f} {p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# CPU benchmark for speculative (assisted) decoding.
+# Generates replies to typical chat prompts with the target model alone and with a draft model
+# proposing tokens, and reports end-to-end tokens/s, draft acceptance rate, tokens per target
+# forward pass and the resulting speed-up.
+#
+#   python scripts/bench_speculative.py --target meta-llama/Meta-Llama-3-8B-Instruct \
+#       --draft meta-llama/Llama-3.2-1B-Instruct [--draft-tokens 5] [--max-new-tokens 128] [--runs 3]
+import argparse
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+PROMPTS = [
+    "user: Can you explain what a Python decorator is, with a short example?\nMazGPT:",
+    "user: Summarize the plot of Romeo and Juliet in a few sentences.\nMazGPT:",
+    "user: I have a meeting with my manager tomorrow about a raise. Any tips?\nMazGPT:",
+    "user: Write a SQL query that returns the ten most recent orders per customer.\nMazGPT:",
+    "user: What are the main differences between TCP and UDP?\nMazGPT:",
+]
+
+
+def run(llm, prompts, max_new_tokens, runs, seed):
+    import torch
+    rows = []
+    for i, prompt in enumerate(prompts):
+        for r in range(runs):
+            torch.manual_seed(seed + r)
+            llm.generate(prompt, max_new_tokens=max_new_tokens)
+            rows.append((i, llm.last_stats))
+    return rows
+
+
+def summarize(rows):
+    tokens = sum(s["new_tokens"] for _, s in rows)
+    seconds = sum(s["seconds"] for _, s in rows)
+    steps = sum(s["steps"] for _, s in rows)
+    acceptance = [s["acceptance"] for _, s in rows if "acceptance" in s]
+    return {
+        "tokens_per_second": tokens / seconds if seconds else 0.0,
+        "tokens_per_step": tokens / steps if steps else 0.0,
+        "acceptance": statistics.mean(acceptance) if acceptance else None,
+        "seconds": seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MazGPT speculative decoding benchmark")
+    parser.add_argument("--target", required=True)
+    parser.add_argument("--draft", required=True)
+    parser.add_argument("--draft-tokens", type=int, default=None, help="fixed draft length (default: adaptive)")
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from model.llm import LocalLLM
+    llm = LocalLLM(model_name=args.target, device=args.device)
+    # Warm-up so lazy initialisation does not count against the first configuration
+    llm.generate(PROMPTS[0], max_new_tokens=8)
+
+    llm.set_draft(None)
+    baseline = summarize(run(llm, PROMPTS, args.max_new_tokens, args.runs, args.seed))
+    llm.set_draft(args.draft, args.draft_tokens)
+    llm.generate(PROMPTS[0], max_new_tokens=8)
+    rows = run(llm, PROMPTS, args.max_new_tokens, args.runs, args.seed)
+    speculative = summarize(rows)
+
+    print(f"target={args.target} draft={args.draft} device={args.device} "
+          f"max_new_tokens={args.max_new_tokens} runs={args.runs}")
+    print(f"{'prompt':>6} {'acceptance':>10} {'tok/step':>8} {'tok/s':>8}")
+    for i in range(len(PROMPTS)):
+        per_prompt = summarize([row for row in rows if row[0] == i])
+        print(f"{i:>6} {per_prompt['acceptance']:>10.2f} {per_prompt['tokens_per_step']:>8.2f} {per_prompt['tokens_per_second']:>8.2f}")
+    print(f"{'mode':>12} {'tok/s':>8} {'tok/step':>8} {'acceptance':>10}")
+    print(f"{'baseline':>12} {baseline['tokens_per_second']:>8.2f} {baseline['tokens_per_step']:>8.2f} {'-':>10}")
+    print(f"{'speculative':>12} {speculative['tokens_per_second']:>8.2f} {speculative['tokens_per_step']:>8.2f} "
+          f"{speculative['acceptance']:>10.2f}")
+    if baseline["tokens_per_second"]:
+        print(f"speed-up: {speculative['tokens_per_second'] / baseline['tokens_per_second']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
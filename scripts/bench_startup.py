@@ -0,0 +1,79 @@
+# Startup benchmark for the MazGPT CLI.
+# Measures module import cost with `python -X importtime` and the time until the first
+# prompt is printed, and fails when either exceeds its budget (usable as a CI check).
+#
+#   python scripts/bench_startup.py [--max-import-ms 400] [--max-prompt-ms 1500] [--top 15]
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def import_profile(module):
+    """Returns [(cumulative_us, self_us, name)] parsed from -X importtime for a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=ROOT),
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return rows
+
+
+def time_to_prompt():
+    """Starts the CLI with warm-up disabled and measures until the first prompt is printed."""
+    env = dict(os.environ, PYTHONPATH=ROOT, MAZGPT_WARMUP="0", PYTHONUNBUFFERED="1")
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "cli_entrypoint.py"], cwd=ROOT, env=env,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    out, _ = proc.communicate("/bye\n", timeout=120)
+    elapsed = time.perf_counter() - start
+    if "You:" not in out:
+        raise SystemExit(f"CLI did not reach the prompt:\n{out[-2000:]}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MazGPT CLI startup benchmark")
+    parser.add_argument("--module", default="cli_entrypoint")
+    parser.add_argument("--max-import-ms", type=float, default=400)
+    parser.add_argument("--max-prompt-ms", type=float, default=1500)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = import_profile(args.module)
+    total_ms = max(r[0] for r in rows) / 1000
+    print(f"import {args.module}: {total_ms:.1f} ms cumulative ({len(rows)} modules)")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+    heavy = [name.strip() for _, _, name in rows if name.strip().split(".")[0] in ("torch", "transformers", "chromadb", "sentence_transformers")]
+    if heavy:
+        print(f"WARNING: heavy modules imported eagerly: {', '.join(sorted(set(h.split('.')[0] for h in heavy)))}")
+
+    prompt_ms = time_to_prompt() * 1000
+    print(f"time to first prompt (process start to '/bye'): {prompt_ms:.1f} ms")
+
+    failed = False
+    if total_ms > args.max_import_ms:
+        print(f"FAIL: import time {total_ms:.1f} ms exceeds budget {args.max_import_ms} ms")
+        failed = True
+    if prompt_ms > args.max_prompt_ms:
+        print(f"FAIL: time to prompt {prompt_ms:.1f} ms exceeds budget {args.max_prompt_ms} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# Prompt-size benchmark for long conversations.
+# Replays a synthetic conversation of --turns turns and, at each checkpoint, builds the prompt
+# from raw history (HISTORY_TURNS most recent turns) and from rolling summaries + the verbatim
+# window, reporting prompt tokens, build latency, turns represented and summarizer cost.
+# With --model the prompt is also prefilled (one new token) to measure real latency per turn.
+#
+#   python scripts/bench_summarization.py [--turns 2000] [--context-tokens 2048] [--model microsoft/phi-2]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from model.context import ContextBuilder, approx_token_count  # noqa: E402
+from model.summarizer import ConversationSummarizer, SummaryStore, extractive_summary  # noqa: E402
+
+HISTORY_TURNS = 200
+TOPICS = ["the database schema", "the deployment plan", "token budgets", "the web UI", "plugin timeouts",
+          "vector search", "the export endpoint", "rate limits", "model warm-up", "project archiving"]
+
+
+class _Memory:
+    """In-memory stand-in for ChatMemory so the benchmark never touches model/data."""
+
+    def __init__(self):
+        self.history = []
+
+    def add(self, user, message, project_id="default"):
+        self.history.append({'user': user, 'message': message, 'project_id': project_id})
+
+    def get_recent(self, n=10, project_id="default"):
+        return [h for h in self.history if h.get('project_id', 'default') == project_id][-n:]
+
+
+def synthetic_turn(rng, i):
+    topic = rng.choice(TOPICS)
+    if i % 2 == 0:
+        return 'user', f"Turn {i}: can you remind me what we decided about {topic}? " + "Some more detail here. " * rng.randint(1, 6)
+    return 'MazGPT', f"We agreed to revisit {topic} after turn {i - 1}. " + "Here is the longer explanation. " * rng.randint(2, 10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MazGPT long-conversation prompt benchmark")
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--checkpoints", default="100,250,500,1000,2000")
+    parser.add_argument("--context-tokens", type=int, default=2048)
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--model", default=None, help="also time prefill with this LocalLLM model")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    llm = None
+    count_tokens, tokenizer_id, truncate = approx_token_count, "approx", None
+    if args.model:
+        from model.llm import LocalLLM
+        llm = LocalLLM(model_name=args.model, max_context_tokens=args.context_tokens)
+        count_tokens, tokenizer_id, truncate = llm.count_tokens, llm.tokenizer_id, llm.truncate_tokens
+    builder = ContextBuilder(count_tokens, args.context_tokens, args.max_new_tokens, tokenizer_id, truncate)
+    system_prompt = "You are MazGPT, a helpful assistant."
+
+    rng = random.Random(args.seed)
+    memory = _Memory()
+    store = SummaryStore(os.path.join(tempfile.mkdtemp(), "summaries.json"))
+    summarizer = ConversationSummarizer(memory, store, summarize=extractive_summary)
+    checkpoints = sorted({int(c) for c in args.checkpoints.split(",") if int(c) <= args.turns})
+
+    print(f"{'turns':>6} {'mode':>10} {'prompt tok':>10} {'build ms':>9} {'verbatim':>8} {'represented':>11} {'summ. ms':>9} {'prefill ms':>10}")
+    summarize_s = 0.0
+    for i in range(1, args.turns + 1):
+        memory.add(*synthetic_turn(rng, i))
+        # Incremental update after every turn, as the CLI schedules it
+        start = time.perf_counter()
+        summarizer.update("default")
+        summarize_s += time.perf_counter() - start
+        if i not in checkpoints:
+            continue
+        user_input = memory.history[-1]['message']
+        for mode in ("raw", "summarized"):
+            if mode == "raw":
+                history, summaries, spans = memory.get_recent(HISTORY_TURNS), [], []
+            else:
+                history = summarizer.recent_history("default", HISTORY_TURNS)
+                summaries = summarizer.summaries("default")
+                # Turns per summary, oldest first, matching summarizer.summaries()
+                spans = [e["turns"] for level in reversed(store.data["default"]["levels"]) for e in level]
+            start = time.perf_counter()
+            prompt, stats = builder.build(system_prompt, history, (), user_input, summaries=summaries)
+            build_ms = (time.perf_counter() - start) * 1000
+            prefill = ""
+            if llm is not None:
+                start = time.perf_counter()
+                llm.generate(prompt, max_new_tokens=1)
+                prefill = f"{(time.perf_counter() - start) * 1000:.1f}"
+            # The builder keeps the newest summaries when they do not all fit
+            represented = stats["turns"] + sum(spans[len(spans) - stats["summaries"]:])
+            print(f"{i:>6} {mode:>10} {stats['total']:>10} {build_ms:>9.2f} {stats['turns']:>8} {represented:>11} "
+                  f"{summarize_s * 1000 / i if mode == 'summarized' else 0:>9.3f} {prefill:>10}")
+
+
+if __name__ == "__main__":
+    main()
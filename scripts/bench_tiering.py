@@ -0,0 +1,111 @@
+# Benchmark for hot/cold tiering of archived projects.
+# Fills --projects projects of --messages messages each, then archives --archived-share of them.
+# Measures, before and after archiving: hot chat_messages size (rows and database pages), and the
+# latency of a history read and a keyword (LIKE) search on a live project. Also reports the cold
+# store's compression ratio and the cost of reading an archived project's history.
+#
+#   python scripts/bench_tiering.py [--projects 50] [--messages 20000] [--archived-share 0.8]
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def fill(db, projects, messages):
+    from sqlalchemy import insert
+    from model.db import User, Project, ChatMessage
+    user = User(email="bench@example.com", name="Bench", password_hash="x")
+    db.add(user)
+    db.commit()
+    ids = []
+    for p in range(projects):
+        project = Project(user_id=user.id, name=f"project-{p}")
+        db.add(project)
+        db.commit()
+        ids.append(project.id)
+        db.execute(insert(ChatMessage), [
+            {"project_id": project.id, "user_id": user.id, "sender": "user" if i % 2 == 0 else "MazGPT",
+             "content": f"message {i} of project {p}: notes about the quarterly planning meeting", "version": 1}
+            for i in range(messages)])
+        db.commit()
+    return user, ids
+
+
+def latency(fn, repeat=20):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def measure(db, user, project):
+    from sqlalchemy import text
+    from model.db import ChatMessage
+    from model import tiering
+    hot_rows = db.query(ChatMessage).count()
+    pages = db.execute(text("PRAGMA page_count")).scalar() - db.execute(text("PRAGMA freelist_count")).scalar()
+    history = latency(lambda: tiering.read_messages(db, project, 100))
+    search = latency(lambda: db.query(ChatMessage).filter(
+        ChatMessage.project_id == project.id, ChatMessage.user_id == user.id,
+        ChatMessage.content.ilike("%quarterly%")).order_by(ChatMessage.created_at.desc()).limit(10).all())
+    return hot_rows, pages, history, search
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MazGPT hot/cold tiering benchmark")
+    parser.add_argument("--projects", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--archived-share", type=float, default=0.8)
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import sessionmaker
+    from model.db import Base, Project
+    from model.cold_store import ColdStore, ColdSegment
+    from model import tiering
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'hot.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        store = ColdStore(os.path.join(tmp, "cold.db"))
+        user, ids = fill(db, args.projects, args.messages)
+        live = db.get(Project, ids[-1])
+        results = {"before": measure(db, user, live)}
+
+        archived = ids[:int(len(ids) * args.archived_share)]
+        start = time.perf_counter()
+        for pid in archived:
+            project = db.get(Project, pid)
+            project.archived = True
+            db.commit()
+            tiering.freeze_project(db, user.id, pid, store=store)
+        freeze_seconds = time.perf_counter() - start
+        db.execute(text("VACUUM"))
+        results["after"] = measure(db, user, live)
+
+        with store.Session() as cold:
+            raw = sum(r for (r,) in cold.query(ColdSegment.raw_bytes))
+            stored = sum(len(p) for (p,) in cold.query(ColdSegment.payload))
+            codec = cold.query(ColdSegment.codec).first()[0]
+        cold_history = latency(lambda: tiering.read_messages(db, db.get(Project, archived[0]), 100, store=store))
+        db.close()
+
+    print(f"projects={args.projects} messages/project={args.messages} archived={len(archived)}")
+    print(f"{'':>7} {'hot rows':>10} {'pages':>8} {'history ms':>11} {'search ms':>10}")
+    for label, (rows, pages, history, search) in results.items():
+        print(f"{label:>7} {rows:>10} {pages:>8} {history:>11.2f} {search:>10.2f}")
+    moved = len(archived) * args.messages
+    print(f"freeze: {moved} messages in {freeze_seconds:.1f}s ({moved / freeze_seconds:.0f} msg/s)")
+    print(f"cold store ({codec}): {raw / 1e6:.1f} MB raw -> {stored / 1e6:.1f} MB ({raw / stored:.1f}x); "
+          f"archived history read {cold_history:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Offline evaluation of SkillRouter skill classification.
+# Scores the keyword rules and the embedding classifier on a labelled set of requests (held out
+# from model/skill_exemplars.yaml) and reports accuracy, per-skill recall, fallback rate,
+# classification latency and the relative cost of the models each approach would route to.
+# No language models are loaded; only the sentence embedder.
+#
+#   python scripts/eval_skill_router.py [--config model/model_config.yaml] [--threshold 0.30] [--margin 0.02]
+import argparse
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+import yaml
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from model.router import SkillRouter  # noqa: E402
+from model.skill_classifier import (  # noqa: E402
+    SkillClassifier, EMBEDDER_NAME, EXEMPLARS_FILE, default_embedder, load_exemplars,
+)
+
+EVAL_SET = [
+    ("good morning! how's it going?", "general"),
+    ("can you suggest a name for my cat?", "general"),
+    ("what's a good gift for my dad's 60th birthday?", "general"),
+    ("I had an error of judgement at work today, any advice?", "general"),
+    ("tell me something interesting about octopuses", "general"),
+    ("how do I fix a flat bike tyre?", "general"),
+    ("what movie should I watch tonight?", "general"),
+    ("explain what a closure is in JavaScript", "code"),
+    ("my Django view returns a 500, here's the traceback", "code"),
+    ("write a regex that matches email addresses", "code"),
+    ("how do I merge two dictionaries in Python?", "code"),
+    ("why is my Rust borrow checker complaining here?", "code"),
+    ("optimize this SQL join, it takes 30 seconds", "code"),
+    ("what's the sum of the first 100 integers?", "math"),
+    ("find x if 2^x = 64", "math"),
+    ("what is 17 times 23?", "math"),
+    ("compute the area of a circle with radius 4", "math"),
+    ("should our startup raise money now or wait a year? weigh it up", "reasoning"),
+    ("three boxes are mislabelled, how do you fix the labels with one pick?", "reasoning"),
+    ("evaluate the arguments for and against a four-day work week", "reasoning"),
+    ("plan a migration from a monolith to services step by step", "reasoning"),
+    ("how do I say 'where is the station' in Italian?", "multilingual"),
+    ("translate this paragraph into Arabic", "multilingual"),
+    ("¿cuál es la capital de Australia?", "multilingual"),
+    ("what does 'merci beaucoup' mean?", "multilingual"),
+    ("what's written on the sign in this photo?", "image"),
+    ("describe what you see in screenshot.jpg", "image"),
+    ("is the person in this image smiling?", "image"),
+    ("what kind of plant is in the picture I sent?", "image"),
+]
+
+
+def routed_cost(config, skill, cost_aware):
+    """Cost of the model a skill is routed to: cheapest eligible (new) or first in config order (old)."""
+    costs = {m["name"]: float(m.get("cost", 1.0)) for m in config["models"]}
+    eligible = [m["name"] for m in config["models"] if skill in m["skills"]]
+    if not eligible:
+        eligible = [m["name"] for m in config["models"] if "general" in m["skills"]]
+    if not eligible:
+        return 0.0
+    return min(costs[n] for n in eligible) if cost_aware else costs[eligible[0]]
+
+
+def evaluate(name, classify, config, cost_aware):
+    correct, fallbacks, seconds, cost = 0, 0, 0.0, 0.0
+    recall = defaultdict(Counter)
+    confusion = Counter()
+    for text, label in EVAL_SET:
+        start = time.perf_counter()
+        skill, fell_back = classify(text)
+        seconds += time.perf_counter() - start
+        fallbacks += fell_back
+        recall[label]["total"] += 1
+        if skill == label:
+            correct += 1
+            recall[label]["hit"] += 1
+        else:
+            confusion[(label, skill)] += 1
+        cost += routed_cost(config, skill, cost_aware)
+    n = len(EVAL_SET)
+    print(f"\n== {name} ==")
+    print(f"accuracy {correct / n:.1%}  fallback {fallbacks / n:.1%}  "
+          f"latency {seconds * 1000 / n:.2f} ms/query  mean routed cost {cost / n:.2f}")
+    for label in sorted(recall):
+        print(f"  {label:<13} recall {recall[label]['hit']}/{recall[label]['total']}")
+    for (label, skill), count in confusion.most_common(5):
+        print(f"  misrouted {label} -> {skill}: {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate SkillRouter classification")
+    parser.add_argument("--config", default="model/model_config.yaml")
+    parser.add_argument("--exemplars", default=EXEMPLARS_FILE)
+    parser.add_argument("--embedder", default=EMBEDDER_NAME)
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--margin", type=float, default=None)
+    args = parser.parse_args()
+
+    with open(args.config, "r") as f:
+        config = yaml.safe_load(f)
+    router_cfg = config.get("router", {})
+    threshold = args.threshold if args.threshold is not None else router_cfg.get("threshold", 0.30)
+    margin = args.margin if args.margin is not None else router_cfg.get("margin", 0.02)
+
+    evaluate("keyword rules, first model", lambda t: (SkillRouter.keyword_classify(t), False), config, cost_aware=False)
+
+    start = time.perf_counter()
+    classifier = SkillClassifier(default_embedder(args.embedder), load_exemplars(args.exemplars),
+                                 embedder_name=args.embedder, cache_path=None, threshold=threshold, margin=margin)
+    print(f"\ncentroids built in {(time.perf_counter() - start) * 1000:.0f} ms (threshold {threshold}, margin {margin})")
+
+    def embedding_classify(text):
+        skill, _ = classifier.predict(text)
+        if skill is None:
+            return SkillRouter.keyword_classify(text), True
+        return skill, False
+    evaluate("embedding centroids, cheapest model", embedding_classify, config, cost_aware=True)
+
+
+if __name__ == "__main__":
+    main()
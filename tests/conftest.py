@@ -19,6 +19,37 @@ model.db.SessionLocal = TestingSessionLocal
 # Create all tables before tests
 Base.metadata.create_all(bind=engine)
 
+@pytest.fixture(scope="session", autouse=True)
+def cold_store(tmp_path_factory):
+    # Keep archived messages out of data/cold_store.db
+    import model.cold_store
+    model.cold_store._default_store = model.cold_store.ColdStore(str(tmp_path_factory.mktemp("cold") / "cold.db"))
+    yield model.cold_store._default_store
+
+@pytest.fixture(scope="session", autouse=True)
+def revocation_store(tmp_path_factory):
+    # Denylist on its own file: the in-memory test database is per connection (thread)
+    import api.revocation
+    revoked_engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('revoked') / 'revoked.db'}")
+    Base.metadata.create_all(bind=revoked_engine)
+    api.revocation._store = api.revocation.SqlRevocationStore(sessionmaker(bind=revoked_engine))
+    yield api.revocation._store
+
+@pytest.fixture(scope="session")
+def account_sessions(tmp_path_factory):
+    # Accounts and settings on their own file, built from the models (not the tracked mazgpt.db)
+    accounts_engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('accounts') / 'accounts.db'}",
+                                    connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=accounts_engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=accounts_engine)
+
+@pytest.fixture(autouse=True)
+def rate_limits():
+    # Every test starts with full buckets (the TestClient always comes from the same address)
+    import api.ratelimit
+    api.ratelimit.get_store().clear()
+    yield api.ratelimit.get_store()
+
 @pytest.fixture(scope="function")
 def db_session():
     db = TestingSessionLocal()
@@ -28,9 +59,19 @@ def db_session():
         db.close()
 
 @pytest.fixture(scope="function")
-def client(db_session):
+def client(db_session, account_sessions):
+    import api.auth, api.chat, api.project, api.settings, api.user_data
     os.environ["TESTING"] = "1"
     app.dependency_overrides[model.db.SessionLocal] = lambda: db_session
+    def get_account_db():
+        db = account_sessions()
+        try:
+            yield db
+        finally:
+            db.close()
+    for module in (api.auth, api.chat, api.project, api.settings, api.user_data):
+        app.dependency_overrides[module.get_db] = get_account_db
+    app.dependency_overrides[api.user_data.get_session_factory] = lambda: account_sessions
     with TestClient(app) as c:
         # --- CSRF token setup ---
         resp = c.get("/ping")
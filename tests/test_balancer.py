@@ -0,0 +1,38 @@
+import threading
+import pytest
+from model.balancer import LoadBalancer, Replica, ModelOverloadedError
+
+class SlowModel:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.release = threading.Event()
+
+    def generate(self, prompt, **kwargs):
+        self.release.wait(self.seconds)
+        return f"reply to {prompt}"
+
+def test_prefers_cheapest_idle_model_and_learns_latency():
+    balancer = LoadBalancer()
+    balancer.add(Replica("big", 0, SlowModel(0), cost=6))
+    balancer.add(Replica("small", 0, SlowModel(0.01), cost=2))
+    assert balancer.generate(["big", "small"], "hi") == ("small", "reply to hi")
+    small = balancer.replicas["small"][0]
+    assert small.in_flight == 0 and small.latency < 5.0
+
+def test_routes_around_busy_replica_and_sheds_when_saturated():
+    balancer = LoadBalancer()
+    busy_model = SlowModel(5)
+    balancer.add(Replica("llama3", 0, busy_model, max_concurrency=1, max_queue=0))
+    balancer.add(Replica("llama3", 1, SlowModel(0), max_concurrency=1, max_queue=0))
+    first = balancer.acquire(["llama3"])
+    worker = threading.Thread(target=first.run, args=("generate", "a"))
+    worker.start()
+    second = balancer.acquire(["llama3"])
+    assert second is not first
+    with pytest.raises(ModelOverloadedError) as exc:
+        balancer.acquire(["llama3"], skill="chat")
+    assert exc.value.retry_after >= 1 and "chat" in str(exc.value)
+    second.run("generate", "b")
+    assert balancer.acquire(["llama3"]) is second
+    busy_model.release.set()
+    worker.join()
@@ -0,0 +1,88 @@
+import io
+import json
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from model.db import Base, User, Project, ChatMessage
+from model.bulk_import import (
+    iter_json_array, iter_message_file, import_chats, import_into_memory, validate_message_file,
+    ImportFormatError,
+)
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'import.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def test_json_array_is_parsed_across_small_reads():
+    items = [{"user": "user", "message": "a [tricky], \"quoted\" text"}, 12345678, [1, 2], "x" * 50, None]
+    text = "  \n" + json.dumps(items, indent=1)
+    assert list(iter_json_array(io.StringIO(text), read_size=3)) == items
+    with pytest.raises(ImportFormatError):
+        list(iter_json_array(io.StringIO('{"not": "a list"}')))
+
+def test_message_file_accepts_ndjson(tmp_path):
+    path = tmp_path / "msgs.ndjson"
+    path.write_text('{"user": "user", "message": "hi"}\n\n{"sender": "ai", "text": "hello"}\n', encoding="utf-8")
+    assert [m.get("message", m.get("text")) for m in iter_message_file(path)] == ["hi", "hello"]
+
+def test_import_chats_inserts_in_chunks_and_resolves_projects(db):
+    user = User(email="import@example.com", name="Import", password_hash="x")
+    db.add(user)
+    db.flush()
+    existing = Project(user_id=user.id, name="Work")
+    db.add(existing)
+    db.commit()
+    chats = [
+        {"project_id": existing.id, "messages": [{"sender": "user", "text": f"m{i}"} for i in range(25)]},
+        {"project_id": "notes", "messages": [{"user": "user", "message": "legacy shape",
+                                               "timestamp": "2024-01-02T03:04:05"}]},
+    ]
+    assert import_chats(db, user.id, chats, chunk_rows=10) == {"projects": 2, "messages": 26}
+    assert db.query(ChatMessage).filter(ChatMessage.project_id == existing.id).count() == 25
+    notes = db.query(Project).filter(Project.user_id == user.id, Project.name == "notes").one()
+    msg = db.query(ChatMessage).filter(ChatMessage.project_id == notes.id).one()
+    assert (msg.content, msg.created_at.year) == ("legacy shape", 2024)
+
+def test_import_chats_is_all_or_nothing(db):
+    user = User(email="import-bad@example.com", name="Import", password_hash="x")
+    db.add(user)
+    db.commit()
+    chats = [{"project_id": "a", "messages": [{"text": "ok"}]}, {"project_id": "b", "messages": [{"text": ""}]}]
+    with pytest.raises(ImportFormatError):
+        import_chats(db, user.id, chats)
+    assert db.query(ChatMessage).count() == 0
+
+class FakeMemory:
+    def __init__(self):
+        self.history, self.saves = [], 0
+
+    def add_many(self, messages, project_id="default"):
+        entries = [{"user": u, "message": m, "project_id": project_id} for u, m in messages]
+        self.history.extend(entries)
+        self.saves += 1
+        return entries
+
+def test_import_into_memory_saves_once_per_chunk():
+    memory = FakeMemory()
+    records = ({"user": "user", "message": f"m{i}"} for i in range(250))
+    entries = import_into_memory(memory, records, project_id="p", chunk_rows=100)
+    assert len(entries) == 250 and memory.saves == 3
+    assert memory.history[-1] == {"user": "user", "message": "m249", "project_id": "p"}
+
+def test_message_file_is_validated_before_anything_is_saved(tmp_path):
+    path = tmp_path / "msgs.ndjson"
+    lines = [json.dumps({"user": "user", "message": f"m{i}"}) for i in range(150)]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    assert validate_message_file(path) == 150
+    for bad in ('{"user": "user", "message": ""}', '{"user": "user", "message": '):
+        path.write_text("\n".join(lines + [bad]) + "\n", encoding="utf-8")
+        with pytest.raises(ImportFormatError):
+            validate_message_file(path)
+
+def test_import_data_unauth(client):
+    resp = client.post("/user/import-data", json={"email": "a@example.com", "chats": []})
+    assert resp.status_code == 401
@@ -0,0 +1,73 @@
+import json
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+from model.db import Base, User, Project
+from model import project_stats
+import api.caching
+from api.caching import ResponseCache, cached_json, etag_matches
+
+def make_request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "query_string": b""})
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ResponseCache(max_bytes=1024)
+    monkeypatch.setattr(api.caching, "response_cache", cache)
+    return cache
+
+def test_conditional_get_and_cache(cache):
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {"items": [1, 2]}, {"X-Next-Cursor": "abc"}
+    first = cached_json(make_request(), "route", 1, 7, ("p",), build)
+    assert first.status_code == 200 and json.loads(first.body) == {"items": [1, 2]}
+    assert first.headers["X-Next-Cursor"] == "abc"
+    etag = first.headers["ETag"]
+    assert cached_json(make_request(), "route", 1, 7, ("p",), build).body == first.body
+    assert len(builds) == 1
+    not_modified = cached_json(make_request(f'"other", {etag}'), "route", 1, 7, ("p",), build)
+    assert not_modified.status_code == 304 and not_modified.body == b""
+    # A write bumps the revision: new ETag, rebuilt body
+    changed = cached_json(make_request(etag), "route", 1, 8, ("p",), build)
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag and len(builds) == 2
+
+def test_cache_is_bounded_by_bytes():
+    cache = ResponseCache(max_bytes=100)
+    api_max = api.caching.MAX_ENTRY_BYTES
+    try:
+        api.caching.MAX_ENTRY_BYTES = 60
+        cache.put("a", b"x" * 50, {})
+        cache.put("b", b"x" * 40, {})
+        cache.get("a")
+        cache.put("c", b"x" * 30, {})  # evicts b, the least recently used
+        cache.put("big", b"x" * 70, {})  # over the per-entry limit: not cached
+    finally:
+        api.caching.MAX_ENTRY_BYTES = api_max
+    assert (cache.get("a") is not None, cache.get("b"), cache.get("c") is not None, cache.get("big")) == (True, None, True, None)
+    assert cache.size == 80
+
+def test_etag_matching():
+    assert etag_matches('W/"abc"', 'W/"abc"') and etag_matches('"abc"', 'W/"abc"') and etag_matches("*", 'W/"x"')
+    assert not etag_matches(None, 'W/"abc"') and not etag_matches('"abd"', 'W/"abc"')
+
+def test_messages_bump_project_and_user_revisions(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rev.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    user = User(email="rev@example.com", name="Rev", password_hash="x")
+    db.add(user)
+    db.flush()
+    project = Project(user_id=user.id, name="p")
+    db.add(project)
+    db.commit()
+    project_stats.record_messages(db, project.id, 1, 1)
+    db.commit()
+    db.refresh(user)
+    db.refresh(project)
+    assert (user.revision, project.revision) == (1, 1)
+    db.close()
@@ -0,0 +1,37 @@
+from model.context import ContextBuilder, TokenCountCache
+
+def word_count(text):
+    return len(text.split())
+
+def make_history(n):
+    return [{"user": "user" if i % 2 == 0 else "MazGPT", "message": f"turn {i} " + "word " * 8} for i in range(n)]
+
+def test_prompt_fits_token_budget():
+    builder = ContextBuilder(count_tokens=word_count, max_context_tokens=200, max_new_tokens=50, tokenizer_id="words")
+    history = make_history(100) + [{"user": "user", "message": "latest question"}]
+    prompt, stats = builder.build("system " * 30, history, ["retrieved fact " * 4], "latest question")
+    assert stats["total"] <= builder.budget
+    assert prompt.endswith("user: latest question\nMazGPT:")
+    assert prompt.count("latest question") == 1
+    assert "turn 99" in prompt and "turn 0 " not in prompt
+    assert "retrieved fact" in prompt
+
+def test_token_counts_cached_per_entry():
+    calls = []
+    def counting(text):
+        calls.append(text)
+        return word_count(text)
+    builder = ContextBuilder(count_tokens=counting, max_context_tokens=10_000, tokenizer_id="words",
+                             token_counts=TokenCountCache())
+    history = make_history(5)
+    builder.build("", history)
+    # Counts live beside the history, never in the (persisted) entries
+    assert all("tokens" not in entry for entry in history)
+    calls.clear()
+    builder.build("", history)
+    assert calls == []
+
+def test_oversized_user_input_is_truncated():
+    builder = ContextBuilder(count_tokens=word_count, max_context_tokens=40, max_new_tokens=10)
+    prompt, stats = builder.build("", [], [], "x " * 100)
+    assert stats["total"] <= builder.budget
@@ -0,0 +1,69 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from model.db import Base, User, Project, ChatMessage, ChatMemory, GenerationJob, VectorTombstone
+from model.deletion import delete_project, delete_user_data, VectorCleaner
+
+@pytest.fixture
+def Session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'delete.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+def seed(db):
+    user = User(email="delete@example.com", name="Delete", password_hash="x")
+    db.add(user)
+    db.flush()
+    projects = [Project(user_id=user.id, name=name) for name in ("big", "keep")]
+    db.add_all(projects)
+    db.flush()
+    for p in projects:
+        msgs = [ChatMessage(project_id=p.id, user_id=user.id, sender="user", content=f"{p.name} {i}", version=1)
+                for i in range(10)]
+        db.add_all(msgs)
+        db.flush()
+        db.add(GenerationJob(id=f"job-{p.id}", user_id=user.id, project_id=p.id, user_message_id=msgs[0].id, status="done"))
+        db.add(ChatMemory(user_id=user.id, project_id=p.id, messages=[]))
+    db.commit()
+    return user, projects
+
+def test_delete_project_removes_rows_in_chunks(Session):
+    db = Session()
+    user, (big, keep) = seed(db)
+    user_id, big_id, keep_id = user.id, big.id, keep.id
+    counts = delete_project(db, user_id, big_id, chunk_rows=3)
+    assert counts == {"generation_jobs": 1, "chat_messages": 10, "chat_memory": 1}
+    assert db.get(Project, big_id) is None
+    assert db.query(ChatMessage).filter(ChatMessage.project_id == keep_id).count() == 10
+    assert [t.project_key for t in db.query(VectorTombstone)] == [str(big_id)]
+
+def test_delete_user_data_keeps_projects(Session):
+    db = Session()
+    user, projects = seed(db)
+    counts = delete_user_data(db, user.id, chunk_rows=4)
+    assert counts["chat_messages"] == 20 and counts["generation_jobs"] == 2
+    assert db.query(Project).count() == 2
+    assert db.query(VectorTombstone).count() == 2
+
+class FakeVectors:
+    def __init__(self, fail=False):
+        self.deleted, self.fail = [], fail
+
+    def delete_project(self, project_id):
+        if self.fail:
+            raise RuntimeError("vector store down")
+        self.deleted.append(project_id)
+        return 7
+
+def test_cleaner_drains_tombstones_and_retries_failures(Session):
+    db = Session()
+    db.add(VectorTombstone(project_key="42"))
+    db.commit()
+    cleaner = VectorCleaner(session_factory=Session)
+    cleaner._semantic_memory = FakeVectors(fail=True)
+    assert cleaner.clean() == 0
+    assert Session().query(VectorTombstone).one().attempts == 1
+    cleaner._semantic_memory = FakeVectors()
+    assert cleaner.clean() == 7
+    assert cleaner._semantic_memory.deleted == ["42"]
+    assert Session().query(VectorTombstone).count() == 0
@@ -0,0 +1,85 @@
+import datetime
+import json
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import model.export
+from model.db import Base, User, UserSettings, Project, ChatMessage, ChatMemory
+from model.export import iter_export
+from api.auth import create_access_token
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def make_account(db, email):
+    user = User(email=email, name="Export", password_hash="x")
+    db.add(user)
+    db.flush()
+    db.add(UserSettings(user_id=user.id, theme="dark"))
+    projects = [Project(user_id=user.id, name=name) for name in ("Default", "Work")]
+    db.add_all(projects)
+    db.flush()
+    for p in projects:
+        for i in range(3):
+            db.add(ChatMessage(project_id=p.id, user_id=user.id, sender="user" if i % 2 == 0 else "ai",
+                               content=f"{p.name} {i}", version=1))
+    db.add(ChatMemory(user_id=user.id, project_id=projects[0].id, messages=[{"user": "user", "message": "old"}]))
+    db.commit()
+    return user, projects
+
+def test_json_export_streams_projects_messages_and_settings(db, monkeypatch):
+    monkeypatch.setattr(model.export, "CHUNK_BYTES", 16)  # force many chunks
+    user, projects = make_account(db, "export-json@example.com")
+    chunks = list(iter_export(db, user.id))
+    assert len(chunks) > 1
+    data = json.loads("".join(chunks))
+    assert data["user"]["email"] == "export-json@example.com"
+    assert data["settings"]["theme"] == "dark"
+    assert [p["name"] for p in data["projects"]] == ["Default", "Work"]
+    chats = {c["project_id"]: c for c in data["chats"]}
+    assert [m["text"] for m in chats[projects[1].id]["messages"]] == ["Work 0", "Work 1", "Work 2"]
+    # The legacy blob is read in place (a GET writes nothing) and its messages come first, as the oldest
+    assert [m["text"] for m in chats[projects[0].id]["messages"]] == ["old", "Default 0", "Default 1", "Default 2"]
+    assert db.query(ChatMemory).count() == 1 and db.query(ChatMessage).count() == 6
+
+def test_ndjson_export_one_record_per_line(db):
+    user, projects = make_account(db, "export-ndjson@example.com")
+    lines = "".join(iter_export(db, user.id, "ndjson")).splitlines()
+    records = [json.loads(line) for line in lines]
+    kinds = [r["type"] for r in records]
+    assert kinds.count("message") == 7
+    assert kinds[:2] == ["user", "settings"]
+    assert "chat_memory" not in kinds
+
+def test_backfilled_and_orphaned_legacy_messages_keep_their_place(db):
+    user, projects = make_account(db, "export-legacy@example.com")
+    # A backfilled legacy message has the highest id but the oldest timestamp
+    db.add(ChatMessage(project_id=projects[1].id, user_id=user.id, sender="user", content="Work -1", version=1,
+                       created_at=datetime.datetime(2020, 1, 1)))
+    db.add(ChatMemory(user_id=user.id, project_id="Gone", messages=[{"user": "user", "message": "orphan"}]))
+    db.commit()
+    chats = {c["project_id"]: c for c in json.loads("".join(iter_export(db, user.id)))["chats"]}
+    assert [m["text"] for m in chats[projects[1].id]["messages"]] == ["Work -1", "Work 0", "Work 1", "Work 2"]
+    assert [m["text"] for m in chats["Gone"]["messages"]] == ["orphan"]
+
+def test_export_streams_for_the_signed_in_user(client, account_sessions):
+    db = account_sessions()
+    user, projects = make_account(db, "export-api@example.com")
+    db.close()
+    client.cookies.set("access_token", create_access_token({"sub": "export-api@example.com"}))
+    resp = client.get("/user/export-data")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["user"]["email"] == "export-api@example.com" and len(data["chats"]) == 2
+    lines = client.get("/user/export-data", params={"format": "ndjson"}).text.splitlines()
+    assert [json.loads(line)["type"] for line in lines].count("message") == 7
+    client.cookies.clear()
+
+def test_export_unauth(client):
+    resp = client.get("/user/export-data")
+    assert resp.status_code == 401
@@ -0,0 +1,74 @@
+import datetime
+import gzip
+import json
+import pytest
+from starlette.requests import Request
+import api.caching
+import api.fastjson
+from api.caching import ResponseCache, cached_json
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+from api.fastjson import CompressionMiddleware, FastJSONResponse, choose_encoding, dumps
+from api.project import ProjectInfo
+
+def make_request(accept_encoding=None):
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "query_string": b""})
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_matches_stdlib_json(monkeypatch, use_orjson):
+    if use_orjson and api.fastjson.orjson is None:
+        pytest.skip("orjson not installed")
+    monkeypatch.setattr(api.fastjson, "USE_ORJSON", use_orjson)
+    content = {"text": "héllo \"quoted\"", "n": [1, 2.5, None, True],
+               "project": ProjectInfo(id="1", name="Work"), "at": datetime.datetime(2024, 1, 2, 3, 4, 5)}
+    data = json.loads(dumps(content))
+    assert data["text"] == "héllo \"quoted\"" and data["n"] == [1, 2.5, None, True]
+    assert data["project"]["name"] == "Work" and data["at"] == "2024-01-02T03:04:05"
+    assert json.loads(FastJSONResponse({"ok": True}).body) == {"ok": True}
+
+def test_choose_encoding(monkeypatch):
+    monkeypatch.setattr(api.fastjson, "brotli", None)
+    assert choose_encoding("gzip, deflate, br") == "gzip"
+    assert choose_encoding("identity") is None and choose_encoding(None) is None
+    # q=0 refuses a coding, also through the wildcard
+    assert choose_encoding("gzip;q=0, deflate") is None and choose_encoding("*, gzip; q=0") is None
+    assert choose_encoding("*") == "gzip" and choose_encoding("br, gzip;q=0.5") == "gzip"
+
+def test_large_cached_bodies_are_sent_compressed(monkeypatch):
+    monkeypatch.setattr(api.caching, "response_cache", ResponseCache(max_bytes=1 << 20))
+    monkeypatch.setattr(api.fastjson, "brotli", None)
+    content = {"messages": [{"sender": "user", "text": f"message {i}"} for i in range(500)]}
+    resp = cached_json(make_request("gzip"), "route", 1, 1, (), lambda: (content, None))
+    assert resp.headers["Content-Encoding"] == "gzip" and resp.headers["Vary"] == "Accept-Encoding"
+    assert json.loads(gzip.decompress(resp.body)) == content
+    plain = cached_json(make_request(), "route", 1, 1, (), lambda: (content, None))
+    assert "Content-Encoding" not in plain.headers and json.loads(plain.body) == content
+    small = cached_json(make_request("gzip"), "small", 1, 1, (), lambda: ({"ok": True}, None))
+    assert "Content-Encoding" not in small.headers
+
+def test_gzip_middleware(client):
+    resp = client.get("/metrics", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200 and resp.headers.get("content-encoding") == "gzip"
+
+def test_compression_skips_encoded_bodies_and_event_streams():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=16)
+    payload = b"x" * 4096
+    app.get("/plain")(lambda: Response(payload, media_type="text/plain"))
+    app.get("/encoded")(lambda: Response(gzip.compress(payload), media_type="text/plain",
+                                         headers={"Content-Encoding": "gzip"}))
+    app.get("/events")(lambda: StreamingResponse(iter([b"data: 1\n\n", b"data: 2\n\n"]), media_type="text/event-stream"))
+    app.get("/stream")(lambda: StreamingResponse(iter([payload, payload]), media_type="text/plain"))
+    client = TestClient(app)
+    gz = {"Accept-Encoding": "gzip"}
+    resp = client.get("/plain", headers=gz)
+    assert resp.headers["content-encoding"] == "gzip" and resp.content == payload
+    assert "content-encoding" not in client.get("/plain", headers={"Accept-Encoding": "gzip;q=0"}).headers
+    # Already encoded once: decoded once by the client, not twice-gzipped
+    assert client.get("/encoded", headers=gz).content == payload
+    events = client.get("/events", headers=gz)
+    assert "content-encoding" not in events.headers and events.text == "data: 1\n\ndata: 2\n\n"
+    stream = client.get("/stream", headers=gz)
+    assert stream.headers["content-encoding"] == "gzip" and stream.content == payload * 2
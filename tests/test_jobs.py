@@ -0,0 +1,111 @@
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from model.db import Base, User, Project, ChatMessage, GenerationJob
+from model.jobs import JobRunner
+
+def make_session_factory(path):
+    # A file database so the runner threads get their own connections to the same data
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def add_user_message(db, text="Hello"):
+    user = User(email=f"jobs{time.time_ns()}@example.com", name="Jobs", password_hash="x")
+    db.add(user)
+    db.flush()
+    project = Project(user_id=user.id, name="Default")
+    db.add(project)
+    db.flush()
+    msg = ChatMessage(project_id=project.id, user_id=user.id, sender="user", content=text, version=1)
+    db.add(msg)
+    db.flush()
+    return msg
+
+def wait_for(runner, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        state = runner.status(job_id)
+        if state["status"] in ("done", "failed"):
+            return state
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish: {state}")
+
+def test_job_generates_and_persists_reply(tmp_path):
+    Session = make_session_factory(tmp_path / "jobs.db")
+    runner = JobRunner(lambda message, project_id: f"echo {message}", workers=1, session_factory=Session)
+    db = Session()
+    msg = add_user_message(db)
+    job = runner.enqueue(db, msg)
+    try:
+        state = wait_for(runner, job.id)
+    finally:
+        runner.stop()
+    assert state["status"] == "done"
+    assert state["reply"] == "echo Hello"
+    check = Session()
+    assert check.query(ChatMessage).filter(ChatMessage.sender == "ai").one().content == "echo Hello"
+    assert runner.status(job.id, user_id=msg.user_id + 1) is None
+
+def test_job_failure_is_recorded(tmp_path):
+    Session = make_session_factory(tmp_path / "jobs.db")
+    def boom(message, project_id):
+        raise ValueError("model exploded")
+    runner = JobRunner(boom, workers=1, session_factory=Session)
+    db = Session()
+    job = runner.enqueue(db, add_user_message(db))
+    try:
+        state = wait_for(runner, job.id)
+    finally:
+        runner.stop()
+    assert state["status"] == "failed"
+    assert "model exploded" in state["error"]
+
+def test_unfinished_jobs_are_recovered_on_start(tmp_path):
+    Session = make_session_factory(tmp_path / "jobs.db")
+    db = Session()
+    msg = add_user_message(db, "after crash")
+    db.add(GenerationJob(id="crashed", user_id=msg.user_id, project_id=msg.project_id,
+                         user_message_id=msg.id, status="running", attempts=1))
+    db.add(GenerationJob(id="exhausted", user_id=msg.user_id, project_id=msg.project_id,
+                         user_message_id=msg.id, status="running", attempts=3))
+    db.commit()
+    runner = JobRunner(lambda message, project_id: message.upper(), workers=1, session_factory=Session, max_attempts=3)
+    runner.start()
+    try:
+        assert wait_for(runner, "crashed")["reply"] == "AFTER CRASH"
+        assert wait_for(runner, "exhausted")["status"] == "failed"
+    finally:
+        runner.stop()
+
+def test_chat_job_unauth(client):
+    resp = client.get("/chat/jobs/does-not-exist")
+    assert resp.status_code in (401, 403)
+
+def test_send_then_poll_job_until_the_reply_is_stored(client, account_sessions, monkeypatch):
+    import api.chat
+    from api.auth import create_access_token
+    # The runner threads use the accounts file database the client fixture gives /chat/send
+    monkeypatch.setattr(api.chat, "CHAT_BACKEND", "echo")
+    monkeypatch.setattr(api.chat.job_runner, "_session_factory", account_sessions)
+    db = account_sessions()
+    user = User(email="jobs-api@example.com", name="Jobs", password_hash="x")
+    db.add(user)
+    db.flush()
+    project = Project(user_id=user.id, name="Default")
+    db.add(project)
+    db.commit()
+    project_id = str(project.id)
+    db.close()
+    client.cookies.set("access_token", create_access_token({"sub": "jobs-api@example.com"}))
+    resp = client.post("/chat/send", json={"project_id": project_id, "message": "Hello"})
+    assert resp.status_code == 202
+    job_id = resp.json()["job_id"]
+    deadline = time.time() + 5
+    state = client.get(f"/chat/jobs/{job_id}").json()
+    while state["status"] not in ("done", "failed") and time.time() < deadline:
+        time.sleep(0.02)
+        state = client.get(f"/chat/jobs/{job_id}").json()
+    assert state["status"] == "done"
+    assert state["reply"] == f"MazGPT: You said 'Hello' (project: {project_id})"
+    client.cookies.clear()
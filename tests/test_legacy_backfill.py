@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from model.db import Base, User, Project, ChatMessage, ChatMemory
+from model import legacy_backfill
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def make_account(db):
+    user = User(email="legacy@example.com", name="Legacy", password_hash="x")
+    db.add(user)
+    db.flush()
+    work = Project(user_id=user.id, name="work")
+    db.add(work)
+    db.flush()
+    db.add_all([
+        ChatMemory(user_id=user.id, project_id=work.id, messages=[
+            {"user": "user", "message": "first", "timestamp": "2024-01-02T03:04:05"},
+            {"sender": "ai", "text": "second"}, {"user": "user", "message": ""}]),
+        # Old imports stored the client's project key instead of an id
+        ChatMemory(user_id=user.id, project_id="notes", messages=[{"user": "user", "message": "note"}]),
+    ])
+    db.commit()
+    return user, work
+
+def test_history_dual_reads_pending_blobs(db):
+    user, work = make_account(db)
+    msgs = legacy_backfill.pending_messages(db, work, 10)
+    assert [(m.sender, m.content) for m in msgs] == [("user", "first"), ("ai", "second")]
+    assert msgs[0].created_at.year == 2024
+    assert len(legacy_backfill.pending_messages(db, work, 1)) == 1
+
+def test_backfill_explodes_blobs_and_can_be_rerun(db):
+    user, work = make_account(db)
+    assert legacy_backfill.backfill(db, blobs_per_batch=1, pause=0, limit=1) == {"blobs": 1, "messages": 2}
+    assert legacy_backfill.backfill(db, blobs_per_batch=1, pause=0) == {"blobs": 1, "messages": 1}
+    assert legacy_backfill.backfill(db, pause=0) == {"blobs": 0, "messages": 0}
+    assert db.query(ChatMemory).count() == 0
+    rows = db.query(ChatMessage).filter(ChatMessage.project_id == work.id).order_by(ChatMessage.id).all()
+    assert [(m.sender, m.content) for m in rows] == [("user", "first"), ("ai", "second")]
+    notes = db.query(Project).filter(Project.user_id == user.id, Project.name == "notes").one()
+    assert db.query(ChatMessage).filter(ChatMessage.project_id == notes.id).one().content == "note"
+    assert legacy_backfill.pending_messages(db, work, 10) == []
+
+def test_blobs_without_a_message_list_are_counted_as_skipped(db):
+    user, work = make_account(db)
+    db.add(ChatMemory(user_id=user.id, project_id=work.id, messages={"not": "a list"}))
+    db.commit()
+    skipped = legacy_backfill.BACKFILLED.labels("skipped")
+    before = skipped.value
+    legacy_backfill.backfill(db, pause=0)
+    # The empty message of the first blob and the whole non-list blob
+    assert skipped.value - before == 2
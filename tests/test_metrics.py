@@ -0,0 +1,18 @@
+from model.metrics import Registry
+
+def test_metrics_endpoint(client):
+    client.get("/ping")
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert "# TYPE mazgpt_http_request_seconds histogram" in resp.text
+
+def test_histogram_exposition():
+    registry = Registry()
+    hist = registry.histogram("test_stage_seconds", "Test stage latency", ["stage"], buckets=(0.1, 1.0))
+    hist.labels("decode").observe(0.05)
+    hist.labels("decode").observe(0.5)
+    text = registry.render()
+    assert 'test_stage_seconds_bucket{stage="decode",le="0.1"} 1' in text
+    assert 'test_stage_seconds_bucket{stage="decode",le="+Inf"} 2' in text
+    assert 'test_stage_seconds_count{stage="decode"} 2' in text
@@ -0,0 +1,59 @@
+from plugins._manager import PluginManager
+
+def test_commands_route_to_one_plugin():
+    manager = PluginManager()
+    assert manager.candidates("/listfiles")[0] == "file_plugin"
+    assert manager.candidates("/listimages")[0] == "image_plugin"
+    assert "web_search_plugin" not in manager.candidates("/listfiles")
+
+def test_plain_questions_do_not_hit_web_search():
+    manager = PluginManager()
+    assert "web_search_plugin" not in manager.candidates("Why does my code raise a KeyError?")
+    assert "web_search_plugin" in manager.candidates("please search the weather in Paris")
+    assert manager.dispatch("Why does my code raise a KeyError?") == (None, None)
+
+def test_triggers_follow_priority():
+    manager = PluginManager()
+    manager.metadata["sample_plugin"]["priority"] = -20
+    manager._build_dispatch_table()
+    assert manager.candidates("hello, search for cats") == ["web_search_plugin", "sample_plugin"]
+    assert manager.dispatch("hello there") == ("sample_plugin", "Hi! This is a response from the sample plugin.")
+    assert "sample_plugin" not in manager.candidates("Othello is a tragedy")
+
+class _SlowPlugin:
+    meta = {"commands": ["/slow"], "timeout_ms": 50, "max_concurrency": 1}
+    def handle(self, text):
+        import time
+        time.sleep(0.3)
+        return "too late"
+
+class _AsyncPlugin:
+    meta = {"commands": ["/async"]}
+    async def handle(self, text):
+        import asyncio
+        await asyncio.sleep(0.01)
+        return "async reply"
+
+def test_timeouts_caps_and_async_plugins():
+    manager = PluginManager()
+    for name, plugin in (("slow", _SlowPlugin()), ("async", _AsyncPlugin())):
+        manager.plugins[name] = plugin
+        manager.metadata[name] = dict(plugin.meta)
+    manager._build_dispatch_table()
+    assert manager.dispatch("/slow") == (None, None)
+    # The timed-out call still holds the plugin's only slot, so a second call is rejected immediately
+    assert manager.dispatch("/slow") == (None, None)
+    assert manager.dispatch_async("/async").result(timeout=5) == ("async", "async reply")
+    manager.shutdown()
+
+def test_messages_without_candidates_do_not_wait_on_slow_dispatches():
+    manager = PluginManager()
+    manager.plugins["slow"] = _SlowPlugin()
+    manager.metadata["slow"] = dict(_SlowPlugin.meta, timeout_ms=2000, max_concurrency=8)
+    manager._build_dispatch_table()
+    slow = [manager.dispatch_async("/slow") for _ in range(3)]
+    # No plugin matches: the future is already done, with every dispatch thread busy
+    quiet = manager.dispatch_async("Why does my code raise a KeyError?")
+    assert quiet.done() and quiet.result() == (None, None)
+    assert [f.result(timeout=5) for f in slow] == [("slow", "too late")] * 3
+    manager.shutdown()
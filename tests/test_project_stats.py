@@ -0,0 +1,70 @@
+import datetime
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from model.db import Base, User, Project, ChatMessage
+from model import project_stats
+from model.bulk_import import insert_messages
+from model.deletion import delete_user_data
+from api.project import project_page
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'stats.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def make_user(db, n_projects):
+    user = User(email="stats@example.com", name="Stats", password_hash="x")
+    db.add(user)
+    db.flush()
+    base = datetime.datetime(2024, 1, 1)
+    projects = [Project(user_id=user.id, name=f"p{i}", archived=(i == 0), created_at=base,
+                        updated_at=base + datetime.timedelta(minutes=i)) for i in range(n_projects)]
+    db.add_all(projects)
+    db.commit()
+    return user, projects
+
+def test_counters_follow_messages(db):
+    user, (p,) = make_user(db, 1)
+    msg = ChatMessage(project_id=p.id, user_id=user.id, sender="user", content="x" * 10, version=1)
+    db.add(msg)
+    db.flush()
+    project_stats.record_message(db, msg)
+    insert_messages(db, user.id, p.id, [("ai", "hello", "2030-01-01T00:00:00"), ("user", "hi", None)])
+    db.commit()
+    db.refresh(p)
+    assert (p.message_count, p.token_count, p.last_message_at.year) == (3, 3 + 2 + 1, 2030)
+    p.message_count = 0
+    db.commit()
+    assert project_stats.recompute(db) == 1
+    db.refresh(p)
+    assert (p.message_count, p.token_count) == (3, 6)
+    delete_user_data(db, user.id)
+    db.refresh(p)
+    assert (p.message_count, p.token_count, p.last_message_at) == (0, 0, None)
+
+def test_rolled_back_message_does_not_count(db):
+    user, (p,) = make_user(db, 1)
+    db.add(ChatMessage(project_id=p.id, user_id=user.id, sender="user", content="lost", version=1))
+    db.flush()
+    project_stats.record_messages(db, p.id, 1, 1)
+    db.rollback()
+    assert db.get(Project, p.id).message_count == 0
+
+def test_list_filters_sorts_and_pages(db):
+    user, projects = make_user(db, 5)
+    pages, cursor = [], None
+    while True:
+        page, cursor = project_page(db, user.id, archived=False, sort="updated", limit=2, cursor=cursor)
+        pages.append([p.name for p in page])
+        if not cursor:
+            break
+    assert pages == [["p4", "p3"], ["p2", "p1"]]
+    by_name, _ = project_page(db, user.id, sort="name", limit=10)
+    assert [p.name for p in by_name] == ["p0", "p1", "p2", "p3", "p4"] and by_name[0].archived
+    with pytest.raises(HTTPException):
+        project_page(db, user.id, sort="name", cursor="not-a-cursor")
@@ -0,0 +1,72 @@
+import socket
+from types import SimpleNamespace
+import pytest
+from model.prompt_template import PromptTemplate
+
+class WordTokenizer:
+    """Whitespace tokenizer with a BOS id, enough to check how ids are assembled."""
+    BOS = 0
+
+    def __init__(self):
+        self.vocab = {}
+        self.calls = 0
+
+    def __call__(self, text, add_special_tokens=True):
+        self.calls += 1
+        ids = []
+        for piece in text.replace("\n", " \n ").split(" "):
+            if piece:
+                ids.append(self.vocab.setdefault(piece, len(self.vocab) + 1))
+        return SimpleNamespace(input_ids=([self.BOS] if add_special_tokens else []) + ids)
+
+def test_build_ids_matches_whole_string_encoding():
+    tok = WordTokenizer()
+    template = PromptTemplate(tok, "You are MazGPT.")
+    prompt = "user: hi\nMazGPT: hello\nuser: bye\nMazGPT:"
+    full = template.system_prompt("fr", "formal") + "\n" + prompt
+    assert template.build_ids(prompt, "fr", "formal") == tok(full).input_ids
+    assert template.special_prefix == (WordTokenizer.BOS,)
+
+def test_system_prompt_and_repeated_lines_are_tokenized_once():
+    tok = WordTokenizer()
+    template = PromptTemplate(tok, "You are MazGPT.")
+    template.build_ids("user: hi\nMazGPT:")
+    calls = tok.calls
+    template.build_ids("user: hi\nMazGPT: hello\nuser: more\nMazGPT:")
+    # Only the two new lines needed the tokenizer
+    assert tok.calls == calls + 2
+
+def sentencepiece_style_tokenizer():
+    """Tiny BPE with Llama's normalizer ("▁" prepended to every encoded text) and byte fallback."""
+    from tokenizers import Tokenizer, models, normalizers, trainers, processors
+    from transformers import PreTrainedTokenizerFast
+    tok = Tokenizer(models.BPE(byte_fallback=True))
+    tok.normalizer = normalizers.Sequence([normalizers.Prepend("▁"), normalizers.Replace(" ", "▁")])
+    corpus = ["You are MazGPT.", "user: hi there", "MazGPT: hello, how can I help?", "Use a formal, professional tone."]
+    tok.train_from_iterator(corpus, trainers.BpeTrainer(
+        vocab_size=300, special_tokens=["<s>"] + [f"<0x{b:02X}>" for b in range(256)]))
+    tok.post_processor = processors.TemplateProcessing(single="<s> $A", special_tokens=[("<s>", 0)])
+    return PreTrainedTokenizerFast(tokenizer_object=tok, bos_token="<s>")
+
+def llama_tokenizer():
+    from transformers import AutoTokenizer
+    try:
+        return AutoTokenizer.from_pretrained("hf-internal-testing/llama-tokenizer", local_files_only=True)
+    except Exception:
+        pass
+    try:
+        # Fail fast offline instead of waiting on the hub client's retries
+        socket.create_connection(("huggingface.co", 443), timeout=2).close()
+        return AutoTokenizer.from_pretrained("hf-internal-testing/llama-tokenizer")
+    except Exception as e:
+        pytest.skip(f"llama tokenizer not available: {e}")
+
+@pytest.mark.parametrize("make_tokenizer", [sentencepiece_style_tokenizer, llama_tokenizer])
+def test_lines_keep_their_whole_string_ids_with_sentencepiece(make_tokenizer):
+    tok = make_tokenizer()
+    template = PromptTemplate(tok, "You are MazGPT.")
+    prompt = "user: hi there\nMazGPT: hello\n\nuser: how can I help?\nMazGPT:"
+    full = template.system_prompt("fr", "formal") + "\n" + prompt
+    assert template.build_ids(prompt, "fr", "formal") == tok(full).input_ids
+    # Served from the line cache, not the whole-prompt fallback
+    assert None not in [template.segment(line) for line in prompt.split("\n")]
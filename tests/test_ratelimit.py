@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+import pytest
+import api.ratelimit
+from api.ratelimit import Bucket, MemoryStore, RateLimitExceeded
+
+BUCKET = Bucket(rate=1.0, burst=3)
+
+def test_burst_then_refill():
+    store = MemoryStore()
+    assert [store.acquire("k", BUCKET, now=100.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.acquire("k", BUCKET, now=100.0) == pytest.approx(1.0)
+    assert store.acquire("k", BUCKET, now=101.0) == 0.0
+    # Refill is capped at the burst
+    assert [store.acquire("k", BUCKET, now=200.0) for _ in range(4)][-1] > 0
+
+def test_costs_and_debt():
+    store = MemoryStore()
+    assert store.acquire("k", BUCKET, cost=4, now=0.0) == pytest.approx(1.0)  # more than the bucket holds
+    assert store.acquire("k", BUCKET, cost=2, now=0.0) == 0.0
+    store.charge("k", BUCKET, 5, now=0.0)  # generated tokens are charged even past empty
+    assert store.acquire("k", BUCKET, now=0.0) == pytest.approx(5.0)
+    assert store.acquire("k", BUCKET, now=5.0) == 0.0
+
+def test_keys_are_independent_and_swept():
+    store = MemoryStore()
+    for _ in range(3):
+        store.acquire("user:1", BUCKET, now=0.0)
+    assert store.acquire("user:1", BUCKET, now=0.0) > 0
+    assert store.acquire("user:2", BUCKET, now=0.0) == 0.0
+    store.sweep(now=10.0)
+    assert store._tat == {}
+
+def test_check_raises_with_retry_after(monkeypatch):
+    monkeypatch.setitem(api.ratelimit.BUCKETS, "read", Bucket(rate=0.5, burst=1))
+    api.ratelimit.check("read", "user:9")
+    with pytest.raises(RateLimitExceeded) as exc:
+        api.ratelimit.check("read", "user:9")
+    assert exc.value.bucket == "read" and exc.value.retry_after == 2
+
+def test_login_is_limited_per_client(client, monkeypatch):
+    monkeypatch.setitem(api.ratelimit.BUCKETS, "auth", Bucket(rate=1 / 60, burst=2))
+    body = {"email": "nobody@example.com", "password": "wrongpassword"}
+    assert [client.post("/auth/login", json=body).status_code for _ in range(2)] == [401, 401]
+    resp = client.post("/auth/login", json=body)
+    assert resp.status_code == 429 and int(resp.headers["Retry-After"]) > 0
+
+def test_reads_and_sends_have_separate_budgets(monkeypatch):
+    monkeypatch.setitem(api.ratelimit.BUCKETS, "chat_send", Bucket(rate=1 / 60, burst=1))
+    user, other = SimpleNamespace(id=1), SimpleNamespace(id=2)
+    send, read = api.ratelimit.limit_user("chat_send"), api.ratelimit.limit_user("read")
+    send(current_user=user)
+    with pytest.raises(RateLimitExceeded):
+        send(current_user=user)
+    read(current_user=user)
+    send(current_user=other)
@@ -0,0 +1,41 @@
+import time
+from model.response_cache import ResponseCache, RESPONSE_CACHE_LOOKUPS
+
+VOCAB = ["what", "is", "the", "capital", "of", "france", "germany", "refund", "policy", "your"]
+
+def bag_of_words(text):
+    words = text.lower().replace("?", "").split()
+    return [float(words.count(w)) for w in VOCAB]
+
+def lookups(result):
+    return RESPONSE_CACHE_LOOKUPS.labels(result).value
+
+def test_exact_and_similar_hits_are_scoped():
+    cache = ResponseCache(embed=bag_of_words, similarity=0.9)
+    cache.put("phi-2", "en:friendly", "What is the capital of France?", "Paris.", project_id="p1")
+    before = lookups("exact")
+    assert cache.get("phi-2", "en:friendly", "what is the capital of france", project_id="p1") == "Paris."
+    assert lookups("exact") == before + 1
+    assert cache.get("phi-2", "en:friendly", "So what is the capital of France?", project_id="p1") == "Paris."
+    assert cache.get("phi-2", "en:friendly", "What is the capital of Germany?", project_id="p1") is None
+    assert cache.get("phi-2", "en:friendly", "What is the capital of France?", project_id="p2") is None
+    assert cache.get("phi-2", "fr:formal", "What is the capital of France?", project_id="p1") is None
+    assert cache.get("llama3", "en:friendly", "What is the capital of France?", project_id="p1") is None
+
+def test_short_messages_are_not_cached():
+    cache = ResponseCache(embed=bag_of_words)
+    cache.put("m", "v", "why?", "Because.")
+    assert len(cache) == 0
+    assert cache.get("m", "v", "why?") is None
+
+def test_ttl_and_lru_eviction():
+    cache = ResponseCache(ttl=0.05, max_entries=2)
+    cache.put("m", "v", "what is your refund policy", "30 days")
+    time.sleep(0.06)
+    assert cache.get("m", "v", "what is your refund policy") is None
+    cache = ResponseCache(max_entries=2)
+    for i in range(3):
+        cache.put("m", "v", f"question number {i} here", str(i))
+    assert len(cache) == 2
+    assert cache.get("m", "v", "question number 0 here") is None
+    assert cache.get("m", "v", "question number 2 here") == "2"
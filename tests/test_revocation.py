@@ -0,0 +1,58 @@
+import time
+import pytest
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.orm import sessionmaker
+import api.revocation
+from api.auth import create_access_token, revoke_jti, verify_token
+from api.revocation import SqlRevocationStore
+from model.db import Base, RevokedToken
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'revoked.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+def test_revocations_reach_other_processes_on_refresh(session_factory):
+    writer = SqlRevocationStore(session_factory, refresh_interval=0)
+    reader = SqlRevocationStore(session_factory, refresh_interval=3600)
+    exp = int(time.time()) + 60
+    assert not reader.is_revoked("a")  # first lookup loads the snapshot
+    writer.revoke("a", exp)
+    writer.revoke("a", exp)  # revoking twice is harmless
+    assert writer.is_revoked("a") and not reader.is_revoked("a")
+    reader._refreshed_at = None
+    assert reader.is_revoked("a") and not reader.is_revoked("b")
+
+def test_expired_entries_are_dropped_and_purged(session_factory, monkeypatch):
+    monkeypatch.setattr(api.revocation, "PURGE_INTERVAL", 0)
+    store = SqlRevocationStore(session_factory, refresh_interval=0)
+    store.revoke("old", int(time.time()) - 1)
+    store.revoke("new", int(time.time()) + 60)
+    assert not store.is_revoked("old") and store.is_revoked("new")
+    assert set(store._revoked) == {"new"}
+    db = session_factory()
+    assert db.scalar(select(func.count()).select_from(RevokedToken)) == 1
+    db.close()
+
+def test_ids_are_not_reused_after_a_purge(session_factory, monkeypatch):
+    writer = SqlRevocationStore(session_factory, refresh_interval=0)
+    reader = SqlRevocationStore(session_factory, refresh_interval=0)
+    writer.revoke("live", int(time.time()) + 60)
+    writer.revoke("expiring", int(time.time()) + 60)  # the highest id
+    assert reader.is_revoked("expiring")
+    db = session_factory()
+    db.execute(update(RevokedToken).where(RevokedToken.jti == "expiring").values(expires_at=int(time.time()) - 1))
+    db.commit()
+    db.close()
+    monkeypatch.setattr(api.revocation, "PURGE_INTERVAL", 0)
+    writer.refresh()  # deletes the now expired, highest-id row
+    writer.revoke("new-tok", int(time.time()) + 60)
+    assert reader.is_revoked("new-tok")
+
+def test_verify_token_rejects_revoked_tokens():
+    token = create_access_token({"sub": "revoked@example.com"})
+    payload = verify_token(token)
+    assert payload["sub"] == "revoked@example.com"
+    revoke_jti(payload["jti"], int(payload["exp"]))
+    assert verify_token(token) is None
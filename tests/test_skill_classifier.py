@@ -0,0 +1,32 @@
+from model.skill_classifier import SkillClassifier
+
+VOCAB = ["python", "function", "bug", "translate", "spanish", "french", "hello", "weather", "joke"]
+EXEMPLARS = {
+    "code": ["python function", "fix this bug", "python bug"],
+    "multilingual": ["translate to spanish", "translate to french"],
+    "general": ["hello there", "tell me a joke", "weather today"],
+}
+
+def make_embed(calls):
+    def embed(texts):
+        calls.append(len(texts))
+        return [[float(w in t.lower()) for w in VOCAB] for t in texts]
+    return embed
+
+def test_nearest_centroid_and_threshold(tmp_path):
+    classifier = SkillClassifier(make_embed([]), EXEMPLARS, cache_path=str(tmp_path / "centroids.json"), threshold=0.3)
+    assert classifier.predict("why does my python function have a bug")[0] == "code"
+    assert classifier.predict("please translate this into spanish")[0] == "multilingual"
+    skill, confidence = classifier.predict("quantum chromodynamics")
+    assert skill is None and confidence < 0.3
+
+def test_centroids_cached_until_exemplars_change(tmp_path):
+    path = str(tmp_path / "centroids.json")
+    calls = []
+    SkillClassifier(make_embed(calls), EXEMPLARS, cache_path=path)
+    assert len(calls) == len(EXEMPLARS)
+    calls.clear()
+    SkillClassifier(make_embed(calls), EXEMPLARS, cache_path=path)
+    assert calls == []
+    SkillClassifier(make_embed(calls), dict(EXEMPLARS, code=["python"]), cache_path=path)
+    assert len(calls) == len(EXEMPLARS)
@@ -0,0 +1,48 @@
+import threading
+import pytest
+
+@pytest.fixture(scope="module")
+def tiny_models(tmp_path_factory):
+    """A random 1-layer GPT-2 target and draft sharing a word-level tokenizer (no download)."""
+    import torch
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+    words = ["<unk>", "<eos>", "user", "MazGPT", ":", "hi", "hello", "there", "how", "are", "you", "\n"]
+    tok = Tokenizer(models.WordLevel({w: i for i, w in enumerate(words)}, unk_token="<unk>"))
+    tok.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tok, unk_token="<unk>", eos_token="<eos>")
+    paths = {}
+    for name, seed in (("target", 0), ("draft", 1)):
+        torch.manual_seed(seed)
+        path = tmp_path_factory.mktemp(name)
+        GPT2LMHeadModel(GPT2Config(vocab_size=len(words), n_embd=16, n_layer=1, n_head=2, n_positions=256,
+                                   bos_token_id=1, eos_token_id=1)).save_pretrained(path)
+        tokenizer.save_pretrained(path)
+        paths[name] = str(path)
+    return paths
+
+def test_targets_sharing_a_draft_keep_their_own_settings_and_counts(tiny_models):
+    from model.llm import LocalLLM, _load_draft
+    shared = _load_draft(tiny_models["draft"], "cpu")[0]
+    default = shared.generation_config.to_dict()
+    a = LocalLLM(tiny_models["target"], device="cpu", draft_model=tiny_models["draft"], draft_tokens=2)
+    b = LocalLLM(tiny_models["target"], device="cpu", draft_model=tiny_models["draft"], draft_tokens=5)
+    assert a.draft_model is b.draft_model is shared
+    assert (a._draft_config.num_assistant_tokens, b._draft_config.num_assistant_tokens) == (2, 5)
+    assert shared.generation_config.to_dict() == default
+
+    total = [0]
+    handle = shared.register_forward_hook(lambda *args: total.__setitem__(0, total[0] + 1))
+    threads = [threading.Thread(target=llm.generate, args=("user : hi\nMazGPT :",), kwargs={"max_new_tokens": 16})
+               for llm in (a, b)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(60)
+    finally:
+        handle.remove()
+    drafted = [llm.last_stats.get("draft_tokens", 0) for llm in (a, b)]
+    # Concurrent calls count only their own draft passes, within their own draft length
+    assert sum(drafted) == total[0] > 0
+    assert drafted[0] <= 2 * a.last_stats["steps"] and drafted[1] <= 5 * b.last_stats["steps"]
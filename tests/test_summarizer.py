@@ -0,0 +1,97 @@
+import threading
+from model.context import ContextBuilder
+from model.summarizer import ConversationSummarizer, SummaryStore
+
+class FakeMemory:
+    def __init__(self):
+        self.history = []
+
+    def add(self, user, message, project_id="default"):
+        self.history.append({"user": user, "message": message, "project_id": project_id})
+
+def make_summarizer(tmp_path, **kwargs):
+    memory = FakeMemory()
+    store = SummaryStore(str(tmp_path / "summaries.json"))
+    summarize = lambda lines: f"summary of {len(lines)}"
+    return memory, ConversationSummarizer(memory, store, summarize=summarize, chunk_turns=10, keep_recent=10, fanout=2, **kwargs)
+
+def test_older_turns_fold_into_bounded_summaries(tmp_path):
+    memory, summarizer = make_summarizer(tmp_path)
+    for i in range(1000):
+        memory.add("user", f"message {i}")
+        summarizer.update("default")
+    state = summarizer.store.data["default"]
+    assert state["covered"] == 990
+    assert sum(s["turns"] for level in state["levels"] for s in level) == 990
+    assert len(summarizer.summaries("default")) <= 3
+    recent = summarizer.recent_history("default")
+    assert recent[0]["message"] == "message 990" and len(recent) == 10
+
+def test_summaries_persist_and_reset_on_cleared_history(tmp_path):
+    memory, summarizer = make_summarizer(tmp_path)
+    for i in range(50):
+        memory.add("user", f"message {i}", project_id="p1")
+    assert summarizer.update("p1") == 4
+    assert SummaryStore(str(tmp_path / "summaries.json")).data["p1"]["covered"] == 40
+    memory.history = []
+    summarizer.update("p1")
+    assert summarizer.summaries("p1") == []
+
+def test_builder_places_summaries_before_recent_turns(tmp_path):
+    memory, summarizer = make_summarizer(tmp_path)
+    for i in range(40):
+        memory.add("user", f"message {i}")
+    summarizer.update("default")
+    builder = ContextBuilder(max_context_tokens=1000, max_new_tokens=0)
+    prompt, stats = builder.build("", summarizer.recent_history("default"), user_input="next", summaries=summarizer.summaries("default"))
+    assert stats["summaries"] == len(summarizer.summaries("default")) > 0
+    assert prompt.index("summary of") < prompt.index("message 39")
+    assert "message 0" not in prompt
+
+def test_slow_summaries_do_not_block_reset_or_schedule(tmp_path):
+    memory, summarizer = make_summarizer(tmp_path)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_summarize(lines):
+        started.set()
+        release.wait(5)
+        return "late summary"
+    summarizer.summarize = slow_summarize
+    for i in range(30):
+        memory.add("user", f"message {i}")
+    worker = threading.Thread(target=summarizer.update, args=("default",))
+    worker.start()
+    assert started.wait(5)
+    summarizer.schedule("other")  # returns while the summary is still being written
+    summarizer.reset("default")
+    release.set()
+    worker.join(5)
+    # The summary started before the reset is discarded
+    assert summarizer.summaries("default") == []
+
+def test_background_generation_never_overlaps_a_chat_reply():
+    from model.llm import _GenerationGate
+    gate = _GenerationGate()
+    gate.enter()
+    assert not gate.try_enter_background()  # a chat reply is running: summarize extractively
+    gate.leave()
+    assert gate.try_enter_background()
+    started = threading.Event()
+    def chat():
+        gate.enter()
+        started.set()
+        gate.leave()
+    t = threading.Thread(target=chat)
+    t.start()
+    # The chat reply waits for the running summary instead of competing with it
+    assert not started.wait(0.1)
+    gate.leave_background()
+    assert started.wait(5)
+    t.join()
+
+def test_llm_summaries_fall_back_while_the_model_is_busy():
+    from model.summarizer import llm_summarizer
+    class BusyLLM:
+        def generate_when_idle(self, prompt, **kwargs):
+            return None
+    assert llm_summarizer(BusyLLM())(["user: The meeting moved to Friday. Bring slides."]) == "user: The meeting moved to Friday."
@@ -0,0 +1,121 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from model.db import Base, User, Project, ChatMessage, VectorTombstone
+from model.cold_store import ColdStore
+from model import cold_store, tiering
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tiering.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+@pytest.fixture
+def store(tmp_path):
+    return ColdStore(str(tmp_path / "cold.db"))
+
+def _project(db, n):
+    user = User(email="tiering@example.com", name="Tiering", password_hash="x")
+    db.add(user)
+    db.flush()
+    project = Project(user_id=user.id, name="Old")
+    db.add(project)
+    db.flush()
+    db.add_all(ChatMessage(project_id=project.id, user_id=user.id, sender="user" if i % 2 == 0 else "ai",
+                           content=f"message {i}", version=1) for i in range(n))
+    db.commit()
+    return user, project
+
+def test_freeze_read_thaw_round_trip(db, store):
+    user, project = _project(db, 12)
+    before = [(m.sender, m.content, m.created_at) for m in db.query(ChatMessage).order_by(ChatMessage.id)]
+    project.archived = True
+    db.commit()
+    assert tiering.freeze_project(db, user.id, project.id, store=store, segment_rows=5) == 12
+    assert db.query(ChatMessage).count() == 0
+    assert store.message_count(project.id) == 12
+    assert [t.project_key for t in db.query(VectorTombstone)] == [str(project.id)]
+    assert [(m.sender, m.content, m.created_at) for m in tiering.read_messages(db, project, 100, store=store)] == before
+    assert [m.content for m in tiering.read_messages(db, project, 3, store=store)] == ["message 0", "message 1", "message 2"]
+    assert [m.content for m in tiering.search_cold(project, "MESSAGE 1", store=store)] == ["message 11", "message 10", "message 1"]
+
+    assert tiering.thaw_project(db, user.id, project.id, store=store) == 12
+    project.archived = False
+    db.commit()
+    assert [(m.sender, m.content, m.created_at) for m in db.query(ChatMessage).order_by(ChatMessage.id)] == before
+    assert store.message_count(project.id) == 0
+    assert db.query(VectorTombstone).count() == 0
+
+def test_messages_sent_after_archiving_are_read_after_cold_ones(db, store):
+    user, project = _project(db, 3)
+    project.archived = True
+    db.commit()
+    tiering.freeze_project(db, user.id, project.id, store=store)
+    db.add(ChatMessage(project_id=project.id, user_id=user.id, sender="user", content="message late", version=1))
+    db.commit()
+    assert [m.content for m in tiering.read_messages(db, project, 100, store=store)] == \
+        ["message 0", "message 1", "message 2", "message late"]
+    assert [m.content for m in tiering.read_messages(db, project, 2, store=store)] == ["message 0", "message 1"]
+
+def test_search_pages_read_only_the_segments_they_need(db, store, monkeypatch):
+    user, project = _project(db, 20)
+    project.archived = True
+    db.commit()
+    tiering.freeze_project(db, user.id, project.id, store=store, segment_rows=5)
+    db.add(ChatMessage(project_id=project.id, user_id=user.id, sender="user", content="message late", version=1))
+    db.commit()
+    reads = []
+    decompress = cold_store._decompress
+    monkeypatch.setattr(cold_store, "_decompress", lambda *args: reads.append(1) or decompress(*args))
+    hot = db.query(ChatMessage).filter(ChatMessage.project_id == project.id, ChatMessage.content.ilike("%message%")) \
+        .order_by(ChatMessage.created_at.desc())
+    msgs, total = tiering.search_page(hot, project, "message", 0, 3, store=store)
+    assert [m.content for m in msgs] == ["message late", "message 19", "message 18"]
+    assert total == 4 and len(reads) == 1  # another page follows; one segment of four decompressed
+    msgs, total = tiering.search_page(hot, project, "message", 18, 5, store=store)
+    assert [m.content for m in msgs] == ["message 2", "message 1", "message 0"] and total == 21
+
+class FakeIndex:
+    def __init__(self):
+        self.vectors = {}
+
+    def add_messages(self, ids, texts, metadatas=None, project_id="default"):
+        self.vectors.update((i, (project_id, text)) for i, text in zip(ids, texts))
+
+    def delete_project(self, project_id):
+        ids = [i for i, (p, _) in self.vectors.items() if p == project_id]
+        for i in ids:
+            del self.vectors[i]
+        return len(ids)
+
+def test_reindex_replaces_vectors_the_cleaner_has_not_removed(db, store, tmp_path):
+    user, project = _project(db, 4)
+    index = FakeIndex()
+    index.add_messages(["other"], ["kept"], project_id="elsewhere")
+    session_factory = sessionmaker(bind=db.get_bind())
+    tiering.reindex_project(index, session_factory, user.id, project.id, batch_size=3)
+    tiering.freeze_project(db, user.id, project.id, store=store)
+    # Unarchived before the vector cleaner ran: the old vectors are still in the index
+    tiering.thaw_project(db, user.id, project.id, store=store)
+    assert tiering.reindex_project(index, session_factory, user.id, project.id, batch_size=3) == 4
+    assert sorted(text for _, text in index.vectors.values()) == ["kept", "message 0", "message 1", "message 2", "message 3"]
+
+def test_interrupted_freeze_does_not_duplicate_segments(db, store):
+    user, project = _project(db, 4)
+    rows = db.query(ChatMessage).order_by(ChatMessage.id).all()
+    store.write_segment(user.id, project.id, rows)  # written, but the hot rows were never deleted
+    tiering.freeze_project(db, user.id, project.id, store=store)
+    assert store.message_count(project.id) == 4
+
+def test_zlib_segments_stay_readable(db, store, monkeypatch):
+    monkeypatch.setattr(cold_store, "zstandard", None)
+    user, project = _project(db, 3)
+    tiering.freeze_project(db, user.id, project.id, store=store)
+    assert [m.content for m in store.iter_messages(project.id)] == ["message 0", "message 1", "message 2"]
+
+def test_unarchive_unauth(client):
+    resp = client.post("/project/project/unarchive", json={"id": "old"})
+    assert resp.status_code == 401
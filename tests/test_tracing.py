@@ -0,0 +1,32 @@
+from model.tracing import Tracer, span
+
+def test_tail_sampling_keeps_slow_traces():
+    tracer = Tracer(sample_rate=0.0, slow_ms=0.0, capacity=10)
+    with tracer.start_trace("POST /chat/send"):
+        with span("llm.generate", model="phi-2"):
+            pass
+    traces = tracer.recent()
+    assert len(traces) == 1
+    assert [s["name"] for s in traces[0].to_dict()["spans"]] == ["POST /chat/send", "llm.generate"]
+    events = tracer.export_chrome()["traceEvents"]
+    assert events[1]["args"]["parent_id"] == events[0]["args"]["span_id"]
+
+def test_unsampled_fast_traces_are_dropped():
+    tracer = Tracer(sample_rate=0.0, slow_ms=60_000, capacity=10)
+    with tracer.start_trace("GET /project/list"):
+        pass
+    assert tracer.recent() == []
+
+def test_spans_beyond_the_cap_are_counted_not_kept():
+    tracer = Tracer(sample_rate=1.0, slow_ms=60_000, capacity=10, max_spans=5)
+    with tracer.start_trace("POST /chat/send"):
+        for i in range(20):
+            with span("db.query", n=i):
+                pass
+    trace = tracer.recent()[0].to_dict()
+    assert len(trace["spans"]) == 5
+    assert trace["dropped_spans"] == 16
+
+def test_admin_traces_unauth(client):
+    resp = client.get("/admin/traces")
+    assert resp.status_code == 401
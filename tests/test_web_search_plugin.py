@@ -0,0 +1,69 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from plugins.web_search_plugin import WebSearchPlugin, normalize_query
+
+RESULTS_PAGE = """
+<div class="result"><a class="result__a" href="#">Prime Minister</a>
+<a class="result__snippet" href="#">As of 2024, the current prime minister of India is Narendra Modi.</a></div>
+<div class="result"><a class="result__a" href="#">Other</a>
+<div class="result__snippet">Some <b>other</b> snippet &amp; text.</div></div>
+"""
+
+@pytest.fixture
+def search_server():
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            time.sleep(0.1)  # wide enough window for concurrent callers to coalesce
+            body = RESULTS_PAGE.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/html/", hits
+    server.shutdown()
+
+def test_search_extracts_answer_and_caches(search_server):
+    url, hits = search_server
+    plugin = WebSearchPlugin(search_url=url)
+    assert plugin.handle("Search: who is the prime minister of India?") == "Web answer: Narendra Modi"
+    assert plugin.handle("Why is my Python function slow?") is None
+    assert plugin.web_search_and_extract_answer("search:  WHO is the prime minister of india") == "Web answer: Narendra Modi"
+    assert len(hits) == 1
+
+def test_identical_inflight_queries_are_coalesced(search_server):
+    url, hits = search_server
+    plugin = WebSearchPlugin(search_url=url)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(plugin.web_search_and_extract_answer("search mazgpt")))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(hits) == 1
+    assert len(set(results)) == 1
+
+def test_parse_snippets_fast_path():
+    plugin = WebSearchPlugin()
+    snippets = plugin.parse_snippets(RESULTS_PAGE)
+    assert snippets[1] == "Some other snippet & text."
+    assert plugin.parse_snippets("<html>no results</html>") == []
+    assert normalize_query("  Who   is X?? ") == "who is x"
+
+def test_unreachable_search_is_not_cached():
+    plugin = WebSearchPlugin(search_url="http://127.0.0.1:9/html/", timeout=(0.2, 0.2))
+    assert plugin.web_search_and_extract_answer("search anything").startswith("Web search error")
+    assert plugin._cache.get(normalize_query("search anything")) is None
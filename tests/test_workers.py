@@ -0,0 +1,75 @@
+import os
+import time
+import pytest
+from model.workers import WorkerPool, RemoteLLM, WorkerError, WorkerCrashedError
+
+class EchoModel:
+    """Stand-in for LocalLLM, built inside the worker processes."""
+    def __init__(self, model_name, **kwargs):
+        self.name = model_name
+
+    def generate(self, prompt, **kwargs):
+        if prompt == "crash":
+            os._exit(1)
+        if prompt == "fail":
+            raise ValueError("bad prompt")
+        return f"{self.name}:{os.getpid()}:{prompt}"
+
+class BrokenModel:
+    def __init__(self, **kwargs):
+        raise OSError("weights not found")
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(
+        [{"name": "echo", "models": {"echo": {"model_name": "echo"}}, "processes": 2}],
+        factory="test_workers:EchoModel", heartbeat_timeout=10,
+    )
+    yield pool
+    pool.shutdown()
+
+def test_requests_are_served_out_of_process(pool):
+    futures = [pool.submit("echo", "generate", f"hi {i}") for i in range(10)]
+    results = [f.result(timeout=60) for f in futures]
+    assert [r.split(":")[2] for r in results] == [f"hi {i}" for i in range(10)]
+    assert str(os.getpid()) not in {r.split(":")[1] for r in results}
+    assert RemoteLLM(pool, "echo").generate("x", max_new_tokens=4).endswith(":x")
+
+def test_errors_propagate_and_crashed_workers_restart(pool):
+    with pytest.raises(WorkerError, match="bad prompt"):
+        pool.call("echo", "generate", "fail", timeout=60)
+    with pytest.raises(WorkerCrashedError):
+        pool.call("echo", "generate", "crash", timeout=60)
+    assert pool.call("echo", "generate", "after", timeout=60).endswith(":after")
+    deadline = time.time() + 30
+    while not all(w["alive"] and w["ready"] for w in pool.health()) and time.time() < deadline:
+        time.sleep(0.2)
+    health = pool.health()
+    assert sum(w["restarts"] for w in health) == 1
+    assert all(w["alive"] for w in health)
+
+def test_restart_count_resets_once_the_worker_stays_up():
+    pool = WorkerPool([{"name": "echo", "models": {"echo": {"model_name": "echo"}}, "processes": 1}],
+                      factory="test_workers:EchoModel", heartbeat_timeout=10, healthy_after=1)
+    try:
+        with pytest.raises(WorkerCrashedError):
+            pool.call("echo", "generate", "crash", timeout=60)
+        assert pool.call("echo", "generate", "after", timeout=60).endswith(":after")
+        assert pool.health()[0]["restarts"] == 1
+        deadline = time.time() + 30
+        while pool.health()[0]["restarts"] and time.time() < deadline:
+            time.sleep(0.2)
+        assert pool.health()[0]["restarts"] == 0
+    finally:
+        pool.shutdown()
+
+def test_queued_requests_fail_when_no_worker_can_run():
+    pool = WorkerPool([{"name": "broken", "models": {"echo": {}}, "processes": 2}],
+                      factory="test_workers:BrokenModel", heartbeat_timeout=10)
+    try:
+        start = time.time()
+        with pytest.raises(WorkerError, match="weights not found"):
+            pool.call("echo", "generate", "hi", timeout=60)
+        assert time.time() - start < 30
+    finally:
+        pool.shutdown()
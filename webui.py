@@ -1,31 +1,25 @@
 import gradio as gr
+import os
 import uuid
 from model.memory import ChatMemory
 from model.llm import LocalLLM
 from model.semantic_memory import SemanticMemory
 from model.router import SkillRouter
-import importlib.util
-import os
+from model.balancer import ModelOverloadedError
+from model.context import ContextBuilder
+from model.summarizer import ConversationSummarizer, llm_summarizer
+from model import response_cache
+from plugins._manager import PluginManager
 
-# Dynamically load all plugins from the plugins directory
-PLUGINS_DIR = os.path.join(os.path.dirname(__file__), 'plugins')
-plugins = {}
-for fname in os.listdir(PLUGINS_DIR):
-    if fname.endswith('.py') and not fname.startswith('_'):
-        mod_name = fname[:-3]
-        spec = importlib.util.spec_from_file_location(mod_name, os.path.join(PLUGINS_DIR, fname))
-        module = importlib.util.module_from_spec(spec)
-        try:
-            spec.loader.exec_module(module)
-            if hasattr(module, 'register'):
-                plugins[mod_name] = module.register()
-        except Exception as e:
-            print(f"Error loading plugin {mod_name}: {e}")
+plugin_manager = PluginManager()
 
 memory = ChatMemory()
-llm = LocalLLM(model_name="microsoft/phi-2")
+llm = LocalLLM(model_name="microsoft/phi-2", draft_model=os.environ.get("MAZGPT_DRAFT_MODEL") or None)
+memory.register_token_counter(llm.tokenizer_id, llm.count_tokens)
 semantic_memory = SemanticMemory()
-router = SkillRouter("model/model_config.yaml")
+summarizer = ConversationSummarizer(memory, summarize=llm_summarizer(llm))
+reply_cache = response_cache.ResponseCache(embed=semantic_memory.embed) if response_cache.ENABLED else None
+router = SkillRouter("model/model_config.yaml", embed=semantic_memory.embed)
 
 def get_project_list():
     # In a real app, this could be loaded from disk or DB
@@ -34,45 +28,62 @@ def get_project_list():
     ]
 
 def chat_fn(user_input, history, project_id="default", preferences=None):
+    # Try plugins first, in the background so plugin I/O overlaps with storing the message
+    plugin_future = plugin_manager.dispatch_async(user_input)
+    input_embedding = semantic_memory.embed(user_input)
     msg_id = str(uuid.uuid4())
-    semantic_memory.add_message(msg_id, user_input, {"user": "user"}, project_id=project_id)
+    semantic_memory.add_message(msg_id, user_input, {"user": "user"}, project_id=project_id, embedding=input_embedding)
     memory.add('user', user_input, project_id=project_id)
     history = history or []
-    # Try plugins first
-    for name, plugin in plugins.items():
-        if hasattr(plugin, 'handle'):
-            response = plugin.handle(user_input)
-            if response:
-                msg_id = str(uuid.uuid4())
-                semantic_memory.add_message(msg_id, response, {"user": name}, project_id=project_id)
-                memory.add(name, response, project_id=project_id)
-                history.append((user_input, f"{name}: {response}"))
-                return history
+    name, response = plugin_future.result()
+    if response:
+        msg_id = str(uuid.uuid4())
+        semantic_memory.add_message(msg_id, response, {"user": name}, project_id=project_id)
+        memory.add(name, response, project_id=project_id)
+        history.append((user_input, f"{name}: {response}"))
+        return history
     # Otherwise, use SkillRouter with semantic context
-    context = memory.get_context_window(max_turns=10, max_chars=2000, project_id=project_id)
+    recent = summarizer.recent_history(project_id, 200)
     semantic_results = semantic_memory.query(
-        " ".join([entry['message'] for entry in context]), n_results=3, project_id=project_id
+        " ".join([entry['message'] for entry in recent[-10:]]), n_results=3, project_id=project_id
     )
     semantic_context = [doc for doc, meta, score in semantic_results]
-    prompt = "\n".join(semantic_context + [f"{entry['user']}: {entry['message']}" for entry in context])
     # Advanced reasoning: if user_input contains certain keywords, add reasoning instruction
     reasoning_instruction = ""
     if any(word in user_input.lower() for word in ["explain", "why", "how", "step by step", "summarize", "reasoning", "logic", "analyze", "analyze this", "break down"]):
         reasoning_instruction = "\nExplain your reasoning step by step."
-    # Route to best model
     prefs = preferences or {"language": "en", "tone": "friendly"}
-    router_response = router.route((prompt + f"\nuser: {user_input}\nMazGPT:" + reasoning_instruction) if prompt else user_input, preferences=prefs)
-    if isinstance(router_response, dict):
-        model_name = router_response.get("model_name", "LLM")
-        output = router_response.get("output", "")
+    cache_key = (llm.metrics_label, f"{prefs.get('language', 'en')}:{prefs.get('tone', 'friendly')}:{bool(reasoning_instruction)}")
+    cached = reply_cache.get(*cache_key, user_input, project_id=project_id, embedding=input_embedding) if reply_cache else None
+    if cached is not None:
+        model_name, llm_output = cached
     else:
-        model_name = getattr(router_response, "model_name", "LLM") if hasattr(router_response, "model_name") else "LLM"
-        output = router_response if isinstance(router_response, str) else str(router_response)
-    # Actually call the LLM with language/tone
-    llm_output = llm.generate(prompt + f"\nuser: {user_input}\nMazGPT:" + reasoning_instruction, language=prefs.get("language", "en"), tone=prefs.get("tone", "friendly"))
+        # Fit summaries of older turns, semantic hits and recent turns into the model's token budget
+        prompt, _ = ContextBuilder.for_llm(llm).build(
+            llm.build_system_prompt(prefs.get("language", "en"), prefs.get("tone", "friendly")),
+            recent, semantic_context, user_input, reasoning_instruction,
+            summaries=summarizer.summaries(project_id)
+        )
+        # Route to best model
+        try:
+            router_response = router.route(prompt, preferences=prefs, classify_text=user_input)
+        except ModelOverloadedError as e:
+            history.append((user_input, f"MazGPT is busy right now: {e}"))
+            return history
+        if isinstance(router_response, dict):
+            model_name = router_response.get("model_name", "LLM")
+            output = router_response.get("output", "")
+        else:
+            model_name = getattr(router_response, "model_name", "LLM") if hasattr(router_response, "model_name") else "LLM"
+            output = router_response if isinstance(router_response, str) else str(router_response)
+        # Actually call the LLM with language/tone
+        llm_output = llm.generate(prompt, language=prefs.get("language", "en"), tone=prefs.get("tone", "friendly"))
+        if reply_cache:
+            reply_cache.put(*cache_key, user_input, (model_name, llm_output), project_id=project_id, embedding=input_embedding)
     msg_id = str(uuid.uuid4())
     semantic_memory.add_message(msg_id, llm_output, {"user": model_name}, project_id=project_id)
     memory.add(model_name, llm_output, project_id=project_id)
+    summarizer.schedule(project_id)
     history.append((user_input, f"{model_name}: {llm_output}"))
     return history
 
@@ -81,13 +92,13 @@ def recall_fn(query, project_id="default"):
     return "\n".join([f"[{meta.get('user','?')}] {doc} (score: {score:.3f})" for doc, meta, score in results])
 
 def upload_file(file):
-    plugin = plugins.get('file_plugin')
+    plugin = plugin_manager.get_plugin('file_plugin')
     if plugin:
         return plugin.handle(f"/upload {file.name}")
     return "File plugin not available."
 
 def upload_image(image):
-    plugin = plugins.get('image_plugin')
+    plugin = plugin_manager.get_plugin('image_plugin')
     if plugin:
         return plugin.handle(f"/imgupload {image.name}")
     return "Image plugin not available."